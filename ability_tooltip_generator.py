@@ -1,7 +1,11 @@
 import sys
 import hashlib
+import json
 import os
 
+from instrumentation import instruments
+from tsv_writer import TSVWriter
+
 # TODO: Refactor add_tooltip completely, get rid of redundant functions
 class AbilityTooltipGenerator:
     # :TAG -> [Reference concatenated in tsv, Sort order priority (Higher = displayed lower in the game UI tooltip)]
@@ -14,20 +18,38 @@ class AbilityTooltipGenerator:
     TAG_EXPANDING_RADIUS = ["_th_expanding_radius", 195]
     TAG_WIND_UP_TINE = ["_th_wind_up_time", 196]
     TAG_ON_CONTACT = ["_th_on_projectile_cont", 197]
+    # Longest first as some references end with others
+    TAG_REFERENCES = sorted([tag[0] for tag in [TAG_DAMAGE_TOOLTIP, TAG_PHASE_TOOLTIP, TAG_DETONATION_DAMAGE_TOOLTIP, TAG_BONUS_V_LARGE, TAG_MOVEMENT_SPEED,
+        TAG_EQUAL_RADIUS, TAG_EXPANDING_RADIUS, TAG_WIND_UP_TINE, TAG_ON_CONTACT]], key=len, reverse=True)
+
+    # Output files (in the output directory): file name -> the table name & header lines written at the top of the file
+    OUTPUT_DIR = "out"
+    OUTPUT_FILES = {
+        "unit_abilities_additional_ui_effects_tables.tsv": "unit_abilities_additional_ui_effects_tables\t2\nkey\tsort_order\n",
+        "unit_abilities_to_additional_ui_effects_juncs_tables.tsv": "unit_abilities_to_additional_ui_effects_juncs_tables\t0\nability\teffect\n",
+        "th_damage_loc.tsv": "Loc PackedFile\t1\nkey\ttext\ttooltip\n",
+    }
+    PHASE_LOC_PREFIX = "special_ability_phases_onscreen_name_"
+    EFFECT_LOC_PREFIX = "unit_abilities_additional_ui_effects_localised_text_"
+    MANIFEST_FILE = "manifest.json"
+    CHANGESET_FILE = "changeset.json"
 
     def __init__(self, log):
-        self.arr_tooltips = {} # Map<key, Map<tag, tooltip>> where tooltip is in the form {key : str, localisation : str, tag : TAG}
+        # Map<key, Map<tag, tooltip>> where tooltip is in the form {key : str, localisation : str, tag : TAG}
+        # Aliased tooltips are shared between keys, their "key" is the key they were created for (@see add_alias_tooltip)
+        self.arr_tooltips = {}
         self.log = log
 
     def dump(self):
         self.log.set_active_class("AbilityTooltipGenerator")
-        self.log.debug(str(self.__dict__.keys()))
-        self.log.debug(str((AbilityTooltipGenerator.__dict__)))
+        if not self.log.is_enabled_for(self.log.DEBUG): return
+        self.log.debug("%s", self.__dict__.keys())
+        self.log.debug("%s", AbilityTooltipGenerator.__dict__)
 
         self.log.debug("~~~~~~~~~~~~~~~~~~ DUMPING AbilityTooltipGenerator ~~~~~~~~~~~~~~~~~~")
         for tooltip_key in self.arr_tooltips:
             tooltip = self.arr_tooltips[tooltip_key]
-            self.log.debug(tooltip_key + " | "+str(tooltip))
+            self.log.debug("%s | %s", tooltip_key, tooltip)
 
     # Return true and an array of tooltips if any tooltips have been created for the specified key.
     # Otherwise returns false
@@ -59,7 +81,18 @@ class AbilityTooltipGenerator:
         else:
             self.arr_tooltips[key] = {tooltip["tag"][0]: tooltip}
         
-        self.log.debug("Added tooltip: " +str(tooltip))
+        self.log.debug("Added tooltip: %s", tooltip)
+        if instruments.enabled: instruments.count("tooltips_created." + tooltip["tag"][0])
+
+    # Points key at a tooltip created for another key (e.g. bound spells and reskins) instead of copying it.
+    # The tooltip is only expanded into rows of key when the tsv files are generated.
+    def add_alias_tooltip(self, key, tooltip):
+        tips = self.arr_tooltips.get(key)
+        if tips == None:
+            self.arr_tooltips[key] = {tooltip["tag"][0]: tooltip}
+        else:
+            tips[tooltip["tag"][0]] = tooltip
+        if instruments.enabled: instruments.count("tooltips_aliased." + tooltip["tag"][0])
 
     def add_damage_tooltip(self, key, localisation):
         self._add_tooltip({"key":key, "localisation": localisation, "tag": self.TAG_DAMAGE_TOOLTIP})
@@ -103,19 +136,20 @@ class AbilityTooltipGenerator:
     # TODO: Investigate why this exists
     def add_tooltips(self, type, detonation, damageTxt, log):
         if damageTxt != False:
-            log.debug("Added damage tooltip with key: {key} and text: {text}".format(key=type.key,text=damageTxt))
+            log.debug("Added damage tooltip with key: %s and text: %s", type.key, damageTxt)
             self.add_damage_tooltip(type.key, damageTxt)
         else:
-            log.debug("Failed to add damage tooltip for {key}. \nType:{type}\nDetonation:{detonation}".format(key=type.key, type=type, detonation=detonation))
+            log.debug("Failed to add damage tooltip for %s. \nType:%s\nDetonation:%s", type.key, type, detonation)
         if detonation != None:
-            log.debug("Added detonation tooltip with key: {key} and text: {text}".format(key=type.key,text=detonation.get_detonation_string()))
+            log.debug("Added detonation tooltip with key: %s and text: %s", type.key, detonation.get_detonation_string())
             self.add_detonation_damage_tooltip_with_local(type.key, detonation.get_detonation_string())
         else:
-            log.debug("Failed to add detonation tooltip for {key}. \nType:{type}\nDetonation:{detonation}".format(key=type.key, type=type, detonation=detonation))
+            log.debug("Failed to add detonation tooltip for %s. \nType:%s\nDetonation:%s", type.key, type, detonation)
 
 
-    def _create_tooltip_ref(self, tooltip):
-        return tooltip["key"] + tooltip["tag"][0]
+    # key is the key the tooltip is stored under which differs from tooltip["key"] for aliased tooltips
+    def _create_tooltip_ref(self, key, tooltip):
+        return key + tooltip["tag"][0]
 
     def _format_localisation(self, loc):
         localisation = ""
@@ -127,88 +161,156 @@ class AbilityTooltipGenerator:
         onscreen_loc = loc[1].replace(r"\n", r"\\n")
         return onscreen_loc + self._format_localisation(loc)
 
-    def generate_tsv_files(self, log):
+    # Returns (localisation key, localisation text) of a tooltip stored under key as written to th_damage_loc.tsv
+    def get_localisation(self, key, tooltip_ref, tooltip):
+        if "contact" in tooltip_ref:
+            return (self.PHASE_LOC_PREFIX + key, self._format_contact_localisation(tooltip['localisation']))
+        return (self.EFFECT_LOC_PREFIX + tooltip_ref, self._format_localisation(tooltip['localisation']))
+
+    # Yields (key, tooltip_ref, (sort order row, ability junction row, localisation row)) for every tooltip (of the given keys).
+    # The rows are in the same order as OUTPUT_FILES.
+    def _generate_rows(self, log, keys=None):
+        log_tooltips = log.is_enabled_for(log.DEBUG)
+        for key in self.arr_tooltips:
+            if keys != None and key not in keys: continue
+            yield from self._generate_key_rows(log, key, log_tooltips)
+
+    # Yields the rows of the tooltips of a key @see _generate_rows
+    def _generate_key_rows(self, log, key, log_tooltips=False):
+        for tooltip in self.arr_tooltips[key].values():
+            if log_tooltips: log.debug("Saving tooltip: %s", tooltip)
+            tooltip_ref = self._create_tooltip_ref(key, tooltip)
+            sort_order_row = tooltip_ref +"\t" + str(tooltip["tag"][1]) +"\n"
+            ability_to_tooltip_row = key +"\t" + tooltip_ref +"\n"
+            (localisation_key, localisation) = self.get_localisation(key, tooltip_ref, tooltip)
+            localisation_row = localisation_key +'\t' + localisation +'\ttrue\n'
+            yield key, tooltip_ref, (sort_order_row, ability_to_tooltip_row, localisation_row)
+
+    # incremental: only rewrite output files whose content changed since the last incremental run (@see MANIFEST_FILE)
+    # and write the tooltip refs which were added/removed/modified to CHANGESET_FILE.
+    # sinks: text file-like objects the tables are written to instead of the files in output_dir, in the order of OUTPUT_FILES
+    # (e.g. sys.stdout or gzip.open(path, "wt", newline="")). They are flushed but not closed.
+    # keys: only write the tooltips of these keys (e.g. the abilities of a targeted run @see targeted.py)
+    def generate_tsv_files(self, log, incremental=False, sinks=None, output_dir=OUTPUT_DIR, keys=None):
         log.set_active_class("AbilityTooltipGenerator")
-        log.debug("~~~~~~~~~~~~~~~~~~~~ PRINTING TOOLTIPS ~~~~~~~~~~~~~~~~~~~~")
-        for tooltip in self.arr_tooltips:
-            log.debug(str(tooltip))
+        assert not (incremental and sinks != None), "Incremental output is only supported for the files in the output directory"
 
-        if not os.path.isdir("./out"):
-            os.mkdir("out")
+        if sinks == None and not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
 
         log.info("Started generating tsv files.")
-        tooltip_sort_order_file = open("out/unit_abilities_additional_ui_effects_tables.tsv", "w", newline="")
-        tooltip_sort_order_file.write("unit_abilities_additional_ui_effects_tables\t2\n")
-        tooltip_sort_order_file.write("key\tsort_order\n")
-
-        ability_to_tooltip_map_file = open("out/unit_abilities_to_additional_ui_effects_juncs_tables.tsv", "w", newline="")
-        ability_to_tooltip_map_file.write("unit_abilities_to_additional_ui_effects_juncs_tables\t0\n")
-        ability_to_tooltip_map_file.write("ability\teffect\n")
-
-        localisaton_file = open("out/th_damage_loc.tsv", "w", newline="")
-        localisaton_file.write("Loc PackedFile\t1\n")
-        localisaton_file.write("key\ttext\ttooltip\n")
-
-        for key in self.arr_tooltips:
-            for tooltip in self.arr_tooltips[key].values():        
-                log.info("Saving tooltip: " + str(tooltip))
-                tooltip_ref = self._create_tooltip_ref(tooltip)
-                tooltip_sort_order_file.write(tooltip_ref +"\t" + str(tooltip["tag"][1]) +"\n")
-                ability_to_tooltip_map_file.write(tooltip['key'] +"\t" + tooltip_ref +"\n")
-                if "contact" in tooltip_ref:
-                    localisaton_file.write('special_ability_phases_onscreen_name_' + tooltip["key"] +'\t' + self._format_contact_localisation(tooltip['localisation']) +'\ttrue\n')
-                else:
-                    localisaton_file.write('unit_abilities_additional_ui_effects_localised_text_' + tooltip_ref +'\t' + self._format_localisation(tooltip['localisation']) +'\ttrue\n')
-
-        tooltip_sort_order_file.close()
-        ability_to_tooltip_map_file.close()
-        localisaton_file.close()
+        timer = instruments.start("generate_tsv_files")
+        if incremental:
+            self._generate_tsv_files_incremental(log, output_dir, keys)
+        else:
+            if sinks == None: writer = TSVWriter(TSVWriter.open_files(self._get_output_paths(output_dir)), list(self.OUTPUT_FILES.values()))
+            else: writer = TSVWriter(sinks, list(self.OUTPUT_FILES.values()), close_sinks=False)
+            writer.write(rows for key, tooltip_ref, rows in self._generate_rows(log, keys))
+            writer.close()
+            log.info("Wrote %d tooltips.", writer.rows_written)
+        instruments.stop(timer)
         log.info("Finished generating tsv files.")
         log.reset_active_class()
 
+    def _get_output_paths(self, output_dir):
+        return [os.path.join(output_dir, file_name) for file_name in self.OUTPUT_FILES]
+
+    def _generate_tsv_files_incremental(self, log, output_dir, keys=None):
+        contents = [[header] for header in self.OUTPUT_FILES.values()]
+        row_hashes = {} # Map<tooltip_ref, hash of all rows of the tooltip>
+        for key, tooltip_ref, rows in self._generate_rows(log, keys):
+            for content, row in zip(contents, rows):
+                content.append(row)
+            row_hashes[tooltip_ref] = hashlib.sha1("".join(rows).encode()).hexdigest()
+
+        manifest_path = os.path.join(output_dir, self.MANIFEST_FILE)
+        manifest = self._read_manifest(manifest_path)
+        new_manifest = {"files": {}, "rows": row_hashes}
+        for file_name, content in zip(self.OUTPUT_FILES, contents):
+            path = os.path.join(output_dir, file_name)
+            data = "".join(content).encode()
+            file_hash = hashlib.sha1(data).hexdigest()
+            if self._is_output_unchanged(path, file_hash, manifest["files"].get(file_name)):
+                log.info("Skipping unchanged file: %s", path)
+            else:
+                log.info("Writing changed file: %s", path)
+                with open(path, "wb") as f:
+                    f.write(data)
+            stat = os.stat(path)
+            new_manifest["files"][file_name] = {"sha1": file_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        previous_rows = manifest["rows"]
+        changeset = {
+            "added":    [ref for ref in row_hashes if ref not in previous_rows],
+            "removed":  [ref for ref in previous_rows if ref not in row_hashes],
+            "modified": [ref for ref, row_hash in row_hashes.items() if ref in previous_rows and previous_rows[ref] != row_hash],
+        }
+        log.info("Changeset: %d added, %d removed, %d modified", len(changeset["added"]), len(changeset["removed"]), len(changeset["modified"]))
+
+        with open(os.path.join(output_dir, self.CHANGESET_FILE), "w") as f:
+            json.dump(changeset, f, indent=1)
+        with open(manifest_path, "w") as f:
+            json.dump(new_manifest, f)
+
+    # Replace the rows of the given tooltip keys in the output files of a previous run with the rows generated by this generator
+    # (e.g. the keys affected by a change @see DependencyIndex), the other rows are kept as they are.
+    # Rows of keys which no longer have tooltips are removed and rows of new keys are appended.
+    def patch_tsv_files(self, log, keys, output_dir=OUTPUT_DIR):
+        log.set_active_class("AbilityTooltipGenerator")
+        timer = instruments.start("patch_tsv_files")
+        new_rows = [{} for file_name in self.OUTPUT_FILES] # Map<key, rows> of every file
+        for key, tooltip_ref, rows in self._generate_rows(log, keys):
+            for file_rows, row in zip(new_rows, rows):
+                file_rows.setdefault(key, []).append(row)
+
+        for file_index, path in enumerate(self._get_output_paths(output_dir)):
+            if not os.path.exists(path): raise Exception("No previous output to patch: " + path)
+            with open(path, "r", newline="") as f:
+                lines = f.readlines()
+
+            # Keep the table name & headers
+            content = lines[:2]
+            patched_keys = set()
+            for line in lines[2:]:
+                key = self._get_row_key(file_index, line)
+                if key not in keys:
+                    content.append(line)
+                elif key not in patched_keys:
+                    # The rows of a key are contiguous, the new rows replace them at the same position
+                    content.extend(new_rows[file_index].get(key, []))
+                    patched_keys.add(key)
+            for key, rows in new_rows[file_index].items():
+                if key not in patched_keys: content.extend(rows)
+
+            with open(path, "w", newline="") as f:
+                f.write("".join(content))
+        log.info("Patched the tooltips of %d keys", len(keys))
+        instruments.stop(timer)
+        log.reset_active_class()
 
-    # Check if the contents of th_damage_loc (tooltip localisation) matches with the
-    # test loc file in any order (any line number).
-    def test_loc_integrity(self):
-        f_new = open("out/th_damage_loc.tsv", "r")
-        f_test = open("out/th_damage_loc_test.tsv", "r")
-
-        test_content = {}
-        test_lines = f_test.readlines()
-        for i in range(2, len(test_lines)):
-            line = test_lines[i].replace("\n", "").split("\t")
-            test_content[line[0]] = line[1]
-        f_test.close()
-
-        new_lines = f_new.readlines()
-        for i in range(2, len(new_lines)):
-            line = new_lines[i].replace("\n", "").split("\t")
-            assert line[0] in test_content and test_content[line[0]] == line[1], "Missing line: " + line
-
-    # Compare hashes of generated files with existing files (must end with "_test.tsv").
-    # Used to test if refactoring has changed the output in any way (missing tooltips or tooltips in different order).
-    def test_output_integrity_strict(self, test_ui_effects = True, test_ui_effects_juncs = True, test_loc = True):
-        if test_ui_effects: assert self.valid_hash("out/unit_abilities_additional_ui_effects_tables"), "Unit additional effects table mismatch"         # redundant with check to loc
-        if test_ui_effects_juncs: assert self.valid_hash("out/unit_abilities_to_additional_ui_effects_juncs_tables"), "UI effects juncs table mismatch" # redundant with check to loc
-        if test_loc: assert self.valid_hash("out/th_damage_loc"), "Localisation mismatch"
-        print("Hashes match")
-
-    def valid_hash(self, file):
-        h1 = self.hash(file +".tsv")
-        h2 = self.hash(file +"_test.tsv")
-        return h1["md5"] == h2["md5"] and h1["sha1"] == h2["sha1"] and h1["sha384"] == h2["sha384"]
-
-    def hash(self, file):
-        buffer_size = 65536
-        sha1 = hashlib.sha1()
-        sha384 = hashlib.sha384()
-        md5 = hashlib.md5()
-        with open(file, "rb") as f:
-            data = ""
-            while not data:
-                data = f.read(buffer_size)
-                sha1.update(data)
-                md5.update(data)
-                sha384.update(data)
-        return {"md5": md5.hexdigest(), "sha1": sha1.hexdigest(), "sha384": sha384.hexdigest()}
-
+    # Returns the tooltip key of a row of the output file at file_index in OUTPUT_FILES
+    def _get_row_key(self, file_index, row):
+        first_column = row.split("\t", 1)[0]
+        if file_index == 1: return first_column # ability junction: ability key
+        if file_index == 2:
+            if first_column.startswith(self.PHASE_LOC_PREFIX): return first_column[len(self.PHASE_LOC_PREFIX):]
+            first_column = first_column[len(self.EFFECT_LOC_PREFIX):]
+        # tooltip_ref = key + tag reference @see _create_tooltip_ref
+        for tag_reference in self.TAG_REFERENCES:
+            if first_column.endswith(tag_reference): return first_column[:-len(tag_reference)]
+        return first_column
+
+    def _read_manifest(self, manifest_path):
+        if not os.path.exists(manifest_path): return {"files": {}, "rows": {}}
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+
+    # The file on disk is trusted to match the manifest if its size and mtime haven't changed since it was recorded,
+    # otherwise (e.g. edited by hand) its content is hashed again.
+    def _is_output_unchanged(self, path, file_hash, manifest_entry):
+        if not os.path.exists(path): return False
+        stat = os.stat(path)
+        if manifest_entry != None and manifest_entry["size"] == stat.st_size and manifest_entry["mtime_ns"] == stat.st_mtime_ns:
+            return manifest_entry["sha1"] == file_hash
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest() == file_hash
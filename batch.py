@@ -0,0 +1,99 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import sys
+import os
+
+from logger import Logger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import FACTORIES, SCRIPT_DIR, make_factory
+from overlay import OverlayFactory
+
+# Generates the tooltips of several mods in one run.
+# The base game tables are parsed once and shared by all mods, each mod directory only needs to contain the rows it changes
+# or adds (merged with the base tables by primary key @see OverlayFactory). Mods are processed in parallel and the tooltips
+# of each mod are written to <out>/<mod directory name>/.
+# Usage: python batch.py [--format xml|tsv] [--base DIR] [--out DIR] [--processes N] MOD_DIR [MOD_DIR ...]
+
+# Tables shared by the mods processed in a worker process, set once per worker @see _init_worker
+_base_tables = None
+
+def get_mod_name(mod_dir):
+    return os.path.basename(os.path.normpath(mod_dir))
+
+# Raises if several mod directories have the same name (e.g. a/mod & b/mod), their tooltips & logs would overwrite each other
+def check_mod_names(mod_dirs):
+    mod_dirs_by_name = {}
+    for mod_dir in mod_dirs:
+        mod_dirs_by_name.setdefault(get_mod_name(mod_dir), []).append(mod_dir)
+    duplicates = ["{name} ({mod_dirs})".format(name=name, mod_dirs=", ".join(dirs)) for name, dirs in mod_dirs_by_name.items() if len(dirs) > 1]
+    if duplicates: raise Exception("Mod directories with the same name: " + "; ".join(duplicates))
+
+def _init_worker(base_tables):
+    global _base_tables
+    _base_tables = base_tables
+
+# Generates the tooltips of a single mod, returns the number of unit abilities with tooltips
+def generate_mod(format, mod_dir, out_dir):
+    mod_name = get_mod_name(mod_dir)
+    log = Logger("batch_" + mod_name + ".txt", level=Logger.INFO)
+    try:
+        mod_factory = make_factory(log, format, mod_dir, optional=True)
+        factory = OverlayFactory(log, _base_tables, [mod_factory.get_tables()])
+
+        atg = AbilityTooltipGenerator(log)
+        SpellManager(factory).generate_tooltips(atg, log)
+        atg.generate_tsv_files(log, output_dir=os.path.join(out_dir, mod_name))
+        # Tooltips are also generated for the projectiles, bombardments, vortexes & phases the abilities use
+        return sum(1 for key in factory.special_unit_abilities if key in atg.arr_tooltips)
+    finally:
+        log.close()
+
+# Returns Map<mod directory, number of unit abilities with tooltips or the exception raised while processing the mod>
+def generate_mods(format, base_dir, mod_dirs, out_dir, processes, log):
+    check_mod_names(mod_dirs)
+    log.info("Parsing base tables from %s", base_dir)
+    base_factory = make_factory(log, format, base_dir, optional=True)
+    base_tables = base_factory.get_tables()
+
+    results = {}
+    if processes > 1 and len(mod_dirs) > 1:
+        # The base tables are sent once to every worker instead of once per mod
+        with ProcessPoolExecutor(max_workers=min(processes, len(mod_dirs)), initializer=_init_worker, initargs=(base_tables,)) as executor:
+            futures = {mod_dir: executor.submit(generate_mod, format, mod_dir, out_dir) for mod_dir in mod_dirs}
+            for mod_dir, future in futures.items():
+                try: results[mod_dir] = future.result()
+                except Exception as e: results[mod_dir] = e
+    else:
+        _init_worker(base_tables)
+        for mod_dir in mod_dirs:
+            try: results[mod_dir] = generate_mod(format, mod_dir, out_dir)
+            except Exception as e: results[mod_dir] = e
+
+    for mod_dir, result in results.items():
+        if isinstance(result, Exception): log.error("Failed to generate tooltips for %s: %r", mod_dir, result)
+        else: log.info("Generated tooltips for %d unit abilities of %s", result, mod_dir)
+    return results
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generate the tooltips of several mods against the same base tables.")
+    parser.add_argument("mods", nargs="+", help="directories containing the tables (rows) changed by each mod")
+    parser.add_argument("--format", choices=list(FACTORIES), default="xml")
+    parser.add_argument("--base", help="directory of the base game tables (defaults to the sample tables of the format)")
+    parser.add_argument("--out", default="out", help="output directory, the tooltips of each mod are written to <out>/<mod>")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    try: check_mod_names(args.mods)
+    except Exception as e: parser.error(str(e))
+
+    log = Logger("batch.txt", level=Logger.INFO)
+    results = generate_mods(args.format, args.base or os.path.join(SCRIPT_DIR, args.format), args.mods, args.out, args.processes, log)
+    log.close()
+
+    failures = [mod_dir for mod_dir, result in results.items() if isinstance(result, Exception)]
+    for mod_dir, result in results.items():
+        print("{mod}: {result}".format(mod=mod_dir, result=("FAILED " + repr(result)) if mod_dir in failures else str(result) + " unit abilities"))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
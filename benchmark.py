@@ -0,0 +1,123 @@
+import statistics
+import argparse
+import platform
+import tempfile
+import json
+import time
+import sys
+import os
+
+from logger import NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import XMLFactory, TSVFactory, SCRIPT_DIR, get_table_paths
+
+# Times every stage of the pipeline (factory construction, tooltip generation, writing the tsv files)
+# for both factories on the bundled sample tables.
+# Results are appended to the history file and compared against the baseline to flag regressions.
+# Usage: python benchmark.py [--repeat N] [--tolerance 0.2] [--update-baseline] [--data DIR]
+# --data benchmarks tables generated by dataset_generator.py (DIR/xml & DIR/tsv) instead of the sample tables,
+# their results are not compared with the baseline.
+
+HISTORY_PATH = os.path.join(SCRIPT_DIR, "benchmarks", "history.jsonl")
+BASELINE_PATH = os.path.join(SCRIPT_DIR, "benchmarks", "baseline.json")
+
+# Factories benchmarked: name -> function creating the factory
+def get_factories(xml_dir=None, tsv_dir=None):
+    return {
+        "xml": lambda log: XMLFactory(log, *get_table_paths("xml", xml_dir)),
+        "xml_streaming": lambda log: XMLFactory(log, *get_table_paths("xml", xml_dir), streaming=True),
+        "tsv": lambda log: TSVFactory(log, *get_table_paths("tsv", tsv_dir)),
+    }
+
+def time_stage(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start, result)
+
+# Runs the whole pipeline once and returns the duration (in seconds) of every stage
+def run_pipeline(create_factory, log):
+    (factory_time, factory) = time_stage(lambda: create_factory(log))
+    atg = AbilityTooltipGenerator(log)
+    spell_manager = SpellManager(factory)
+    (generate_time, _) = time_stage(lambda: spell_manager.generate_tooltips(atg, log))
+    (write_time, _) = time_stage(lambda: atg.generate_tsv_files(log))
+    return {"factory": factory_time, "generate_tooltips": generate_time, "generate_tsv_files": write_time}
+
+# Returns Map<"factory/stage", {"min": seconds, "median": seconds}>
+def run_benchmarks(factories, repeat):
+    log = NullLogger()
+    results = {}
+    # Output files are written relative to the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            for factory_name, create_factory in factories.items():
+                timings = {}
+                for i in range(repeat):
+                    for stage, duration in run_pipeline(create_factory, log).items():
+                        timings.setdefault(stage, []).append(duration)
+                for stage, durations in timings.items():
+                    results[factory_name + "/" + stage] = {"min": min(durations), "median": statistics.median(durations)}
+        finally:
+            os.chdir(cwd)
+    return results
+
+# Returns the stages whose median is slower than the baseline by more than the tolerance (0.2 = 20%)
+def find_regressions(results, baseline, tolerance):
+    regressions = {}
+    for name, result in results.items():
+        if name not in baseline: continue
+        baseline_median = baseline[name]["median"]
+        if result["median"] > baseline_median * (1 + tolerance):
+            regressions[name] = {"baseline": baseline_median, "median": result["median"]}
+    return regressions
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the tooltip pipeline.")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs per factory")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline (0.2 = 20%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--data", help="directory of generated tables (see dataset_generator.py)")
+    args = parser.parse_args(argv)
+
+    if args.data:
+        factories = get_factories(os.path.join(args.data, "xml"), os.path.join(args.data, "tsv"))
+    else:
+        factories = get_factories()
+    results = run_benchmarks(factories, args.repeat)
+    for name, result in sorted(results.items()):
+        print("{name:<40} min: {min:8.4f}s  median: {median:8.4f}s".format(name=name, min=result["min"], median=result["median"]))
+
+    run = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "platform": platform.platform(), "repeat": args.repeat, "data": args.data, "results": results}
+    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+    with open(HISTORY_PATH, "a") as f:
+        f.write(json.dumps(run, sort_keys=True) + "\n")
+
+    # Baselines are only meaningful for the sample tables
+    if args.data: return 0
+
+    if args.update_baseline:
+        write_json(BASELINE_PATH, results)
+        print("Baseline updated: " + BASELINE_PATH)
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline found, run with --update-baseline to create one.")
+        return 0
+
+    with open(BASELINE_PATH, "r") as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for name, regression in sorted(regressions.items()):
+        print("REGRESSION {name}: {median:.4f}s (baseline: {baseline:.4f}s)".format(name=name, median=regression["median"], baseline=regression["baseline"]))
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
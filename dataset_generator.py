@@ -0,0 +1,171 @@
+import xml.etree.ElementTree as ET
+import argparse
+import random
+import sys
+import os
+
+# Generates synthetic tables at a chosen scale for load testing the factories and the SpellManager.
+# The bundled sample tables are used as a model: every row is copied scale times, each copy renames the keys it defines
+# and all references to them (bombardments -> projectiles -> explosions, abilities -> vortexes/bombardments/projectiles,
+# projectiles/vortexes/explosions -> phases) so the cross-references stay consistent.
+# Keys are renamed by appending a suffix which keeps _upgraded projectiles resolving to their base projectile.
+# Damage values are jittered so that copies don't all produce the same tooltip texts.
+# Usage: python dataset_generator.py --scale 10 --out synthetic [--format tsv|xml|both] [--seed 0]
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Table -> column holding the primary key
+KEY_COLUMNS = {
+    "special_ability_phases": "id",
+    "battle_vortexs": "vortex_key",
+    "projectiles_explosions": "key",
+    "projectiles": "key",
+    "projectile_bombardments": "bombardment_key",
+    "unit_special_abilities": "key",
+}
+
+# Table -> columns referencing the key of another (or the same) table
+REFERENCE_COLUMNS = {
+    "special_ability_phases": [],
+    "battle_vortexs": ["contact_effect"],
+    "projectiles_explosions": ["contact_phase_effect"],
+    "projectiles": ["explosion_type", "contact_stat_effect"],
+    "projectile_bombardments": ["projectile_type"],
+    "unit_special_abilities": ["activated_projectile", "vortex", "bombardment", "parent_ability", "miscast_explosion"],
+}
+
+# Table -> integer columns which are jittered in the copies
+JITTER_COLUMNS = {
+    "special_ability_phases": ["damage_amount"],
+    "battle_vortexs": ["damage", "damage_ap"],
+    "projectiles_explosions": ["detonation_damage", "detonation_damage_ap"],
+    "projectiles": ["damage", "ap_damage"],
+    "projectile_bombardments": [],
+    "unit_special_abilities": [],
+}
+
+PHASE_LOC_PREFIX = "special_ability_phases_onscreen_name_"
+
+class DatasetGenerator:
+    def __init__(self, scale, seed=0):
+        assert scale >= 1, "Scale must be at least 1"
+        self.scale = scale
+        self.random = random.Random(seed)
+        self.keys = set() # Primary keys of every table of the current format
+
+    def _get_suffix(self, copy):
+        return "" if copy == 0 else "_synth" + str(copy)
+
+    def _rename(self, value, suffix):
+        if value in self.keys: return value + suffix
+        return value
+
+    # The first copy keeps the original values
+    def _jitter(self, value, copy):
+        if copy == 0 or value in ("", None): return value
+        try: number = float(value)
+        except ValueError: return value
+        if number <= 0: return value
+        jittered = max(1, int(number) + self.random.randint(-int(number) // 4, int(number) // 4))
+        return str(jittered) if "." not in value else str(float(jittered))
+
+    # Returns the given copy of a row (Map<column, value>)
+    def _copy_row(self, table, row, copy):
+        suffix = self._get_suffix(copy)
+        row = dict(row)
+        key_column = KEY_COLUMNS[table]
+        row[key_column] = row[key_column] + suffix
+        for column in REFERENCE_COLUMNS[table]:
+            if column in row: row[column] = self._rename(row[column], suffix)
+        for column in JITTER_COLUMNS[table]:
+            if column in row: row[column] = self._jitter(row[column], copy)
+        return row
+
+    # TSV
+
+    def _read_tsv(self, path):
+        with open(path, "r") as f:
+            header_lines = [f.readline(), f.readline()]
+            headers = header_lines[1].rstrip("\n").split("\t")
+            rows = [dict(zip(headers, line.rstrip("\n").split("\t"))) for line in f]
+        return (header_lines, headers, rows)
+
+    def generate_tsv(self, source_dir, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        tables = {table: self._read_tsv(os.path.join(source_dir, table + ".tsv")) for table in KEY_COLUMNS}
+        self.keys = {row[KEY_COLUMNS[table]] for table, (header_lines, headers, rows) in tables.items() for row in rows}
+
+        for table, (header_lines, headers, rows) in tables.items():
+            with open(os.path.join(output_dir, table + ".tsv"), "w", newline="") as f:
+                f.writelines(header_lines)
+                for copy in range(self.scale):
+                    for row in rows:
+                        copied_row = self._copy_row(table, row, copy)
+                        f.write("\t".join(copied_row.get(header, "") for header in headers) + "\n")
+
+        # The phase localisation is keyed by the phase id
+        loc_path = os.path.join(source_dir, "special_ability_phases.tsv.loc")
+        if os.path.exists(loc_path):
+            (header_lines, headers, rows) = self._read_tsv(loc_path)
+            with open(os.path.join(output_dir, "special_ability_phases.tsv.loc"), "w", newline="") as f:
+                f.writelines(header_lines)
+                for copy in range(self.scale):
+                    suffix = self._get_suffix(copy)
+                    for row in rows:
+                        row = dict(row)
+                        if row["key"].startswith(PHASE_LOC_PREFIX) and row["key"][len(PHASE_LOC_PREFIX):] in self.keys:
+                            row["key"] += suffix
+                        f.write("\t".join(row.get(header, "") for header in headers) + "\n")
+
+    # XML
+
+    def generate_xml(self, source_dir, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        tables = {table: ET.parse(os.path.join(source_dir, table + ".xml")).getroot() for table in KEY_COLUMNS}
+        self.keys = {row.find(KEY_COLUMNS[table]).text for table, root in tables.items() for row in root.findall(table)}
+
+        for table, root in tables.items():
+            with open(os.path.join(output_dir, table + ".xml"), "w", encoding="utf-8") as f:
+                f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+                f.write(self._read_root_tag(os.path.join(source_dir, table + ".xml")) + "\n")
+                rows = root.findall(table)
+                for copy in range(self.scale):
+                    for row in rows:
+                        f.write(self._copy_xml_row(table, row, copy))
+                f.write("</dataroot>\n")
+
+    # ElementTree drops the namespace declarations of the root element, its start tag is copied as is from the source
+    def _read_root_tag(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read(1 << 16)
+        start = content.index("<dataroot")
+        return content[start:content.index(">", start) + 1]
+
+    def _copy_xml_row(self, table, row, copy):
+        values = {child.tag: child.text or "" for child in row}
+        copied_values = self._copy_row(table, values, copy)
+        element = ET.Element(row.tag, row.attrib)
+        if "record_key" in element.attrib:
+            element.set("record_key", copied_values[KEY_COLUMNS[table]])
+        for child in row:
+            ET.SubElement(element, child.tag).text = copied_values[child.tag]
+        element.tail = "\n"
+        return ET.tostring(element, encoding="unicode")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generate synthetic tables at a chosen scale.")
+    parser.add_argument("--scale", type=int, required=True, help="number of copies of every sample row")
+    parser.add_argument("--out", default="synthetic", help="output directory (tables are written to <out>/tsv and <out>/xml)")
+    parser.add_argument("--format", choices=["tsv", "xml", "both"], default="both")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.format in ("tsv", "both"):
+        DatasetGenerator(args.scale, args.seed).generate_tsv(os.path.join(SCRIPT_DIR, "tsv"), os.path.join(args.out, "tsv"))
+    if args.format in ("xml", "both"):
+        DatasetGenerator(args.scale, args.seed).generate_xml(os.path.join(SCRIPT_DIR, "xml"), os.path.join(args.out, "xml"))
+    print("Generated tables at scale {scale} in {out}".format(scale=args.scale, out=args.out))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
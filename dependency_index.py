@@ -0,0 +1,83 @@
+# Reverse dependency index of the tooltips: which tooltip keys (arr_tooltips keys of the AbilityTooltipGenerator)
+# have to be generated again when rows of the tables change.
+# e.g. a changed explosion affects the projectiles using it, the bombardments launching these projectiles
+# and all unit abilities copying the tooltips of these projectiles/bombardments.
+# Rows are identified by (table name, key) where the table name is one of AbstractFactory.TABLE_NAMES.
+class DependencyIndex:
+    def __init__(self, factory):
+        self.dependents = {}  # Map<(table name, key), set of tooltip keys generated from the row>
+        self.copied_by = {}   # Map<tooltip key, set of tooltip keys copying its tooltips>
+        self.copies_from = {} # Map<tooltip key, set of tooltip keys it copies the tooltips of>
+        self._build(factory)
+
+    def _add(self, table_name, key, tooltip_key):
+        if key == None: return
+        self.dependents.setdefault((table_name, key), set()).add(tooltip_key)
+
+    def _add_copy(self, tooltip_key, source_key):
+        self.copied_by.setdefault(source_key, set()).add(tooltip_key)
+        self.copies_from.setdefault(tooltip_key, set()).add(source_key)
+
+    # The projectile and its explosion are used for the tooltips of tooltip_key
+    def _add_projectile(self, projectile_key, projectiles, tooltip_key):
+        self._add("projectiles", projectile_key, tooltip_key)
+        projectile = projectiles.get(projectile_key)
+        if projectile != None: self._add("projectile_explosions", projectile.explosion_type, tooltip_key)
+
+    # Mirrors the references followed by SpellManager.generate_tooltips
+    def _build(self, factory):
+        projectiles = factory.get_projectiles()
+        bombardments = factory.get_bombardments()
+
+        for key in factory.get_ability_phases():
+            self._add("ability_phases", key, key)
+        for key in factory.get_vortexs():
+            self._add("vortexes", key, key)
+
+        for projectile in projectiles.values():
+            self._add_projectile(projectile.key, projectiles, projectile.key)
+            self._add("ability_phases", projectile.contact_stat_effect, projectile.key)
+            for bombardment in factory.get_bombardments_by_projectile().get(projectile.key, []):
+                # Projectiles used by bombardments don't have tooltips of their own
+                self._add("bombardments", bombardment.key, projectile.key)
+                self._add("bombardments", bombardment.key, bombardment.key)
+                self._add_projectile(projectile.key, projectiles, bombardment.key)
+
+        for unit_ability in factory.get_special_unit_abilities().values():
+            self._add("special_unit_abilities", unit_ability.key, unit_ability.key)
+            if unit_ability.used_vortex_key != None:
+                self._add_copy(unit_ability.key, unit_ability.used_vortex_key)
+            elif unit_ability.used_bombardment_key != None:
+                self._add_copy(unit_ability.key, unit_ability.used_bombardment_key)
+                # The bombardment tooltips are created by the first unit ability using it if no projectile created them
+                self._add("special_unit_abilities", unit_ability.key, unit_ability.used_bombardment_key)
+                self._add("bombardments", unit_ability.used_bombardment_key, unit_ability.key)
+                bombardment = bombardments.get(unit_ability.used_bombardment_key)
+                if bombardment != None: self._add_projectile(bombardment.projectile_type_key, projectiles, unit_ability.key)
+            elif unit_ability.used_projectile_key != None:
+                self._add_copy(unit_ability.key, unit_ability.used_projectile_key)
+                # The projectile tooltips are created by the first unit ability using it if it had none
+                self._add("special_unit_abilities", unit_ability.key, unit_ability.used_projectile_key)
+                self._add_projectile(unit_ability.used_projectile_key, projectiles, unit_ability.key)
+
+    # changes: Map<table name, keys of the changed (added, modified or removed) rows>
+    # Returns the set of tooltip keys which have to be generated again
+    def get_affected_keys(self, changes):
+        affected = set()
+        for table_name, keys in changes.items():
+            for key in keys:
+                affected.update(self.dependents.get((table_name, key), ()))
+        return self._get_closure(affected, self.copied_by)
+
+    # Returns the keys plus the keys they copy tooltips from, which must be generated with them @see SpellManager.generate_tooltips
+    def get_required_keys(self, keys):
+        return self._get_closure(set(keys), self.copies_from)
+
+    def _get_closure(self, keys, edges):
+        pending = list(keys)
+        while pending:
+            for other_key in edges.get(pending.pop(), ()):
+                if other_key not in keys:
+                    keys.add(other_key)
+                    pending.append(other_key)
+        return keys
@@ -0,0 +1,154 @@
+import argparse
+import hashlib
+import shutil
+import json
+import sys
+import os
+
+from logger import Logger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import FACTORIES, make_factory
+
+# Regression check of the output files against golden files, e.g. to make sure a refactoring didn't change the output.
+# Every file is hashed once in a single streaming pass (the hashes of the golden files are stored with them),
+# only the files whose hash differs are read again to find the rows which changed.
+# Usage: python golden.py [--format tsv|xml] [--dir DIR] [--out DIR] [--update] GOLDEN_DIR
+# --format generates the tooltips from the tables first, otherwise the files already in --out are checked.
+# --update replaces the golden files with the output files.
+# Exits with 1 if any output file differs from its golden file.
+
+GOLDEN_MANIFEST = "golden.json"
+# Column of the rows identifying them in the output files (the tooltip ref or the localisation key), in the order of OUTPUT_FILES
+KEY_COLUMNS = [0, 1, 0]
+HEADER_LINES = 2
+BUFFER_SIZE = 1 << 20
+
+# Returns the sha1 hex digest of the file, read in chunks of BUFFER_SIZE
+def hash_file(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(BUFFER_SIZE)
+            if not data: break
+            sha1.update(data)
+    return sha1.hexdigest()
+
+def get_file_entry(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": hash_file(path)}
+
+# Returns Map<file name, {"size", "mtime_ns", "sha1"}> of the golden files, hashed again if the manifest is missing
+# or the file changed since it was recorded
+def read_golden_hashes(golden_dir):
+    manifest_path = os.path.join(golden_dir, GOLDEN_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    hashes = {}
+    for file_name in AbilityTooltipGenerator.OUTPUT_FILES:
+        path = os.path.join(golden_dir, file_name)
+        if not os.path.exists(path): raise Exception("No golden file " + path)
+        stat = os.stat(path)
+        entry = manifest.get(file_name)
+        if entry == None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns: entry = get_file_entry(path)
+        hashes[file_name] = entry
+    return hashes
+
+# Copies the output files to the golden directory and stores their hashes
+def update_golden(output_dir, golden_dir):
+    os.makedirs(golden_dir, exist_ok=True)
+    manifest = {}
+    for file_name in AbilityTooltipGenerator.OUTPUT_FILES:
+        path = os.path.join(golden_dir, file_name)
+        shutil.copyfile(os.path.join(output_dir, file_name), path)
+        manifest[file_name] = get_file_entry(path)
+    with open(os.path.join(golden_dir, GOLDEN_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+# Returns (header lines, Map<row key, row>, keys of rows found more than once) of an output file. Line endings are kept.
+def read_rows(path, key_column):
+    rows = {}
+    duplicated = []
+    with open(path, "r", newline="") as f:
+        header = [f.readline() for i in range(HEADER_LINES)]
+        for row in f:
+            key = row.rstrip("\r\n").split("\t")[key_column]
+            if key in rows: duplicated.append(key)
+            rows[key] = row
+    return (header, rows, duplicated)
+
+# Returns the row level diff of an output file against its golden file:
+# {"header": whether the header lines differ, "added": [key], "removed": [key], "changed": [(key, golden row, output row)],
+#  "duplicated": [key], "reordered": whether only the order of the rows differs}
+def diff_rows(output_path, golden_path, key_column):
+    (golden_header, golden_rows, golden_duplicated) = read_rows(golden_path, key_column)
+    (header, rows, duplicated) = read_rows(output_path, key_column)
+    diff = {
+        "header": header != golden_header,
+        "added": [key for key in rows if key not in golden_rows],
+        "removed": [key for key in golden_rows if key not in rows],
+        "changed": [(key, golden_rows[key], row) for key, row in rows.items() if key in golden_rows and golden_rows[key] != row],
+        "duplicated": [key for key in duplicated if key not in golden_duplicated],
+    }
+    diff["reordered"] = not any(diff.values())
+    return diff
+
+# Returns Map<file name, diff or None if the output file matches its golden file> @see diff_rows
+def check_outputs(output_dir, golden_dir):
+    golden_hashes = read_golden_hashes(golden_dir)
+    results = {}
+    for file_index, file_name in enumerate(AbilityTooltipGenerator.OUTPUT_FILES):
+        path = os.path.join(output_dir, file_name)
+        golden = golden_hashes[file_name]
+        # Files of another size can't match, they aren't hashed
+        if os.path.getsize(path) == golden["size"] and hash_file(path) == golden["sha1"]:
+            results[file_name] = None
+        else:
+            results[file_name] = diff_rows(path, os.path.join(golden_dir, file_name), KEY_COLUMNS[file_index])
+    return results
+
+def print_diff(file_name, diff, max_rows):
+    print("{file}: {added} added, {removed} removed, {changed} changed".format(file=file_name, added=len(diff["added"]), removed=len(diff["removed"]), changed=len(diff["changed"])))
+    if diff["header"]: print("  header changed")
+    if diff["reordered"]: print("  same rows in a different order")
+    for key in diff["duplicated"][:max_rows]: print("  duplicated " + key)
+    for key in diff["added"][:max_rows]: print("  + " + key)
+    for key in diff["removed"][:max_rows]: print("  - " + key)
+    for (key, golden_row, row) in diff["changed"][:max_rows]:
+        print("  ~ " + key)
+        print("      golden: " + repr(golden_row))
+        print("      output: " + repr(row))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Check the output files against golden files.")
+    parser.add_argument("golden", help="directory of the golden files")
+    parser.add_argument("--format", choices=list(FACTORIES), help="generate the tooltips from the tables of this format first")
+    parser.add_argument("--dir", help="directory of the tables (defaults to the sample tables of the format)")
+    parser.add_argument("--out", default="out", help="directory of the output files")
+    parser.add_argument("--update", action="store_true", help="replace the golden files with the output files")
+    parser.add_argument("--max-rows", type=int, default=20, help="rows listed per kind of change and file")
+    args = parser.parse_args(argv)
+
+    if args.format:
+        log = Logger("golden.txt", level=Logger.INFO)
+        factory = make_factory(log, args.format, args.dir)
+        atg = AbilityTooltipGenerator(log)
+        SpellManager(factory).generate_tooltips(atg, log)
+        atg.generate_tsv_files(log, output_dir=args.out)
+        log.close()
+
+    if args.update:
+        update_golden(args.out, args.golden)
+        print("Golden files updated: " + args.golden)
+        return 0
+
+    results = check_outputs(args.out, args.golden)
+    for file_name, diff in results.items():
+        if diff == None: print(file_name + ": OK")
+        else: print_diff(file_name, diff, args.max_rows)
+    return 1 if any(diff != None for diff in results.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,63 @@
+import json
+import time
+import os
+
+# Wall/CPU timers and counters for the stages of a run, exported as a JSON report.
+# Disabled by default, timers and counters are no-ops until enable() is called.
+# e.g.
+#   timer = instruments.start("generate_tooltips.vortexes")
+#   ...
+#   instruments.stop(timer)
+#   instruments.count("bombardment_lookups")
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.timers = {}   # Map<name, {"wall": seconds, "cpu": seconds, "calls": int}>
+        self.counters = {} # Map<name, int>
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+
+    # Returns a token which must be passed to stop()
+    def start(self, name):
+        if not self.enabled: return None
+        return (name, time.perf_counter(), time.process_time())
+
+    def stop(self, token):
+        if token == None: return
+        (name, wall_start, cpu_start) = token
+        timer = self.timers.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+        timer["wall"] += time.perf_counter() - wall_start
+        timer["cpu"] += time.process_time() - cpu_start
+        timer["calls"] += 1
+
+    def count(self, name, amount=1):
+        if not self.enabled: return
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    # Add the timers & counters of a report collected somewhere else (e.g. in a worker process)
+    def merge(self, report):
+        if not self.enabled: return
+        for name, other in report["timers"].items():
+            timer = self.timers.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            for field in timer:
+                timer[field] += other[field]
+        for name, amount in report["counters"].items():
+            self.count(name, amount)
+
+    def report(self):
+        return {"timers": self.timers, "counters": self.counters}
+
+    def write_report(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1, sort_keys=True)
+
+# Shared by all the stages of a run
+instruments = Instrumentation()
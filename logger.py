@@ -1,27 +1,68 @@
 from datetime import datetime
+import threading
+import atexit
+import queue
 import os
 
 class Logger:
-    def __init__(self, output_file_name):
+    DEBUG = 10
+    INFO  = 20
+    WARN  = 30
+    ERROR = 40
+    NONE  = 100 # Disables all messages
+
+    # level:       messages below the level are discarded before they are formatted.
+    # buffer_size: size in bytes of the write buffer of each log file.
+    # background:  write messages on a separate thread instead of the caller's. Messages are still formatted by the caller
+    #              so they contain the values of the arguments at the time they are logged.
+    def __init__(self, output_file_name, level=DEBUG, buffer_size=65536, background=False):
         self.active_class = "Main"
         self.last_active_class = "Main"
+        self.level = level
+        self.closed = True
         if not os.path.isdir("./log"):
             os.mkdir("log")
-        
-        self.log_file = open("log/" + output_file_name, "w")
-        self.debug_file = open("log/debug.txt", "w")
-        
+
+        self.log_file = open("log/" + output_file_name, "w", buffering=buffer_size)
+        # The debug file is only created if debug messages are logged
+        self.debug_file = open("log/debug.txt", "w", buffering=buffer_size) if level <= self.DEBUG else None
+
+        self.closed = False
+        self.queue = None
+        self.writer_thread = None
+        self.write_error = None # First error of the writer thread, raised by flush or close
+        if background:
+            self.queue = queue.Queue()
+            self.writer_thread = threading.Thread(target=self._write_queued, name="LoggerWriter", daemon=True)
+            self.writer_thread.start()
+            atexit.register(self.close)
+
         self.log_file.write("Log file created at: " + str(datetime.now().strftime("%d/%m/%Y %H:%M:%S")) + "\n")
 
     def __del__(self):
+        self.close()
+
+    def close(self):
+        if self.closed: return
+        self.closed = True
+        if self.writer_thread != None:
+            self.queue.put(None)
+            self.writer_thread.join()
         self.log_file.write("~~~~~~~~~~~~~~ END OF LOG ~~~~~~~~~~~~~~\n")
         self.log_file.close()
-        self.debug_file.close()
+        if self.debug_file != None: self.debug_file.close()
+        self._raise_write_error()
+
+    def flush(self):
+        if self.writer_thread != None: self.queue.join()
+        self.log_file.flush()
+        if self.debug_file != None: self.debug_file.flush()
+        self._raise_write_error()
 
     def set_active_class(self, class_name):
         self.last_active_class = self.active_class
         self.active_class = class_name
-        self.info("Changed active class to: " +self.active_class)
+        self.info("Changed active class to: %s", self.active_class)
 
     def get_active_class(self):
         return self.active_class
@@ -29,17 +70,67 @@ class Logger:
     def reset_active_class(self):
         self.active_class = self.last_active_class
 
-    def warn(self, msg):
-        self.log_file.write("[WARN] - " +self.active_class +": " + msg +"\n")
+    # Used to skip building expensive messages (e.g. dumps) which would be discarded anyway
+    def is_enabled_for(self, level):
+        return level >= self.level
+
+    # Messages are formatted with msg % args only if they are logged e.g. log.debug("Adding vortex: %s", vortex)
+    def warn(self, msg, *args):
+        if self.level <= self.WARN: self._log(self.log_file, "[WARN] - ", msg, args)
+
+    def info(self, msg, *args):
+        if self.level <= self.INFO: self._log(self.log_file, "[INFO] - ", msg, args)
 
-    def info(self, msg):
-        self.log_file.write("[INFO] - " +self.active_class +": " + msg +"\n")
+    def error(self, msg, *args):
+        if self.level <= self.ERROR: self._log(self.log_file, "[ERROR] - ", msg, args)
 
-    def error(self, msg):
-        self.log_file.write("[ERROR] - " +self.active_class +": " + msg +"\n")
+    def debug(self, msg, *args):
+        if self.level <= self.DEBUG: self._log(self.debug_file, "[DEBUG] - ", msg, args)
 
-    def debug(self, msg):
-        self.debug_file.write("[DEBUG] - " +self.active_class +": " + msg +"\n")
+    def _log(self, file, prefix, msg, args):
+        if self.queue != None: self.queue.put((file, prefix, self.active_class, msg % args if args else msg, ()))
+        else: self._write(file, prefix, self.active_class, msg, args)
+
+    def _write(self, file, prefix, active_class, msg, args):
+        if args: msg = msg % args
+        file.write(prefix + active_class + ": " + msg + "\n")
+
+    def _write_queued(self):
+        while True:
+            record = self.queue.get()
+            # Every record is marked as done even if it can't be written, otherwise flush would wait forever.
+            # The first error is raised by the next flush or close instead of being lost with the thread.
+            try:
+                if record == None: return
+                self._write(*record)
+            except Exception as e:
+                if self.write_error == None: self.write_error = e
+            finally:
+                self.queue.task_done()
+
+    def _raise_write_error(self):
+        error = self.write_error
+        if error != None:
+            self.write_error = None
+            raise error
 
     def _get_current_time(self):
-        return str(datetime.now().strftime("%H:%M:%S"))
\ No newline at end of file
+        return str(datetime.now().strftime("%H:%M:%S"))
+
+# Logger which discards everything without creating any files.
+class NullLogger(Logger):
+    def __init__(self, *args, **kwargs):
+        self.active_class = "Main"
+        self.last_active_class = "Main"
+        self.level = Logger.NONE
+
+    def __del__(self): pass
+    def close(self): pass
+    def flush(self): pass
+    def set_active_class(self, class_name): pass
+    def reset_active_class(self): pass
+    def is_enabled_for(self, level): return False
+    def warn(self, msg, *args): pass
+    def info(self, msg, *args): pass
+    def error(self, msg, *args): pass
+    def debug(self, msg, *args): pass
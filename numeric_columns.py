@@ -0,0 +1,93 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Derives the numbers shown in the tooltips (max damage of phases, chance percentages, radiuses...) for a whole table
+# in one pass, the text templates are then filled from the returned columns (Map<column, list>, in the order of the rows).
+# The columns are computed with NumPy if it is installed, otherwise row by row with the scalar functions below
+# which are also used by the entities (e.g. AbilityPhase.get_damage_txt) so both paths produce the same values.
+
+# Below this amount of rows converting the table to arrays costs more than it saves
+NUMPY_MIN_ROWS = 256
+
+# Whole numbers are displayed without decimals e.g. 20.0 -> 20
+def format_number(value):
+    return int(value) if float(value).is_integer() else value
+
+# None if the phase lasts until all entities die
+def get_phase_max_damage(dmg, duration, frequency):
+    return None if duration <= 0 else int((duration/frequency) * dmg)
+
+def get_chance_percent(chance):
+    return int(100 * chance)
+
+def _use_numpy(rows):
+    return numpy != None and len(rows) >= NUMPY_MIN_ROWS
+
+def _to_array(rows, attribute):
+    return numpy.fromiter((getattr(row, attribute) for row in rows), dtype=numpy.float64, count=len(rows))
+
+# Vectorized format_number: Python ints for whole numbers, Python floats otherwise (including inf & nan like float.is_integer)
+def _format_numbers(values):
+    formatted = values.astype(object)
+    is_integer = numpy.isfinite(values) & (values == numpy.floor(values))
+    formatted[is_integer] = values[is_integer].astype(numpy.int64).astype(object)
+    return formatted.tolist()
+
+# phases: list of AbilityPhase
+def compute_phase_columns(phases):
+    if not _use_numpy(phases):
+        return {
+            "is_damaging": [phase.dmg > 0 and phase.max_damaged_entities > 0 for phase in phases],
+            "max_damage":  [get_phase_max_damage(phase.dmg, phase.duration, phase.frequency) for phase in phases],
+            "chance":      [get_chance_percent(phase.dmg_chance) for phase in phases],
+            "time":        [format_number(phase.frequency) for phase in phases],
+        }
+
+    dmg = _to_array(phases, "dmg")
+    duration = _to_array(phases, "duration")
+    frequency = _to_array(phases, "frequency")
+    max_damage = ((duration / frequency) * dmg).astype(numpy.int64).astype(object) # astype truncates like int()
+    max_damage[duration <= 0] = None
+    return {
+        "is_damaging": ((dmg > 0) & (_to_array(phases, "max_damaged_entities") > 0)).tolist(),
+        "max_damage":  max_damage.tolist(),
+        "chance":      (100 * _to_array(phases, "dmg_chance")).astype(numpy.int64).tolist(),
+        "time":        _format_numbers(frequency),
+    }
+
+# vortexes: list of Vortex
+def compute_vortex_columns(vortexes):
+    if not _use_numpy(vortexes):
+        return {
+            "is_equal_radius": [vortex.start_radius == vortex.goal_radius for vortex in vortexes],
+            "is_expanding":    [vortex.expansion_speed > 0 for vortex in vortexes],
+            "start_radius":    [format_number(vortex.start_radius) for vortex in vortexes],
+            "goal_radius":     [format_number(vortex.goal_radius) for vortex in vortexes],
+            "expansion_speed": [format_number(vortex.expansion_speed) for vortex in vortexes],
+        }
+
+    start_radius = _to_array(vortexes, "start_radius")
+    goal_radius = _to_array(vortexes, "goal_radius")
+    expansion_speed = _to_array(vortexes, "expansion_speed")
+    return {
+        "is_equal_radius": (start_radius == goal_radius).tolist(),
+        "is_expanding":    (expansion_speed > 0).tolist(),
+        "start_radius":    _format_numbers(start_radius),
+        "goal_radius":     _format_numbers(goal_radius),
+        "expansion_speed": _format_numbers(expansion_speed),
+    }
+
+# projectiles: list of Projectile
+def compute_projectile_columns(projectiles):
+    if not _use_numpy(projectiles):
+        return {
+            "is_damaging":       [projectile.dmg > 0 or projectile.dmgap > 0 for projectile in projectiles],
+            "has_bonus_v_large": [projectile.bonus_v_large > 0 for projectile in projectiles],
+        }
+
+    return {
+        "is_damaging":       ((_to_array(projectiles, "dmg") > 0) | (_to_array(projectiles, "dmgap") > 0)).tolist(),
+        "has_bonus_v_large": (_to_array(projectiles, "bonus_v_large") > 0).tolist(),
+    }
@@ -0,0 +1,83 @@
+from collections.abc import Mapping
+from instrumentation import instruments
+from structs import AbstractFactory
+import copy
+
+# Read-only view of a base table with any number of delta tables applied on top of it, merged by primary key.
+# The last delta containing a key wins (like the load order of pack files), the base table is never copied or modified.
+# Keys keep the order of the base table, keys added by the deltas follow in the order of the deltas.
+class OverlayTable(Mapping):
+    def __init__(self, base, deltas=[]):
+        self.layers = [base] + list(deltas)
+        self.keys_in_order = None # Computed on the first iteration
+
+    # Keys of the layer which aren't already in the table are added after the keys of the previous layers
+    def add_layer(self, delta):
+        if self.keys_in_order != None and any(key not in self for key in delta):
+            self.keys_in_order = None
+        self.layers.append(delta)
+
+    def __getitem__(self, key):
+        for layer in reversed(self.layers):
+            if key in layer: return layer[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return any(key in layer for layer in self.layers)
+
+    def __iter__(self):
+        if self.keys_in_order == None:
+            keys = dict.fromkeys(self.layers[0])
+            for delta in self.layers[1:]:
+                keys.update(dict.fromkeys(delta))
+            self.keys_in_order = list(keys)
+        return iter(self.keys_in_order)
+
+    def __len__(self):
+        if self.keys_in_order == None: iter(self)
+        return len(self.keys_in_order)
+
+# Factory merging the tables of a base factory (e.g. the base game) with the tables of mods (delta tables),
+# each table is an OverlayTable so only the rows of the mods are parsed and stored.
+# base_tables & delta_tables: Map<table name, table> @see AbstractFactory.get_tables
+# e.g.
+#   mod = TSVFactory(log, "mod/projectiles.tsv", None, None, None, "mod/battle_vortexs.tsv", None)
+#   factory = OverlayFactory(log, base_factory.get_tables(), [mod.get_tables()])
+class OverlayFactory(AbstractFactory):
+    def __init__(self, logger, base_tables, delta_tables):
+        super(OverlayFactory, self).__init__(logger)
+        self.log.set_active_class("OverlayFactory")
+        for table_name in self.TABLE_NAMES:
+            deltas = [tables[table_name] for tables in delta_tables if len(tables[table_name]) > 0]
+            setattr(self, table_name, OverlayTable(base_tables[table_name], deltas))
+            self.log.info("Merged %s: %d rows from %d deltas", table_name, sum(len(delta) for delta in deltas), len(deltas))
+
+        self._link_tables()
+        self.log.reset_active_class()
+
+    # Projectiles are shared with the base & delta tables, the ones whose explosion changed are copied before being linked
+    # and stored in an additional layer.
+    def _link_tables(self):
+        timer = instruments.start("link_tables")
+        relinked = {}
+        for projectile in self.projectiles.values():
+            projectile_explosion = self._get_linked_explosion(projectile)
+            if projectile.get_projectile_explosion_ref() is not projectile_explosion:
+                projectile = copy.copy(projectile)
+                projectile.ref_projectile_explosion = projectile_explosion
+                relinked[projectile.key] = projectile
+        if relinked:
+            self.log.info("Linked %d projectiles to new explosions", len(relinked))
+            self.projectiles.add_layer(relinked)
+        self._index_bombardments()
+        instruments.stop(timer)
+
+    # Rows are parsed by the factories of the base & delta tables
+    def create_ability_phase(self, source): raise Exception("OverlayFactory doesn't parse tables")
+    def create_vortex(self, source): raise Exception("OverlayFactory doesn't parse tables")
+    def create_special_unit_ability(self, source): raise Exception("OverlayFactory doesn't parse tables")
+    def create_projectile_explosion(self, source): raise Exception("OverlayFactory doesn't parse tables")
+    def create_projectile(self, source): raise Exception("OverlayFactory doesn't parse tables")
+    def create_bombardment(self, source): raise Exception("OverlayFactory doesn't parse tables")
+    def _read_table_rows(self, table_name, fingerprints=True): raise Exception("OverlayFactory doesn't parse tables")
+    def read_table_columns(self, table_name, columns): raise Exception("OverlayFactory doesn't parse tables")
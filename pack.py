@@ -0,0 +1,352 @@
+from functools import lru_cache
+import argparse
+import struct
+import json
+import mmap
+import sys
+
+from logger import Logger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import AbstractFactory, TSVFactory
+from instrumentation import instruments
+
+# Reads the DB tables & localisation the tooltips are generated from directly from .pack files (PFH4/PFH5 e.g. Warhammer 2)
+# instead of tables exported with the assembly kit or RPFM.
+# Packs are memory mapped and only the index, the fragments of the six tables and the entries of the .loc files
+# with the onscreen names of phases are read, every other file of the pack is never touched.
+# Usage: python pack.py --schema SCHEMA [--out DIR] PACK [PACK ...]
+
+# Pack header flags
+PFH_HAS_ENCRYPTED_DATA = 0x10
+PFH_HAS_INDEX_WITH_TIMESTAMPS = 0x40
+PFH_HAS_ENCRYPTED_INDEX = 0x80
+PFH_HAS_EXTENDED_HEADER = 0x100
+PFH_TYPE_MOD = 3
+
+PFH_HEADER = struct.Struct("<4s6I") # preamble, flags, pack count, pack index size, file count, file index size, timestamp
+PFH_EXTENDED_HEADER_SIZE = 20
+
+# Markers preceding the optional guid & version of a DB table
+DB_GUID_MARKER = b"\xfd\xfe\xfc\xff"
+DB_VERSION_MARKER = b"\xfc\xfd\xfe\xff"
+LOC_HEADER = b"\xff\xfeLOC\x00"
+
+U8 = struct.Struct("<B")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+I32 = struct.Struct("<i")
+# Size of the fixed size fields of DB tables
+FIELD_SIZES = {"Boolean": 1, "I16": 2, "I32": 4, "I64": 8, "F32": 4, "F64": 8, "ColourRGB": 4}
+FIELD_STRUCTS = {"I16": struct.Struct("<h"), "I32": I32, "I64": struct.Struct("<q"), "F64": struct.Struct("<d"), "ColourRGB": U32}
+
+# Floats are stored with single precision, 0.1 is read back as 0.10000000149011612.
+# Returns the shortest float which is stored as the same bits (the value as entered in the tables) like the exported tables.
+@lru_cache(maxsize=65536)
+def _f32_to_float(bits):
+    packed = U32.pack(bits)
+    value = struct.unpack("<f", packed)[0]
+    for precision in range(1, 10):
+        rounded = float("%.*g" % (precision, value))
+        if struct.pack("<f", rounded) == packed: return rounded
+    return value
+
+# A memory mapped pack. Files are read in place from the mapping (data) at the offset of the file, only the decoded values are copied.
+class PackFile:
+    def __init__(self, path):
+        self.path = path
+        self.files = {} # Map<path with "/" separators, (offset, size)> in the order of the pack index
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_index()
+        except:
+            self.close()
+            raise
+
+    def _read_index(self):
+        (preamble, flags, pack_count, pack_index_size, file_count, file_index_size, timestamp) = PFH_HEADER.unpack_from(self.data, 0)
+        if preamble not in (b"PFH4", b"PFH5"): raise Exception("Unsupported pack format {preamble} of {path}".format(preamble=preamble, path=self.path))
+        if flags & (PFH_HAS_ENCRYPTED_INDEX | PFH_HAS_ENCRYPTED_DATA): raise Exception("Encrypted packs aren't supported: " + self.path)
+
+        position = PFH_HEADER.size + (PFH_EXTENDED_HEADER_SIZE if flags & PFH_HAS_EXTENDED_HEADER else 0)
+        # The names of the packs this pack depends on
+        position += pack_index_size
+        offset = position + file_index_size
+        has_timestamps = flags & PFH_HAS_INDEX_WITH_TIMESTAMPS
+        has_compression = preamble == b"PFH5"
+        for i in range(file_count):
+            size = U32.unpack_from(self.data, position)[0]
+            position += 4
+            if has_timestamps: position += 4
+            is_compressed = False
+            if has_compression:
+                is_compressed = self.data[position] != 0
+                position += 1
+            end = self.data.find(b"\x00", position)
+            file_path = self.data[position:end].decode("utf-8").replace("\\", "/")
+            position = end + 1
+            if is_compressed: raise Exception("Compressed files aren't supported: {file} in {path}".format(file=file_path, path=self.path))
+            self.files[file_path] = (offset, size)
+            offset += size
+
+    # Returns the offset of the file in data
+    def get_offset(self, file_path):
+        return self.files[file_path][0]
+
+    # Returns the paths of the files in the folder e.g. db/projectiles_tables
+    def list_folder(self, folder):
+        prefix = folder.rstrip("/") + "/"
+        return [file_path for file_path in self.files if file_path.startswith(prefix)]
+
+    def close(self):
+        self.data.close()
+
+# Returns (version, number of rows, offset of the first row) of the DB table file at offset
+def read_db_header(data, offset):
+    position = offset
+    if data[position:position + 4] == DB_GUID_MARKER:
+        position += 6 + 2 * U16.unpack_from(data, position + 4)[0]
+    version = 0
+    if data[position:position + 4] == DB_VERSION_MARKER:
+        version = I32.unpack_from(data, position + 4)[0]
+        position += 8
+    # Unknown byte, always 1
+    position += 1
+    row_count = U32.unpack_from(data, position)[0]
+    return (version, row_count, position + 4)
+
+# Yields (start offset, end offset, Map<column, value>) for every row of the DB table file at offset.
+# fields: [(column name, field type)] of the version of the table, only the columns in columns are decoded,
+# the others are skipped without reading their values.
+def read_db_rows(data, offset, fields, columns):
+    (version, row_count, position) = read_db_header(data, offset)
+    fields = [(name, field_type, name in columns) for (name, field_type) in fields]
+    for i in range(row_count):
+        start = position
+        row = {}
+        for (name, field_type, decode) in fields:
+            if field_type == "Boolean":
+                if decode: row[name] = data[position] != 0
+                position += 1
+            elif field_type == "F32":
+                if decode: row[name] = _f32_to_float(U32.unpack_from(data, position)[0])
+                position += 4
+            elif field_type in FIELD_STRUCTS:
+                if decode: row[name] = FIELD_STRUCTS[field_type].unpack_from(data, position)[0]
+                position += FIELD_SIZES[field_type]
+            elif field_type.startswith("OptionalString") and data[position] == 0:
+                if decode: row[name] = ""
+                position += 1
+            elif field_type.endswith("StringU8"):
+                if field_type.startswith("Optional"): position += 1
+                length = U16.unpack_from(data, position)[0]
+                if decode: row[name] = str(data[position + 2:position + 2 + length], "utf-8")
+                position += 2 + length
+            elif field_type.endswith("StringU16"):
+                if field_type.startswith("Optional"): position += 1
+                length = 2 * U16.unpack_from(data, position)[0]
+                if decode: row[name] = str(data[position + 2:position + 2 + length], "utf-16-le")
+                position += 2 + length
+            else:
+                raise Exception("Unsupported field type {field_type} of column {name}".format(field_type=field_type, name=name))
+        yield (start, position, row)
+
+# Yields (key, text) of the entries of the .loc file at offset whose key starts with prefix, the other entries are skipped without being decoded
+def read_loc_entries(data, offset, prefix=""):
+    if data[offset:offset + len(LOC_HEADER)] != LOC_HEADER: raise Exception("Invalid loc file")
+    # Header, version
+    position = offset + len(LOC_HEADER) + 4
+    entry_count = U32.unpack_from(data, position)[0]
+    position += 4
+    encoded_prefix = prefix.encode("utf-16-le")
+    for i in range(entry_count):
+        key_length = 2 * U16.unpack_from(data, position)[0]
+        key_start = position + 2
+        position = key_start + key_length
+        text_length = 2 * U16.unpack_from(data, position)[0]
+        text_start = position + 2
+        # Text, tooltip flag
+        position = text_start + text_length + 1
+        if data[key_start:key_start + len(encoded_prefix)] == encoded_prefix:
+            yield (str(data[key_start:key_start + key_length], "utf-16-le"), str(data[text_start:text_start + text_length], "utf-16-le"))
+
+# Encoders used to build packs e.g. small packs for testing from exported tables
+
+def _encode_string_u8(value):
+    encoded = value.encode("utf-8")
+    return U16.pack(len(encoded)) + encoded
+
+def _encode_string_u16(value):
+    return U16.pack(len(value)) + value.encode("utf-16-le")
+
+# rows: [Map<column, value>] with a value for every field
+def encode_db_table(fields, version, rows):
+    chunks = [DB_VERSION_MARKER, I32.pack(version), b"\x01", U32.pack(len(rows))]
+    for row in rows:
+        for (name, field_type) in fields:
+            value = row[name]
+            if field_type == "Boolean": chunks.append(U8.pack(1 if value else 0))
+            elif field_type == "F32": chunks.append(struct.pack("<f", value))
+            elif field_type in FIELD_STRUCTS: chunks.append(FIELD_STRUCTS[field_type].pack(value))
+            elif field_type.startswith("OptionalString") and not value: chunks.append(b"\x00")
+            else:
+                if field_type.startswith("Optional"): chunks.append(b"\x01")
+                chunks.append(_encode_string_u8(value or "") if field_type.endswith("StringU8") else _encode_string_u16(value or ""))
+    return b"".join(chunks)
+
+# entries: [(key, text)]
+def encode_loc(entries):
+    chunks = [LOC_HEADER, U32.pack(1), U32.pack(len(entries))]
+    for (key, text) in entries:
+        chunks.append(_encode_string_u16(key) + _encode_string_u16(text) + b"\x01")
+    return b"".join(chunks)
+
+# files: Map<path e.g. db/projectiles_tables/data__, content>
+def write_pack(path, files, pack_type=PFH_TYPE_MOD):
+    index = [U32.pack(len(content)) + b"\x00" + file_path.replace("/", "\\").encode("utf-8") + b"\x00" for file_path, content in files.items()]
+    with open(path, "wb") as f:
+        f.write(PFH_HEADER.pack(b"PFH5", pack_type, 0, 0, len(files), sum(len(entry) for entry in index), 0))
+        f.write(b"".join(index))
+        for content in files.values():
+            f.write(content)
+
+# Generate structs from the DB tables of pack files.
+# pack_paths: packs in load order, rows of later packs replace the rows with the same key of earlier packs (e.g. data.pack, then mods).
+# Within a pack the fragments of a table are applied in reverse alphabetical order so the first fragment (e.g. !my_mod) wins like in game.
+# schema: Map<DB table name e.g. projectiles_tables, Map<version, [(column name, field type)]>> e.g. converted from the RPFM schema of the game.
+# Field types are the ones of RPFM (Boolean, F32, I32, StringU8, OptionalStringU8...).
+# The rows are read into the same columns as exported tsv files and built by the constructors of the TSVFactory.
+class PackFactory(TSVFactory):
+    # Factory table -> DB table
+    DB_TABLES = {
+        "projectile_explosions": "projectiles_explosions_tables", "projectiles": "projectiles_tables", "bombardments": "projectile_bombardments_tables",
+        "special_unit_abilities": "unit_special_abilities_tables", "vortexes": "battle_vortexs_tables", "ability_phases": "special_ability_phases_tables",
+    }
+    PHASE_LOC_PREFIX = "special_ability_phases_onscreen_name_"
+
+    def __init__(self, logger, pack_paths, schema, cache=None, processes=1, deferred=False, keys=None):
+        AbstractFactory.__init__(self, logger, cache, processes, deferred, keys)
+        logger.set_active_class("PackFactory")
+        self.pack_paths = list(pack_paths)
+        self.schema = schema
+        self.packs = None # Packs opened for the duration of the constructor
+        self.ability_phase_localisation = {}
+
+        self.packs = [PackFile(path) for path in self.pack_paths]
+        try:
+            # The source paths are the packs, a table is parsed again if any pack changed @see TableCache
+            self._load_tables([(table_name, self.pack_paths, "parse_pack_table", (table_name,)) for table_name in self.DB_TABLES])
+        finally:
+            self._close_packs()
+
+        self._link_tables()
+        logger.reset_active_class()
+
+    # Loads a schema from a json file in the form {"projectiles_tables": {"45": [["key", "StringU8"], ...]}}
+    @staticmethod
+    def load_schema(path):
+        with open(path, "r") as f:
+            schema = json.load(f)
+        return {table: {int(version): [tuple(field) for field in fields] for version, fields in versions.items()} for table, versions in schema.items()}
+
+    def _get_worker_state(self): return {"pack_paths": self.pack_paths, "schema": self.schema, "packs": None, "ability_phase_localisation": {}}
+
+    def _close_packs(self):
+        if self.packs == None: return
+        for pack in self.packs:
+            pack.close()
+        self.packs = None
+
+    def parse_pack_table(self, table_name):
+        opened = self.packs == None
+        if opened: self.packs = [PackFile(path) for path in self.pack_paths]
+        try:
+            rows_parsed = 0
+            constructor = getattr(self, self.CONSTRUCTORS[table_name])
+            for (data, start, end, row) in self._read_pack_rows(table_name):
+                constructor(row)
+                rows_parsed += 1
+            instruments.count("rows_parsed." + table_name, rows_parsed)
+        finally:
+            if opened: self._close_packs()
+
+    # The packs are opened again as they may have changed since the last call.
+    # The fingerprint of a row is its encoded row (and the onscreen name of phases as it is joined from the localisation)
+    def _read_table_rows(self, table_name, fingerprints=True):
+        self.packs = [PackFile(path) for path in self.pack_paths]
+        try:
+            constructor = getattr(self, self.CONSTRUCTORS[table_name])
+            for (data, start, end, row) in self._read_pack_rows(table_name):
+                fingerprint = bytes(data[start:end]) if fingerprints else None
+                if fingerprints and table_name == "ability_phases":
+                    fingerprint += self.ability_phase_localisation.get(self.PHASE_LOC_PREFIX + row["id"], "").encode()
+                yield (fingerprint, lambda row=row: constructor(row))
+        finally:
+            self._close_packs()
+
+    def read_table_columns(self, table_name, columns):
+        self.packs = [PackFile(path) for path in self.pack_paths]
+        try:
+            for (data, start, end, row) in self._read_db_rows(table_name, columns):
+                yield tuple(row[column] or None for column in columns)
+        finally:
+            self._close_packs()
+
+    # Yields (file data, start offset, end offset, row) for every row of the table in the packs
+    def _read_pack_rows(self, table_name):
+        if table_name == "ability_phases": self._read_phase_loc()
+        schema = self.SCHEMAS[self.DB_TABLES[table_name]]
+        key_column = self.KEY_COLUMNS[table_name]
+        for (data, start, end, row) in self._read_db_rows(table_name, schema):
+            # The key is decoded like the other columns, the row is skipped before its values are cast & built
+            if self.keys != None and row[key_column] not in self.keys: continue
+            self._cast_pack_row(row, schema)
+            yield (data, start, end, row)
+
+    # Yields (file data, start offset, end offset, row) with the raw values of the columns for every row of the table in the packs
+    def _read_db_rows(self, table_name, columns):
+        db_table = self.DB_TABLES[table_name]
+        for pack in self.packs:
+            for file_path in sorted(pack.list_folder("db/" + db_table), reverse=True):
+                data = pack.data
+                offset = pack.get_offset(file_path)
+                version = read_db_header(data, offset)[0]
+                fields = self.schema.get(db_table, {}).get(version)
+                if fields == None: raise Exception("No schema for version {version} of {table} ({file} in {pack})".format(version=version, table=db_table, file=file_path, pack=pack.path))
+                for (start, end, row) in read_db_rows(data, offset, fields, columns):
+                    yield (data, start, end, row)
+
+    # Cast the values like the cells of tsv files (e.g. damage stored as a float, empty references) @see TSVFactory.SCHEMAS
+    def _cast_pack_row(self, row, schema):
+        for column, column_type in schema.items():
+            value = row[column]
+            if column_type == self.TYPE_INT: row[column] = int(value)
+            elif column_type == self.TYPE_FLOAT: row[column] = float(value)
+            elif column_type == self.TYPE_STR: row[column] = value or None
+
+    def _read_phase_loc(self):
+        self.ability_phase_localisation = {}
+        for pack in self.packs:
+            for file_path in pack.files:
+                if not file_path.endswith(".loc"): continue
+                for (key, text) in read_loc_entries(pack.data, pack.get_offset(file_path), self.PHASE_LOC_PREFIX):
+                    self.ability_phase_localisation[key] = text
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generate the tooltips from the DB tables of pack files.")
+    parser.add_argument("packs", nargs="+", help="pack files in load order, rows of later packs replace the rows of earlier packs")
+    parser.add_argument("--schema", required=True, help="json schema of the DB tables @see PackFactory.load_schema")
+    parser.add_argument("--out", default="out", help="output directory")
+    args = parser.parse_args(argv)
+
+    log = Logger("pack.txt", level=Logger.INFO)
+    factory = PackFactory(log, args.packs, PackFactory.load_schema(args.schema))
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(factory).generate_tooltips(atg, log)
+    atg.generate_tsv_files(log, output_dir=args.out)
+    log.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
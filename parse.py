@@ -2,8 +2,10 @@ from logger import Logger
 from spell_manager import SpellManager
 from ability_tooltip_generator import AbilityTooltipGenerator
 from structs import XMLFactory, TSVFactory, FactoryBuilder
+from instrumentation import instruments
 
 
+# Use Logger("log.txt", level=Logger.INFO) to skip debug messages or NullLogger() to disable logging completely
 log = Logger("log.txt")
 """
 # Create tooltips for only vortex spells from tsv files
@@ -17,6 +19,9 @@ spell_manager.generate_tooltips(atg, log)
 atg.generate_tsv_files(log)
 """
 
+# Stage timings & counters are written to log/instrumentation.json at the end of the run
+instruments.enable()
+
 # Use either XML or TSV factory
 factory = XMLFactory(log, "xml/projectiles.xml", "xml/projectile_bombardments.xml", "xml/projectiles_explosions.xml", "xml/unit_special_abilities.xml", "xml/battle_vortexs.xml", "xml/special_ability_phases.xml")
 #factory2 = TSVFactory(log, "tsv/projectiles.tsv", "tsv/projectile_bombardments.tsv", "tsv/projectiles_explosions.tsv", "tsv/unit_special_abilities.tsv", "tsv/battle_vortexs.tsv", "tsv/special_ability_phases.tsv")
@@ -27,4 +32,6 @@ spell_manager.generate_tooltips(atg, log)
 atg.generate_tsv_files(log)
 
 
-#atg.test_loc_integrity()
+# Compare the output with golden files: python golden.py GOLDEN_DIR (@see golden.py)
+
+instruments.write_report("log/instrumentation.json")
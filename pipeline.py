@@ -0,0 +1,310 @@
+import multiprocessing
+import collections
+import itertools
+import threading
+import argparse
+import heapq
+import queue
+import time
+import sys
+import os
+
+from logger import Logger, NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import XMLFactory, TSVFactory, FACTORIES, get_table_paths, get_localisation_cache_stats, intern_entity
+from tsv_writer import TSVWriter
+from instrumentation import instruments
+
+# Runs the parse, generate & write stages at the same time, connected by bounded queues:
+#   parse:    the rows of the tables are streamed in chunks (@see AbstractFactory.iter_entities) in the order their tooltips are generated
+#   generate: every chunk is generated as soon as the tables it depends on are complete, e.g. projectiles once the phases,
+#             explosions & bombardments are parsed (@see SpellManager.generate_phase_tooltips)
+#   write:    the rows of the output files are written by a writer thread while the next unit abilities are generated
+# The output is the same as the one of a sequential run: rows are written in the order their keys got their first tooltip.
+# Unit abilities (the last table) add tooltips to their own key and copy the tooltips of the keys they reference, which can be
+# keys of any table, so no row is written before the unit abilities are generated. A key is written (and its tooltips dropped)
+# once no unit ability left shares or references it (@see Pipeline._flush), the keys after it wait for it.
+# Memory: vortexes & unit abilities are dropped once generated and only the projectiles & bombardments used by unit abilities
+# are kept, phases & explosions are kept until the projectiles are generated. The tooltips of all keys are kept until
+# the unit abilities sharing or referencing them are generated.
+# Usage: python pipeline.py [--format tsv|xml] [--dir DIR] [--out DIR] [--queue-size N] [--process]
+# --process parses in a separate process so parsing & generation use different cores (the chunks are pickled between them)
+
+# Options of the factories streaming the tables, XML documents are read incrementally so only the queued rows are in memory
+FACTORY_OPTIONS = {XMLFactory: {"streaming": True}, TSVFactory: {}}
+
+# Tables in the order they are parsed & generated, every table only depends on the tables before it
+TABLE_ORDER = ["ability_phases", "vortexes", "projectile_explosions", "bombardments", "projectiles", "special_unit_abilities"]
+# Marks the end of a queue
+END = None
+# Seconds between the checks that the producer is still running while waiting for a chunk
+PRODUCER_CHECK_INTERVAL = 1.0
+
+# Yields the entities of a table in the order & with the values of the table of a factory parsing it at once: a key found in several rows
+# is yielded once at the position of its first row, with the values of its last row. The keys are counted first
+# (@see AbstractFactory.read_table_columns), only the rows from the first to the last row of such a key are held back.
+def iter_unique_entities(factory, table_name):
+    key_counts = collections.Counter(key for (key,) in factory.read_table_columns(table_name, [factory.KEY_COLUMNS[table_name]]))
+    remaining = {key: count for key, count in key_counts.items() if count > 1} # Map<repeated key, rows not parsed yet>
+    held = {} # Map<key, entity> held back, in the order of their first row
+    waiting = 0 # Held keys whose last row isn't parsed yet
+    for entity in factory.iter_entities(table_name):
+        key = entity.key
+        if key in remaining:
+            remaining[key] -= 1
+            if key in held:
+                if remaining[key] == 0: waiting -= 1
+            elif remaining[key] > 0: waiting += 1
+        elif not held:
+            yield entity
+            continue
+        held[key] = entity
+        if waiting == 0:
+            yield from held.values()
+            held = {}
+    yield from held.values()
+
+# Puts (table name, [entities]) chunks of all tables on the queue then END, or the exception raised while parsing
+def produce_chunks(factory, chunks, chunk_size):
+    try:
+        for table_name in TABLE_ORDER:
+            if table_name not in factory.table_jobs: continue
+            entities = iter_unique_entities(factory, table_name)
+            while True:
+                chunk = list(itertools.islice(entities, chunk_size))
+                if not chunk: break
+                chunks.put((table_name, chunk))
+        chunks.put(END)
+    except Exception as e:
+        chunks.put(e)
+
+def _produce_chunks_in_process(factory_class, paths, options, chunks, chunk_size):
+    produce_chunks(factory_class(NullLogger(), *paths, deferred=True, **options), chunks, chunk_size)
+
+# Writes the batches of rows put on the queue until END. After an error the batches are still taken from the queue (and discarded)
+# so the producer never blocks, the error is raised by join.
+class RowWriter(threading.Thread):
+    def __init__(self, paths, headers, queue_size):
+        super(RowWriter, self).__init__(daemon=True)
+        self.paths = paths
+        self.headers = headers
+        self.batches = queue.Queue(queue_size)
+        self.writer = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.writer = TSVWriter(TSVWriter.open_files(self.paths), self.headers)
+        except Exception as e:
+            self.error = e
+        for batch in iter(self.batches.get, END):
+            if self.error != None: continue
+            try: self.writer.write(batch)
+            except Exception as e: self.error = e
+        if self.writer != None: self.writer.close()
+
+    def join(self):
+        super(RowWriter, self).join()
+        if self.error != None: raise self.error
+
+class Pipeline:
+    # factory_class, paths: the factory of the tables & the paths of its tables e.g. TSVFactory and the paths of the tsv files
+    # queue_size: chunks (of chunk_size rows) parsed ahead of the generation & batches of rows formatted ahead of the writer
+    # in_process: parse in a separate process instead of a thread
+    def __init__(self, log, factory_class, paths, queue_size=8, chunk_size=SpellManager.CHUNK_SIZE, in_process=False):
+        self.log = log
+        self.factory_class = factory_class
+        self.paths = paths
+        self.options = FACTORY_OPTIONS.get(factory_class, {})
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.in_process = in_process
+        # The tables are filled as their chunks arrive and emptied once their rows are no longer needed
+        self.factory = factory_class(log, *paths, deferred=True, **self.options)
+        self.spell_manager = SpellManager(self.factory)
+        self.bombardment_positions = None # Map<bombardment key, position in the table> once the bombardments are complete
+        self.ability_references = {} # Map<unit ability key, its key & the keys it references> @see _read_ability_references
+        self.references = collections.Counter() # Map<key, unit abilities left sharing or referencing it>
+        self.used_projectile_keys = None # Projectiles used by the unit abilities, known once the bombardments are complete
+        self.tables_finished = False # Whether only the unit abilities are left to generate
+        self.keys_written = 0
+
+    # Returns the number of keys whose tooltips were written to the output directory
+    def run(self, output_dir="out"):
+        atg = AbilityTooltipGenerator(self.log)
+        os.makedirs(output_dir, exist_ok=True)
+        writer = RowWriter(atg._get_output_paths(output_dir), list(atg.OUTPUT_FILES.values()), self.queue_size)
+        writer.start()
+        timer = instruments.start("pipeline.generate")
+        try:
+            self._generate(atg, writer)
+        finally:
+            writer.batches.put(END)
+            writer.join()
+            instruments.stop(timer)
+        self.log.info("Wrote %d tooltips.", writer.writer.rows_written)
+        return self.keys_written
+
+    def _start_producer(self):
+        if self.in_process:
+            chunks = multiprocessing.Queue(self.queue_size)
+            producer = multiprocessing.Process(target=_produce_chunks_in_process, args=(self.factory_class, self.paths, self.options, chunks, self.chunk_size), daemon=True)
+        else:
+            chunks = queue.Queue(self.queue_size)
+            # The producer has its own factory, iter_entities replaces the tables while it parses them
+            factory = self.factory_class(NullLogger(), *self.paths, deferred=True, **self.options)
+            producer = threading.Thread(target=produce_chunks, args=(factory, chunks, self.chunk_size), daemon=True)
+        producer.start()
+        return (producer, chunks)
+
+    # Returns the next item of the queue. Raises if the producer stopped without putting END (or its exception) on it, e.g. a killed process.
+    def _get_item(self, producer, chunks):
+        while True:
+            try:
+                return chunks.get(timeout=PRODUCER_CHECK_INTERVAL)
+            except queue.Empty:
+                if producer.is_alive(): continue
+            # The last item may have been put right before the producer stopped
+            try:
+                return chunks.get(timeout=PRODUCER_CHECK_INTERVAL)
+            except queue.Empty:
+                raise Exception("The parser stopped before parsing all tables (exit code {code})".format(code=getattr(producer, "exitcode", None)))
+
+    def _generate(self, atg, writer):
+        log = self.log
+        log.set_active_class("Pipeline")
+        cache_stats = get_localisation_cache_stats()
+        (producer, chunks) = self._start_producer()
+        try:
+            self._read_ability_references()
+            waiting = 0.0
+            projectile_count = 0
+            bombardment_hits = 0
+            while True:
+                start = time.perf_counter()
+                item = self._get_item(producer, chunks)
+                waiting += time.perf_counter() - start
+                if item is END: break
+                if isinstance(item, Exception): raise item
+
+                (table_name, chunk) = item
+                # Keys unpickled from the parser process aren't interned
+                if self.in_process:
+                    for entity in chunk: intern_entity(entity)
+                if table_name == "ability_phases":
+                    self._add_chunk(table_name, chunk)
+                    self.spell_manager.generate_phase_tooltips(atg, chunk)
+                elif table_name == "vortexes":
+                    self.spell_manager.generate_vortex_tooltips(atg, chunk)
+                elif table_name == "projectiles":
+                    self._link_projectiles(chunk)
+                    bombardment_hits += self.spell_manager.generate_projectile_tooltips(atg, log, chunk)
+                    projectile_count += len(chunk)
+                    self._add_chunk(table_name, [projectile for projectile in chunk if projectile.key in self.used_projectile_keys])
+                elif table_name == "special_unit_abilities":
+                    self._finish_tables()
+                    self.spell_manager.generate_unit_ability_tooltips(atg, log, chunk)
+                    for unit_ability in chunk:
+                        self.references.subtract(self.ability_references.pop(unit_ability.key, []))
+                    self._flush(atg, writer)
+                else:
+                    self._add_chunk(table_name, chunk)
+            producer.join()
+        finally:
+            if self.in_process and producer.is_alive(): producer.terminate()
+        self._finish_tables()
+        self._flush(atg, writer, final=True)
+
+        log.info("Generated the tooltips of %d keys, %.2fs waiting for parsed rows", self.keys_written, waiting)
+        instruments.count("bombardment_lookups", projectile_count)
+        instruments.count("bombardment_lookup_hits", bombardment_hits)
+        self.spell_manager.log_cache_stats(log, cache_stats)
+        log.reset_active_class()
+
+    # Counts the keys shared or referenced by the unit abilities: their tooltips can change (or be copied) until these unit abilities
+    # are generated. Only the key & reference columns are read, the unit abilities are parsed by the producer.
+    def _read_ability_references(self):
+        factory = self.factory
+        if "special_unit_abilities" not in factory.table_jobs: return
+        columns = [factory.KEY_COLUMNS["special_unit_abilities"]] + factory.REFERENCE_COLUMNS["special_unit_abilities"]
+        for (key, *referenced_keys) in factory.read_table_columns("special_unit_abilities", columns):
+            # The last row of a key is the one generated @see iter_unique_entities
+            self.ability_references[key] = [key] + [referenced_key for referenced_key in referenced_keys if referenced_key != None]
+        for keys in self.ability_references.values():
+            self.references.update(keys)
+
+    def _add_chunk(self, table_name, chunk):
+        table = getattr(self.factory, table_name)
+        for entity in chunk:
+            table[entity.key] = entity
+
+    # Links the projectiles to their explosions & bombardments, the same way as AbstractFactory._link_tables
+    def _link_projectiles(self, projectiles):
+        factory = self.factory
+        if self.bombardment_positions == None:
+            # Indexed without the projectiles, the upgraded projectiles are added as their chunks arrive
+            factory._index_bombardments()
+            self.spell_manager.bombardments_by_projectile = factory.bombardments_by_projectile
+            self.bombardment_positions = {key: position for position, key in enumerate(factory.bombardments)}
+            # Projectiles used by the unit abilities directly or through their bombardments
+            self.used_projectile_keys = set(self.references)
+            self.used_projectile_keys.update(bombardment.projectile_type_key for bombardment in factory.bombardments.values() if bombardment.key in self.references)
+
+        bombardments_by_projectile = factory.bombardments_by_projectile
+        for projectile in projectiles:
+            projectile.ref_projectile_explosion = factory._get_linked_explosion(projectile)
+            # Upgraded projectiles (e.g. x_upgraded) are also used by the bombardments of the base projectile (x), in the order of the table
+            base_key = projectile.key.replace("_upgraded", "")
+            if base_key != projectile.key and base_key in bombardments_by_projectile:
+                bombardments = heapq.merge(bombardments_by_projectile.get(projectile.key, []), bombardments_by_projectile[base_key],
+                    key=lambda bombardment: self.bombardment_positions[bombardment.key])
+                bombardments_by_projectile[projectile.key] = list(bombardments)
+
+    # Drops the rows which were only needed to generate the phases, vortexes & projectiles
+    def _finish_tables(self):
+        if self.tables_finished: return
+        self.tables_finished = True
+        factory = self.factory
+        factory.ability_phases.clear()
+        factory.projectile_explosions.clear()
+        for key in [key for key in factory.bombardments if key not in self.references]:
+            del factory.bombardments[key]
+        factory.bombardments_by_projectile = self.spell_manager.bombardments_by_projectile = {}
+        self.bombardment_positions = {}
+
+    # Writes the rows of the first keys whose tooltips can't change anymore and drops their tooltips.
+    # A key can change until the last unit ability sharing or referencing it is generated, the keys after it wait for it.
+    # final: write the rows of all keys
+    def _flush(self, atg, writer, final=False):
+        keys = []
+        for key in atg.arr_tooltips:
+            if not final and self.references[key] > 0: break
+            keys.append(key)
+        rows = (rows for key in keys for (row_key, tooltip_ref, rows) in atg._generate_key_rows(self.log, key))
+        while writer.error == None:
+            batch = list(itertools.islice(rows, TSVWriter.BATCH_SIZE))
+            if not batch: break
+            writer.batches.put(batch)
+        for key in keys:
+            del atg.arr_tooltips[key]
+        self.keys_written += len(keys)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generate the tooltips with the parse, generate & write stages running at the same time.")
+    parser.add_argument("--format", choices=list(FACTORIES), default="tsv")
+    parser.add_argument("--dir", help="directory of the tables (defaults to the sample tables of the format)")
+    parser.add_argument("--out", default="out", help="output directory")
+    parser.add_argument("--queue-size", type=int, default=8, help="chunks of rows buffered between the stages")
+    parser.add_argument("--process", action="store_true", help="parse the tables in a separate process")
+    args = parser.parse_args(argv)
+
+    log = Logger("pipeline.txt", level=Logger.INFO)
+    start = time.perf_counter()
+    count = Pipeline(log, FACTORIES[args.format], get_table_paths(args.format, args.dir), args.queue_size, in_process=args.process).run(args.out)
+    log.close()
+    print("Generated the tooltips of {count} keys in {seconds:.2f}s".format(count=count, seconds=time.perf_counter() - start))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,60 @@
+import argparse
+import sys
+
+from logger import Logger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from dependency_index import DependencyIndex
+from structs import XMLFactory, FACTORIES, make_factory
+
+# Regenerates only the tooltips affected by changed rows and patches them into the output files of a previous run.
+# Usage: python regenerate.py [--format tsv|xml] [--dir DIR] [--out DIR] TABLE:KEY [TABLE:KEY ...]
+# TABLE is one of projectiles, bombardments, projectile_explosions, special_unit_abilities, vortexes, ability_phases
+# e.g. python regenerate.py --format tsv projectile_explosions:wh2_main_spell_fireball_explosion
+
+# changes: Map<table name, keys of the changed (added, modified or removed) rows>
+# previous_index: the DependencyIndex of the tables before the change, required to find the tooltips which used removed
+# rows or rows whose references changed.
+# Returns (DependencyIndex of the current tables, set of the regenerated tooltip keys)
+def regenerate(factory, changes, log, output_dir="out", previous_index=None):
+    index = DependencyIndex(factory)
+    affected_keys = index.get_affected_keys(changes)
+    if previous_index != None: affected_keys |= previous_index.get_affected_keys(changes)
+
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(factory).generate_tooltips(atg, log, keys=index.get_required_keys(affected_keys))
+    atg.patch_tsv_files(log, affected_keys, output_dir)
+    return (index, affected_keys)
+
+# Returns Map<table name, [keys]> from TABLE:KEY arguments
+def parse_changes(arguments):
+    changes = {}
+    for argument in arguments:
+        (table_name, separator, key) = argument.partition(":")
+        if not separator or table_name not in XMLFactory.TABLE_NAMES:
+            raise ValueError("Invalid change {argument}, expected TABLE:KEY with TABLE in {tables}".format(argument=argument, tables=XMLFactory.TABLE_NAMES))
+        changes.setdefault(table_name, []).append(key)
+    return changes
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Regenerate the tooltips affected by changed rows and patch them into the previous output.")
+    parser.add_argument("changes", nargs="+", help="changed rows as TABLE:KEY")
+    parser.add_argument("--format", choices=list(FACTORIES), default="xml")
+    parser.add_argument("--dir", help="directory of the tables (defaults to the sample tables of the format)")
+    parser.add_argument("--out", default="out", help="directory of the output files to patch")
+    args = parser.parse_args(argv)
+
+    try:
+        changes = parse_changes(args.changes)
+    except ValueError as e:
+        parser.error(str(e))
+
+    log = Logger("regenerate.txt", level=Logger.INFO)
+    factory = make_factory(log, args.format, args.dir)
+    (index, affected_keys) = regenerate(factory, changes, log, args.out)
+    log.close()
+    print("Regenerated the tooltips of {count} keys: {keys}".format(count=len(affected_keys), keys=" ".join(sorted(affected_keys))))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
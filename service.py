@@ -0,0 +1,257 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from functools import lru_cache
+from urllib.parse import unquote, urlsplit
+import threading
+import argparse
+import json
+import time
+import sys
+import os
+
+from logger import Logger, NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from dependency_index import DependencyIndex
+from structs import FACTORIES, SCRIPT_DIR, ENTITY_FIELDS, ENTITY_REFERENCES, make_factory, get_localisation_cache_stats
+from overlay import OverlayFactory
+
+# Local HTTP service answering tooltip queries from tables loaded once and kept in memory (e.g. for live previews in a mod editor).
+# Usage: python service.py [--format tsv|xml] [--dir DIR] [--host HOST] [--port PORT] [--max-concurrency N]
+#   GET  /tooltips/<key>          tooltips of an ability (any key of the output files) as generated by a full run
+#   POST /preview/<table>/<key>   tooltips of all abilities affected if the row had the values of the JSON body
+#                                 e.g. curl -d '{"dmg": 120, "explosion_type": null}' localhost:8765/preview/projectiles/wh2_main_spell_fireball
+#   GET  /stats                   request counts & hit rates of the caches
+# TABLE is one of projectiles, bombardments, projectile_explosions, special_unit_abilities, vortexes, ability_phases
+
+# Fields which can't be changed by previews, the links are set by the factory
+READ_ONLY_FIELDS = {"key"} | ENTITY_REFERENCES
+# Fields referencing rows of other tables, changing them changes which abilities are affected @see DependencyIndex
+REFERENCE_FIELDS = {"explosion_type", "contact_stat_effect", "projectile_type_key", "used_projectile_key", "used_vortex_key", "used_bombardment_key"}
+
+class PreviewError(Exception):
+    def __init__(self, status, message):
+        super(PreviewError, self).__init__(message)
+        self.status = status
+
+class TooltipService:
+    def __init__(self, log, factory, max_concurrency=8, preview_cache_size=256):
+        self.log = log
+        self.tables = factory.get_tables()
+        self.atg = AbilityTooltipGenerator(log)
+        SpellManager(factory).generate_tooltips(self.atg, log)
+        self.index = DependencyIndex(factory)
+        log.info("Loaded tooltips of %d keys", len(self.atg.arr_tooltips))
+
+        # Bounds the requests handled at the same time, the others wait up to QUEUE_TIMEOUT seconds @see TooltipRequestHandler
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.stats_lock = threading.Lock()
+        self.requests = {} # Map<endpoint, {"count", "errors", "seconds"}>
+        self.rejected = 0
+        # Map<key, encoded response>, the tables never change so responses are built once
+        self.tooltip_responses = {}
+        self.tooltip_cache_hits = 0
+        self.tooltip_cache_misses = 0
+        self.preview = lru_cache(maxsize=preview_cache_size)(self._preview)
+
+    def record(self, endpoint, seconds, error=False):
+        with self.stats_lock:
+            stats = self.requests.setdefault(endpoint, {"count": 0, "errors": 0, "seconds": 0.0})
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            if error: stats["errors"] += 1
+
+    def reject(self):
+        with self.stats_lock:
+            self.rejected += 1
+
+    # Returns [{ref, sort_order, loc_key, text}] of the tooltips of key as written to the output files
+    def _get_tooltips(self, atg, key):
+        tooltips = []
+        for tooltip in atg.arr_tooltips.get(key, {}).values():
+            tooltip_ref = atg._create_tooltip_ref(key, tooltip)
+            (localisation_key, localisation) = atg.get_localisation(key, tooltip_ref, tooltip)
+            tooltips.append({"ref": tooltip_ref, "sort_order": tooltip["tag"][1], "loc_key": localisation_key, "text": localisation})
+        return tooltips
+
+    # Returns the encoded JSON response or None if the key has no tooltips
+    def get_tooltips(self, key):
+        response = self.tooltip_responses.get(key)
+        if response != None:
+            with self.stats_lock:
+                self.tooltip_cache_hits += 1
+            return response
+        if key not in self.atg.arr_tooltips: return None
+        # Concurrent misses of the same key build identical responses, either one is kept
+        response = json.dumps({"key": key, "tooltips": self._get_tooltips(self.atg, key)}).encode()
+        with self.stats_lock:
+            self.tooltip_cache_misses += 1
+        self.tooltip_responses[key] = response
+        return response
+
+    # values: tuple of (field, value) pairs so the previews can be memoized @see preview
+    # Returns the encoded JSON response with the tooltips of all keys affected by the row
+    def _preview(self, table_name, key, values):
+        if table_name not in ENTITY_FIELDS: raise PreviewError(404, "Unknown table " + table_name)
+        row = self.tables[table_name].get(key)
+        if row == None: raise PreviewError(404, "Unknown {table} row {key}".format(table=table_name, key=key))
+        (row_class, fields) = ENTITY_FIELDS[table_name]
+
+        arguments = {field: getattr(row, field) for field in fields}
+        for field, value in values:
+            if field not in arguments or field in READ_ONLY_FIELDS: raise PreviewError(400, "Field {field} of {table} can't be changed".format(field=field, table=table_name))
+            arguments[field] = self._cast_value(field, value, arguments[field])
+        delta_tables = {name: {} for name in ENTITY_FIELDS}
+        delta_tables[table_name][key] = row_class(*[arguments[field] for field in fields])
+
+        # The base tables are shared with the other requests, the changed row & the projectiles linked to it are stored in the layers of the overlay
+        null_log = NullLogger()
+        factory = OverlayFactory(null_log, self.tables, [delta_tables])
+        changes = {table_name: [key]}
+        affected_keys = self.index.get_affected_keys(changes)
+        index = self.index
+        if any(field in REFERENCE_FIELDS for field, value in values):
+            index = DependencyIndex(factory)
+            affected_keys |= index.get_affected_keys(changes)
+
+        atg = AbilityTooltipGenerator(null_log)
+        SpellManager(factory).generate_tooltips(atg, null_log, keys=index.get_required_keys(affected_keys))
+        tooltips = {affected_key: self._get_tooltips(atg, affected_key) for affected_key in sorted(affected_keys)}
+        return json.dumps({"table": table_name, "key": key, "tooltips": tooltips}).encode()
+
+    def _cast_value(self, field, value, current):
+        if isinstance(current, bool):
+            if isinstance(value, bool): return value
+        elif isinstance(current, float):
+            if isinstance(value, (int, float)) and not isinstance(value, bool): return float(value)
+        elif isinstance(current, int):
+            # Floats aren't truncated e.g. 10.5 projectiles is rejected instead of previewing 10
+            if isinstance(value, int) and not isinstance(value, bool): return value
+            if isinstance(value, float) and value.is_integer(): return int(value)
+        elif value == None or isinstance(value, str):
+            return value
+        raise PreviewError(400, "Invalid value {value!r} for {field}".format(value=value, field=field))
+
+    def get_stats(self):
+        with self.stats_lock:
+            requests = {endpoint: dict(stats) for endpoint, stats in self.requests.items()}
+            rejected = self.rejected
+            tooltip_cache = {"hits": self.tooltip_cache_hits, "misses": self.tooltip_cache_misses, "currsize": len(self.tooltip_responses)}
+        return json.dumps({
+            "max_concurrency": self.max_concurrency,
+            "requests": requests,
+            "rejected": rejected,
+            "tooltip_cache": tooltip_cache,
+            "preview_cache": self.preview.cache_info()._asdict(),
+            "localisation_cache": get_localisation_cache_stats(),
+        }).encode()
+
+class TooltipRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections, a client (e.g. an editor) doesn't have to connect for every request
+    protocol_version = "HTTP/1.1"
+    # The headers & body are written separately, without TCP_NODELAY every response would wait for the delayed ACK of the client
+    disable_nagle_algorithm = True
+    QUEUE_TIMEOUT = 1.0 # seconds a request waits for a free slot before it is rejected with 503
+    MAX_BODY_SIZE = 65536
+
+    # The query string (e.g. /tooltips/KEY?x=1) is ignored
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        parts = path.split("/")
+        if len(parts) == 3 and parts[1] == "tooltips": self._handle("tooltips", self._get_tooltips, unquote(parts[2]))
+        elif path == "/stats": self._handle("stats", self.server.service.get_stats)
+        else: self._send(404, {"error": "Unknown path " + self.path})
+
+    def do_POST(self):
+        parts = urlsplit(self.path).path.split("/")
+        if len(parts) == 4 and parts[1] == "preview": self._handle("preview", self._preview, unquote(parts[2]), unquote(parts[3]))
+        else: self._send(404, {"error": "Unknown path " + self.path})
+
+    def _get_tooltips(self, key):
+        response = self.server.service.get_tooltips(key)
+        if response == None: raise PreviewError(404, "No tooltips for " + key)
+        return response
+
+    def _preview(self, table_name, key):
+        # read(-1) would wait for the client to close the connection while holding a slot
+        try: length = int(self.headers.get("Content-Length", 0))
+        except ValueError: raise PreviewError(400, "Invalid Content-Length")
+        if length < 0: raise PreviewError(400, "Invalid Content-Length")
+        if length > self.MAX_BODY_SIZE: raise PreviewError(413, "Body too large")
+        try:
+            values = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise PreviewError(400, "Invalid JSON: " + str(e))
+        if not isinstance(values, dict) or any(isinstance(value, (list, dict)) for value in values.values()):
+            raise PreviewError(400, "Expected an object of field values")
+        return self.server.service.preview(table_name, key, tuple(sorted(values.items())))
+
+    def _handle(self, endpoint, handler, *args):
+        service = self.server.service
+        if not service.slots.acquire(timeout=self.QUEUE_TIMEOUT):
+            service.reject()
+            self._send(503, {"error": "Too many requests"})
+            return
+        start = time.perf_counter()
+        error = False
+        try:
+            self._send_body(200, handler(*args))
+        except PreviewError as e:
+            error = True
+            self._send(e.status, {"error": str(e)})
+        except Exception as e:
+            error = True
+            service.log.error("Failed to handle %s: %r", self.path, e)
+            self._send(500, {"error": repr(e)})
+        finally:
+            service.slots.release()
+            service.record(endpoint, time.perf_counter() - start, error)
+
+    def _send(self, status, content):
+        self._send_body(status, json.dumps(content).encode())
+
+    def _send_body(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.server.service.log.debug(format, *args)
+
+class TooltipServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        super(TooltipServer, self).__init__(address, TooltipRequestHandler)
+        self.service = service
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Serve the tooltips of abilities from tables kept in memory.")
+    parser.add_argument("--format", choices=list(FACTORIES), default="tsv")
+    parser.add_argument("--dir", help="directory of the tables (defaults to the sample tables of the format)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-concurrency", type=int, default=8, help="requests handled at the same time")
+    parser.add_argument("--preview-cache-size", type=int, default=256, help="number of previews kept in memory")
+    args = parser.parse_args(argv)
+
+    directory = args.dir or os.path.join(SCRIPT_DIR, args.format)
+    log = Logger("service.txt", level=Logger.INFO)
+    factory = make_factory(log, args.format, directory)
+    service = TooltipService(log, factory, args.max_concurrency, args.preview_cache_size)
+    log.flush()
+
+    server = TooltipServer((args.host, args.port), service)
+    print("Serving tooltips of {directory} on http://{host}:{port}, press Ctrl+C to stop".format(directory=directory, host=args.host, port=server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    log.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,8 +1,15 @@
 import xml.etree.ElementTree as ET
-from structs import Vortex, Bombardment, Projectile, ProjectileExplosion, SpecialUnitAbility, AbilityPhase
+from structs import Vortex, Bombardment, Projectile, ProjectileExplosion, SpecialUnitAbility, AbilityPhase, get_localisation_cache_stats
+from structs import create_phase_damage_string, create_equal_radius_string, create_expanding_radius_string
+from numeric_columns import compute_phase_columns, compute_vortex_columns, compute_projectile_columns
+from instrumentation import instruments
+import itertools
 
 
 class SpellManager:
+    # Entities are processed in chunks of this size, tables which aren't held in memory (@see TableStore) are streamed
+    CHUNK_SIZE = 4096
+
     def __init__(self, ability_factory):
         self.bombardments = ability_factory.get_bombardments()
         self.projectiles = ability_factory.get_projectiles()
@@ -10,32 +17,76 @@ class SpellManager:
         self.special_unit_abilities = ability_factory.get_special_unit_abilities()
         self.vortexes = ability_factory.get_vortexs()
         self.ability_phases = ability_factory.get_ability_phases()
+        self.bombardments_by_projectile = ability_factory.get_bombardments_by_projectile()
 
-    def generate_tooltips(self, atg, log):
+    # keys: only generate the tooltips of these tooltip keys (e.g. the abilities affected by a change @see DependencyIndex).
+    # The set must contain the keys the tooltips are copied from, the tooltips are generated in the same order as a full run.
+    def generate_tooltips(self, atg, log, keys=None):
         log.set_active_class("SpellManager")
-        # All projectiles must contain any of the words to be included.
-        # Ensures that no generic projectiles like arrows have tooltip generation
-        projectile_ability_keywords = ["spell", "main_character_abilities", "weapon_abilities", "lord_abilities", "unit_abilities", "army_abilities", "passive"]
+        # Tooltip texts are memoized across runs, only the hits & misses of this run are reported
+        cache_stats = get_localisation_cache_stats()
         
         # Initial setup
         # Adds damage over time tooltips to spells.
-        for ability_phase in self.ability_phases.values():
-            damage_txt = ability_phase.get_damage_txt()
-            # Only interested in damaging spells
-            if damage_txt != False:
-                atg.add_phase_tooltip(ability_phase.key, ability_phase.get_damage_txt())
+        timer = instruments.start("generate_tooltips.ability_phases")
+        for ability_phases in self._get_chunks(self.ability_phases.values(), keys):
+            self.generate_phase_tooltips(atg, ability_phases)
+        instruments.stop(timer)
 
         # Add main damage tooltips to all vortexes
-        for vortex in self.vortexes.values():
-            atg.add_damage_tooltip(vortex.key, vortex.get_damage_txt())
-            if(vortex.start_radius == vortex.goal_radius): atg.add_equal_radius_tooltip(vortex.key, vortex.get_equal_radius_txt())
-            elif(vortex.expansion_speed > 0):
-                atg.add_expanding_radius_tooltip(vortex.key, vortex.get_expanding_radius_txt())
-
+        timer = instruments.start("generate_tooltips.vortexes")
+        for vortexes in self._get_chunks(self.vortexes.values(), keys):
+            self.generate_vortex_tooltips(atg, vortexes)
+        instruments.stop(timer)
 
         # Tooltip generation of projectiles & bombardment spells
-        for projectile in self.projectiles.values():
-            used_bombardments = projectile.is_used_in_bombardment(self.bombardments)
+        timer = instruments.start("generate_tooltips.projectiles")
+        bombardment_hits = 0
+        # Bombardments launching the projectile may be affected even if the projectile isn't
+        is_required = None if keys == None else (lambda projectile: projectile.key in keys
+            or any(bombardment.key in keys for bombardment in self.bombardments_by_projectile.get(projectile.key, [])))
+        for projectiles in self._get_chunks(self.projectiles.values(), keys, is_required):
+            bombardment_hits += self.generate_projectile_tooltips(atg, log, projectiles, keys)
+        instruments.count("bombardment_lookups", len(self.projectiles))
+        instruments.count("bombardment_lookup_hits", bombardment_hits)
+        instruments.stop(timer)
+
+        # Add unit and lord abilites. Most of them are reskins of already added abilities but they still need their own tooltips.
+        timer = instruments.start("generate_tooltips.unit_abilities")
+        self.generate_unit_ability_tooltips(atg, log, self.special_unit_abilities.values(), keys)
+        instruments.stop(timer)
+
+        self.log_cache_stats(log, cache_stats)
+        log.reset_active_class()
+
+    # The generate_*_tooltips methods generate the tooltips of a part of a table (e.g. a chunk), the parts of every table must be
+    # passed in the order of the table and the tables in the order of generate_tooltips @see pipeline.py
+
+    def generate_phase_tooltips(self, atg, ability_phases):
+        columns = compute_phase_columns(ability_phases)
+        for (ability_phase, is_damaging, max_damage, chance, time) in zip(ability_phases, columns["is_damaging"], columns["max_damage"], columns["chance"], columns["time"]):
+            # Only interested in damaging spells
+            if is_damaging:
+                damage_txt = create_phase_damage_string(ability_phase.dmg, chance, time, max_damage, ability_phase.max_damaged_entities)
+                atg.add_phase_tooltip(ability_phase.key, [damage_txt, ability_phase.onscreen_name])
+
+    def generate_vortex_tooltips(self, atg, vortexes):
+        columns = compute_vortex_columns(vortexes)
+        for (vortex, is_equal_radius, is_expanding, start_radius, goal_radius, expansion_speed) in zip(vortexes, columns["is_equal_radius"], columns["is_expanding"], columns["start_radius"], columns["goal_radius"], columns["expansion_speed"]):
+            atg.add_damage_tooltip(vortex.key, vortex.get_damage_txt())
+            if is_equal_radius: atg.add_equal_radius_tooltip(vortex.key, create_equal_radius_string(goal_radius))
+            elif is_expanding:
+                atg.add_expanding_radius_tooltip(vortex.key, create_expanding_radius_string(start_radius, goal_radius, expansion_speed))
+
+    # Returns the number of projectiles used by bombardments
+    def generate_projectile_tooltips(self, atg, log, projectiles, keys=None):
+        # All projectiles must contain any of the words to be included.
+        # Ensures that no generic projectiles like arrows have tooltip generation
+        projectile_ability_keywords = ["spell", "main_character_abilities", "weapon_abilities", "lord_abilities", "unit_abilities", "army_abilities", "passive"]
+        bombardment_hits = 0
+        columns = compute_projectile_columns(projectiles)
+        for (projectile, is_damaging, has_bonus_v_large) in zip(projectiles, columns["is_damaging"], columns["has_bonus_v_large"]):
+            used_bombardments = self.bombardments_by_projectile.get(projectile.key, [])
             detonation = projectile.get_projectile_explosion_ref()
             # Create detonation damage tooltip if the projectile has a projectile explosion
             detonation_loc = None
@@ -44,8 +95,10 @@ class SpellManager:
 
             if len(used_bombardments) > 0:
                 # part of at least one bombardment spell
-                log.debug("Projectile {key} is a part of bombardment spells: {bspells}".format(key=projectile.key, bspells=str(used_bombardments)))
+                bombardment_hits += 1
+                log.debug("Projectile %s is a part of bombardment spells: %s", projectile.key, used_bombardments)
                 for bombardment in used_bombardments:
+                    if keys != None and bombardment.key not in keys: continue
                     # Add damage (and detonation if applicable) tooltips for all bombardments that use this projectile
                     localisation = bombardment.get_bombardment_string(projectile)
                     if(localisation != False and not atg.contains_damage_tooltip(bombardment.key)):
@@ -54,29 +107,31 @@ class SpellManager:
                         atg.add_detonation_damage_tooltip_with_local(bombardment.key, detonation_loc)
             else:
                 # Magic missile or regular projectile (e.g. arrow) if not used by bombardment
-                log.debug("Projectile {key} is a magic missile or projectile".format(key=projectile.key))
-                
+                log.debug("Projectile %s is a magic missile or projectile", projectile.key)
+                if keys != None and projectile.key not in keys: continue
+            
                 keyword = ""
                 # Check if the projectile is not generic (e.g. an arrow)
                 if not any(keyword in projectile.key for keyword in projectile_ability_keywords): continue
 
-                damage_txt = projectile.get_damage_txt()
-                if(damage_txt != False):
-                    atg.add_damage_tooltip(projectile.key, damage_txt)
+                if is_damaging:
+                    atg.add_damage_tooltip(projectile.key, projectile.get_damage_txt())
                 if detonation_loc != None:
                     atg.add_detonation_damage_tooltip_with_local(projectile.key, detonation_loc)
-                if projectile.bonus_v_large > 0:
+                if has_bonus_v_large:
                     atg.add_bonus_v_large_tooltip(projectile.key, str(projectile.bonus_v_large))
                 if projectile.contact_stat_effect != None:
                     contact_effect = self.ability_phases.get(projectile.contact_stat_effect)
                     contact_effect_damage = contact_effect.get_damage_txt()
                     if contact_effect_damage != False:
                         atg.add_on_contact_tooltip(projectile.key, "On Projectile Contact: " + contact_effect_damage[1] + " " + contact_effect_damage[0])
+        return bombardment_hits
 
-        # Add unit and lord abilites. Most of them are reskins of already added abilities but they still need their own tooltips.
-        # If it references a vortex/bombardment/project that has tooltips then all tooltips will be copied over.
+    def generate_unit_ability_tooltips(self, atg, log, unit_abilities, keys=None):
+        # If it references a vortex/bombardment/project that has tooltips then all tooltips will be shared with it (@see copy_tooltips).
         # Unit abilities store info regarding cast time, cost etc... They often share their key with the vortex/bombardment/projectile they use. (Some of the copies are redundant -> tooltip[original] = tooltip[copy])
-        for unit_ability in self.special_unit_abilities.values():
+        for unit_ability in unit_abilities:
+            if keys != None and unit_ability.key not in keys: continue
             if unit_ability.wind_up_time == 0 and not unit_ability.is_passive:
                 atg.add_wind_up_time_tooltip(unit_ability.key, "Cast time: instant")
             elif unit_ability.wind_up_time > 0 and not unit_ability.is_passive:
@@ -85,13 +140,13 @@ class SpellManager:
                 atg.add_wind_up_time_tooltip(unit_ability.key, "Cast time: " +str(time) +secondStr)
 
             if not unit_ability.is_damaging_ability(): 
-                log.debug("Skipping " + str(unit_ability) + " because it is not damaging.")
+                log.debug("Skipping %s because it is not damaging.", unit_ability)
                 continue
 
             (unit_ability_already_added, tooltips) = atg.contains_key(unit_ability.key)
             if unit_ability_already_added: 
-                log.debug("Unit ability: {key} already added.".format(key=unit_ability.key))
-                log.debug("Tooltips: " + str(tooltips))
+                log.debug("Unit ability: %s already added.", unit_ability.key)
+                log.debug("Tooltips: %s", tooltips)
                 continue
 
             # Check if ability references a vortex spell we already made tooltips for.
@@ -104,7 +159,7 @@ class SpellManager:
                 else:
                     # The current unit ability is a reskin of a vortex e.g. bound wind of death.
                     # The tooltips already generated for wind of death are copied over to the bound spell.
-                    log.debug("Need to add new vortex ability: " + unit_ability.key +" that maps to " + unit_ability.used_vortex_key)
+                    log.debug("Need to add new vortex ability: %s that maps to %s", unit_ability.key, unit_ability.used_vortex_key)
                     (contains_vortex, tooltips) = atg.contains_key(unit_ability.used_vortex_key)
                     assert contains_vortex == True, "All vortex spells should be already loaded as they are all decleared in only one file"
                     for tooltip in tooltips:
@@ -119,11 +174,11 @@ class SpellManager:
                         self.copy_tooltips(unit_ability.key, tooltip, atg)
                 else:
                     # The unit ability is a reskin of an existing bombardment spell
-                    log.debug("Need to add new bombardmant ability: " +unit_ability.key +" that maps to " + unit_ability.used_bombardment_key)
+                    log.debug("Need to add new bombardmant ability: %s that maps to %s", unit_ability.key, unit_ability.used_bombardment_key)
                     (contains_bombardment_spell, tooltips) = atg.contains_key(unit_ability.used_bombardment_key)
                     if not contains_bombardment_spell: 
                         # Has weird interaction with summons which are considered bombardment e.g. plague vermintide
-                        log.debug("Need to create new bombardment spell in atg: "+unit_ability.used_bombardment_key)
+                        log.debug("Need to create new bombardment spell in atg: %s", unit_ability.used_bombardment_key)
                         bombardment = self.bombardments[unit_ability.used_bombardment_key]
                         projectile = bombardment.get_projectile(self.projectiles)
                         detonation = projectile.get_projectile_explosion_ref()
@@ -132,7 +187,7 @@ class SpellManager:
                         atg.add_tooltips(unit_ability,  detonation, damage_txt, log)
                         atg.add_tooltips(bombardment,  detonation, damage_txt, log)
                     else:
-                        log.debug("Already have bombardment spell in atg: "+unit_ability.used_bombardment_key)
+                        log.debug("Already have bombardment spell in atg: %s", unit_ability.used_bombardment_key)
                         for tooltip in tooltips:
                             self.copy_tooltips(unit_ability.key, tooltip, atg)
             # Check if ability references a projectile spell we already made tooltips for.
@@ -143,10 +198,10 @@ class SpellManager:
                         self.copy_tooltips(unit_ability.key, tooltip, atg)
                 else:
                     #print("Need to add new projectile: " +unit_ability.key +" that maps to " + unit_ability.used_projectile_key)
-                    log.debug("Need to add new projectile: " +unit_ability.key +" that maps to " + unit_ability.used_projectile_key)
+                    log.debug("Need to add new projectile: %s that maps to %s", unit_ability.key, unit_ability.used_projectile_key)
                     (contains_projectile, tooltips) = atg.contains_key(unit_ability.used_projectile_key)
                     if not contains_projectile:
-                        log.debug("Need to create new projectile in atg: " +unit_ability.used_projectile_key)
+                        log.debug("Need to create new projectile in atg: %s", unit_ability.used_projectile_key)
                         projectile = self.projectiles[unit_ability.used_projectile_key]
 
                         detonation = projectile.get_projectile_explosion_ref()
@@ -159,24 +214,31 @@ class SpellManager:
                         for tooltip in tooltips:
                             self.copy_tooltips(unit_ability.key, tooltip, atg)
 
-        log.reset_active_class()
+    # cache_stats: get_localisation_cache_stats() at the start of the run, only the hits & misses since then are reported
+    def log_cache_stats(self, log, cache_stats):
+        for name, stats in get_localisation_cache_stats().items():
+            hits = stats["hits"] - cache_stats[name]["hits"]
+            misses = stats["misses"] - cache_stats[name]["misses"]
+            log.info("Localisation cache %s: %d hits, %d misses", name, hits, misses)
+            instruments.count("localisation_cache." + name + ".hits", hits)
+            instruments.count("localisation_cache." + name + ".misses", misses)
     
+    # Yields lists of up to CHUNK_SIZE entities, only the entities of the keys (or the ones is_required returns true for) if any are given
+    def _get_chunks(self, entities, keys=None, is_required=None):
+        if keys != None:
+            if is_required == None: is_required = lambda entity: entity.key in keys
+            entities = filter(is_required, entities)
+        entities = iter(entities)
+        while True:
+            chunk = list(itertools.islice(entities, self.CHUNK_SIZE))
+            if not chunk: return
+            yield chunk
+
+    # Reskins share the tooltips of the ability they copy instead of getting their own copy of every tooltip
     def copy_tooltips(self, unit_ability_key, tooltip, atg):
-        if tooltip["tag"] == atg.TAG_DAMAGE_TOOLTIP:
-            atg.add_damage_tooltip(unit_ability_key, tooltip["localisation"])
-        elif tooltip["tag"] == atg.TAG_DETONATION_DAMAGE_TOOLTIP:
-            atg.add_detonation_damage_tooltip_with_local(unit_ability_key, tooltip["localisation"])
-        elif tooltip["tag"] == atg.TAG_BONUS_V_LARGE:
+        instruments.count("tooltip_copies")
+        # add_bonus_v_large_tooltip prefixes the localisation again, kept as a real copy so the output doesn't change
+        if tooltip["tag"] == atg.TAG_BONUS_V_LARGE:
             atg.add_bonus_v_large_tooltip(unit_ability_key, tooltip["localisation"])
-        elif tooltip["tag"] == atg.TAG_PHASE_TOOLTIP:
-            atg.add_phase_tooltip(unit_ability_key, tooltip["localisation"])
-        elif tooltip["tag"] == atg.TAG_EQUAL_RADIUS:
-            atg.add_equal_radius_tooltip(unit_ability_key, tooltip["localisation"])
-        elif tooltip["tag"] == atg.TAG_EXPANDING_RADIUS:
-            atg.add_expanding_radius_tooltip(unit_ability_key, tooltip["localisation"])
-        elif tooltip["tag"] == atg.TAG_WIND_UP_TINE:
-            atg.add_wind_up_time_tooltip(unit_ability_key, tooltip["localisation"])
-        elif tooltip["tag"] == atg.TAG_ON_CONTACT:
-            atg.add_on_contact_tooltip(unit_ability_key, tooltip["localisation"])
         else:
-            raise Exception("Unknown tooltip tag: " + tooltip["tag"])
+            atg.add_alias_tooltip(unit_ability_key, tooltip)
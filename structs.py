@@ -1,8 +1,22 @@
 from abc import ABC, abstractclassmethod
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from instrumentation import instruments
+from logger import NullLogger
+from numeric_columns import format_number, get_phase_max_damage, get_chance_percent
 import xml.etree.ElementTree as ET
+import itertools
+import hashlib
+import sys
 import os
 
 
+# Tooltip texts only depend on a few numbers which many entities share (e.g. all bombardments launching the same projectile,
+# reskinned phases) so they are memoized by those numbers and every distinct text is rendered once.
+# typed: 1 and 1.0 (or True) render differently. @see get_localisation_cache_stats
+LOCALISATION_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=LOCALISATION_CACHE_SIZE, typed=True)
 def create_damage_string(dmg, dmgap, is_fire_damage, is_magical_damage):
     if dmg <= 0 and dmgap <= 0: return False
     magic_icon = "[[img:icon_dmg_flaming]][[/img]]" if is_fire_damage else "[[img:icon_dmg_magical]][[/img]]" if is_magical_damage else " non magical"
@@ -13,6 +27,116 @@ def create_damage_string(dmg, dmgap, is_fire_damage, is_magical_damage):
         damageTxt += str(dmgap) +"[[img:icon_ap]][[/img]]"
     return damageTxt
 
+# max_damage: None if the phase lasts until all entities die, chance: in percent, time: formatted frequency
+# @see numeric_columns.compute_phase_columns
+@lru_cache(maxsize=LOCALISATION_CACHE_SIZE, typed=True)
+def create_phase_damage_string(dmg, chance, time, max_damage, max_damaged_entities):
+    if dmg > 0 and max_damaged_entities > 0:
+        secondStr = "seconds" if time != 1 else "second"
+        entityStr = "entities" if max_damaged_entities > 1 else "entity"
+        if max_damage == None:
+            return "Deals {dmg} damage to {entities} {entityStr} every {time} {secondStr} until all entities die.".format(dmg=dmg,entities=max_damaged_entities,entityStr=entityStr, time=time, secondStr=secondStr)
+        elif chance == 0:
+            return "Deals {dmg} damage to {entities} {entityStr}. (Max damage: {maxDmg})".format(dmg=dmg, entities=max_damaged_entities, entityStr=entityStr, maxDmg=max_damage)
+        else:
+            return "{chance}% chance to deal {dmg} damage per {time} {secondStr} to {entityCount} {entityStr}. (Max damage: {maxDmg})".format(chance=chance, dmg=dmg, entityCount=max_damaged_entities, entityStr=entityStr, maxDmg=max_damage, time=time, secondStr=secondStr)
+    return False
+
+# The radiuses & speed are formatted @see numeric_columns.format_number
+@lru_cache(maxsize=LOCALISATION_CACHE_SIZE, typed=True)
+def create_expanding_radius_string(start_radius, goal_radius, expansion_speed):
+    return "Damage radius expands from {srad} up to {grad} by {espeed} every second".format(srad=start_radius, grad=goal_radius, espeed=expansion_speed)
+
+def create_equal_radius_string(radius):
+    return "Constant damage radius: {rad}".format(rad=radius)
+
+@lru_cache(maxsize=LOCALISATION_CACHE_SIZE, typed=True)
+def _create_detonation_string(detonation_dmg, detonation_dmgap, is_magical):
+    detonation_loc = "Detonation damage (per projectile): " if is_magical else "Detonation damage (per projectile & non-magical): "
+    magic_icon = "" if is_magical == False else "[[img:icon_dmg_magical]][[/img]]"
+    if detonation_dmg > 0: detonation_loc += str(detonation_dmg) +magic_icon
+    if detonation_dmgap > 0:
+        if detonation_dmg > 0: detonation_loc += " and " + str(detonation_dmgap) +"[[img:icon_ap]][[/img]]"
+        else: detonation_loc += str(detonation_dmgap) + "[[img:icon_ap]][[/img]]"
+    return detonation_loc
+
+@lru_cache(maxsize=LOCALISATION_CACHE_SIZE, typed=True)
+def _create_bombardment_string(num_projectiles, projectile_number, dmg, dmgap, is_fire_damage, is_magical_damage):
+    is_projectiles_plural = ""
+    additional_sub_projectile_hint = "" if projectile_number == 1 else " (each projectile launches " + str(projectile_number) +" projectiles)"
+    if (num_projectiles > 1): is_projectiles_plural = "projectiles" +additional_sub_projectile_hint+ ", each"
+    else: is_projectiles_plural = "projectile " + additional_sub_projectile_hint
+    damageTxt = create_damage_string(dmg, dmgap, is_fire_damage, is_magical_damage)
+
+    if damageTxt == False: return False
+    return "Launch {numproj} {projectile_str} dealing {damageTxt}".format(numproj=num_projectiles, projectile_str=is_projectiles_plural, damageTxt=damageTxt)
+
+# Returns Map<function name, {hits, misses, maxsize, currsize}> of the memoized tooltip texts
+def get_localisation_cache_stats():
+    renderers = [create_damage_string, create_phase_damage_string, create_expanding_radius_string, _create_detonation_string, _create_bombardment_string]
+    return {renderer.__name__: renderer.cache_info()._asdict() for renderer in renderers}
+
+
+# Keys are shared between tables (e.g. SpecialUnitAbility.used_projectile_key and Projectile.key)
+# so they are interned to store a single copy of each key.
+def _intern(key):
+    if key == None: return None
+    return sys.intern(key)
+
+# Slots of the entities holding keys (@see _intern)
+KEY_SLOTS = ("__key", "__used_projectile_key", "__used_vortex_key", "__used_bombardment_key", "__contact_stat_effect", "__explosion_type", "__projectile_type_key")
+_key_slots = {} # Map<entity class, mangled names of its key slots>
+
+# Unpickled strings aren't interned (e.g. tables loaded from snapshots or parsed in worker processes), intern the keys again.
+# Returns the table with interned keys, its entities are updated in place.
+def intern_table(table):
+    interned_table = {}
+    for key, entity in table.items():
+        intern_entity(entity)
+        interned_table[sys.intern(key)] = entity
+    return interned_table
+
+def intern_entity(entity):
+    entity_class = type(entity)
+    slots = _key_slots.get(entity_class)
+    if slots == None:
+        slots = _key_slots[entity_class] = ["_" + entity_class.__name__ + slot for slot in KEY_SLOTS if slot in entity_class.__slots__]
+    for slot in slots:
+        setattr(entity, slot, _intern(getattr(entity, slot)))
+
+# Cell casters used by the TSVFactory. Empty numeric cells default to 0.
+def _tsv_to_int(value):
+    if value == "": return 0
+    # Exported tsv files sometimes store ints as floats e.g. 16.0
+    if "." in value: return int(float(value))
+    return int(value)
+
+def _tsv_to_float(value):
+    if value == "": return 0.0
+    return float(value)
+
+def _tsv_to_str(value):
+    if value == "": return None
+    return value
+
+def _tsv_to_bool(value):
+    return value == "true"
+
+# Parse a single table in a worker process and return it (Map<key, entity>).
+# Messages logged while parsing in a worker are discarded.
+# The timers & counters collected in the worker are returned with the table if instrumentation is enabled.
+def _parse_table_in_worker(factory_class, state, table_name, parse_method_name, args, instrumented):
+    # Worker processes are reused between tables, only the timers & counters of this table are returned
+    instruments.reset()
+    if instrumented: instruments.enable()
+    factory = factory_class.__new__(factory_class)
+    AbstractFactory.__init__(factory, NullLogger())
+    factory.__dict__.update(state)
+    timer = instruments.start("parse." + table_name)
+    getattr(factory, parse_method_name)(*args)
+    instruments.stop(timer)
+    return (getattr(factory, table_name), instruments.report())
+
 class FactoryBuilder:
     TSV = 1
     XML = 2
@@ -24,6 +148,9 @@ class FactoryBuilder:
         self.unit_special_abilities_path = None
         self.vortex_path = None
         self.special_ability_phases_path = None
+        self.streaming = False
+        self.cache = None
+        self.processes = 1
 
     def with_projectiles(self, path):
         self.projectiles_path = path
@@ -49,14 +176,29 @@ class FactoryBuilder:
         self.special_ability_phases_path = path
         return self
 
+    # Parse XML tables incrementally instead of loading the whole document @see XMLFactory._read_rows
+    def with_streaming(self, streaming=True):
+        self.streaming = streaming
+        return self
+
+    # Reuse parsed tables from snapshots when their source files haven't changed @see TableCache
+    def with_cache(self, cache):
+        self.cache = cache
+        return self
+
+    # Parse the tables concurrently in the given number of processes
+    def with_processes(self, processes):
+        self.processes = processes
+        return self
+
     def build(self, log, format):
         if format == self.TSV:
             return TSVFactory(log, self.projectiles_path, self.projectile_bombardments_path, self.projectile_explosions_path,
-                self.unit_special_abilities_path, self.vortex_path, self.special_ability_phases_path)
+                self.unit_special_abilities_path, self.vortex_path, self.special_ability_phases_path, self.cache, self.processes)
 
         elif format == self.XML:
             return XMLFactory(log, self.projectiles_path, self.projectile_bombardments_path, self.projectile_explosions_path,
-                self.unit_special_abilities_path, self.vortex_path, self.special_ability_phases_path)
+                self.unit_special_abilities_path, self.vortex_path, self.special_ability_phases_path, self.streaming, self.cache, self.processes)
         else:
             raise Exception("Invalid format provided. Use FactoryBuilder.XML or FactoryBuilder.TSV")
             
@@ -64,14 +206,34 @@ class FactoryBuilder:
     pass
 
 class AbstractFactory(ABC):
-    def __init__(self, logger):
+    TABLE_NAMES = ["projectiles", "bombardments", "projectile_explosions", "special_unit_abilities", "vortexes", "ability_phases"]
+    # Columns of the source tables (xml, tsv & pack) containing the key of the rows & the keys of rows of other tables
+    KEY_COLUMNS = {
+        "projectiles": "key", "bombardments": "bombardment_key", "projectile_explosions": "key", "special_unit_abilities": "key",
+        "vortexes": "vortex_key", "ability_phases": "id",
+    }
+    REFERENCE_COLUMNS = {
+        "projectiles": ["explosion_type", "contact_stat_effect"], "bombardments": ["projectile_type"],
+        "special_unit_abilities": ["activated_projectile", "vortex", "bombardment"],
+    }
+
+    # deferred: only record the tables, their rows are read on demand @see iter_entities
+    # keys: only parse the rows with these keys (in any table), the other rows are skipped before their values are read
+    # e.g. the rows required by a few abilities @see targeted.get_required_keys
+    def __init__(self, logger, cache=None, processes=1, deferred=False, keys=None):
         self.bombardments = {}
         self.projectiles = {}
         self.projectile_explosions = {}
         self.special_unit_abilities = {}
         self.vortexes = {}
         self.ability_phases = {}
+        self.bombardments_by_projectile = {} # Map<projectile key, [Bombardment]> @see _index_bombardments
         self.log = logger
+        self.cache = cache # Optional TableCache
+        self.processes = processes # Number of processes used to parse the tables
+        self.deferred = deferred
+        self.keys = keys
+        self.table_jobs = {} # Map<table name, job> of the loaded tables @see _load_tables
     
     def get_bombardments(self):           return self.bombardments
     def get_projectiles(self):            return self.projectiles
@@ -79,6 +241,147 @@ class AbstractFactory(ABC):
     def get_special_unit_abilities(self): return self.special_unit_abilities
     def get_vortexs(self):                return self.vortexes
     def get_ability_phases(self):         return self.ability_phases
+    def get_bombardments_by_projectile(self): return self.bombardments_by_projectile
+
+    # Returns Map<table name, table> @see TABLE_NAMES
+    def get_tables(self): return {table_name: getattr(self, table_name) for table_name in self.TABLE_NAMES}
+
+    # Load the tables described by jobs: (table name e.g. "projectiles", source paths, name of the parse method, parse method args).
+    # A table is filled from its snapshot if its source files haven't changed, otherwise it is parsed and a new snapshot is stored.
+    # With more than one process the tables are parsed concurrently, references between them are resolved afterwards @see _link_tables
+    def _load_tables(self, jobs):
+        if self.deferred:
+            for job in jobs:
+                self.table_jobs[job[0]] = job
+            return
+
+        # Snapshots contain all rows of the tables
+        cache = self.cache if self.keys == None else None
+        pending_jobs = []
+        for job in jobs:
+            (table_name, source_paths, parse_method_name, args) = job
+            self.table_jobs[table_name] = job
+            table = cache.load(self._get_snapshot_name(table_name, source_paths), source_paths) if cache != None else None
+            if table != None:
+                self.log.info("Loaded %s from snapshot", table_name)
+                instruments.count("snapshot_hits." + table_name)
+                setattr(self, table_name, intern_table(table))
+            else:
+                pending_jobs.append(job)
+
+        if self.processes > 1 and len(pending_jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.processes, len(pending_jobs))) as executor:
+                state = dict(self._get_worker_state(), keys=self.keys)
+                futures = [executor.submit(_parse_table_in_worker, self.__class__, state, table_name, parse_method_name, args, instruments.enabled)
+                    for (table_name, source_paths, parse_method_name, args) in pending_jobs]
+                for job, future in zip(pending_jobs, futures):
+                    (table, report) = future.result()
+                    setattr(self, job[0], intern_table(table))
+                    instruments.merge(report)
+                    self.log.info("Parsed %s in worker process", job[0])
+        else:
+            for (table_name, source_paths, parse_method_name, args) in pending_jobs:
+                timer = instruments.start("parse." + table_name)
+                getattr(self, parse_method_name)(*args)
+                instruments.stop(timer)
+
+        if cache != None:
+            for (table_name, source_paths, parse_method_name, args) in pending_jobs:
+                cache.store(self._get_snapshot_name(table_name, source_paths), source_paths, getattr(self, table_name))
+
+    # Reload a table after its source files changed, only the rows which changed are parsed again.
+    # previous_rows: Map<row fingerprint, key> returned by the previous call, every row is parsed if empty.
+    # The table keeps the order of the rows in the file and the entities of unchanged rows are reused.
+    # References between tables must be linked again once all changed tables are reloaded @see relink
+    # Returns (Map<row fingerprint, key>, keys of the added or modified rows, keys of the removed rows)
+    def update_table(self, table_name, previous_rows):
+        table = getattr(self, table_name)
+        rows = {}
+        new_table = {}
+        changed_keys = []
+        try:
+            for fingerprint, parse_row in self._read_table_rows(table_name):
+                key = previous_rows.get(fingerprint)
+                if key != None and key in table:
+                    entity = table[key]
+                else:
+                    # The constructors add the entity to the table
+                    setattr(self, table_name, {})
+                    parse_row()
+                    (key, entity), = getattr(self, table_name).items()
+                    changed_keys.append(key)
+                rows[fingerprint] = key
+                new_table[key] = entity
+        finally:
+            setattr(self, table_name, table)
+
+        setattr(self, table_name, new_table)
+        removed_keys = [key for key in table if key not in new_table]
+        return (rows, changed_keys, removed_keys)
+
+    # Yields the entities of a table one at a time without adding them to the table (e.g. tables too large to be held in memory @see TableStore)
+    def iter_entities(self, table_name):
+        table = getattr(self, table_name)
+        try:
+            for fingerprint, parse_row in self._read_table_rows(table_name, fingerprints=False):
+                # The constructors add the entity to the table
+                setattr(self, table_name, {})
+                parse_row()
+                yield from getattr(self, table_name).values()
+        finally:
+            setattr(self, table_name, table)
+
+    # Yields a tuple with the values (str or None if empty) of the columns for every row of the table without parsing the rows
+    # e.g. the keys & references of all rows @see KEY_COLUMNS, REFERENCE_COLUMNS
+    @abstractclassmethod
+    def read_table_columns(self, table_name, columns): return
+
+    # Yields (fingerprint, function parsing the row into the table) for every row of the table @see update_table
+    # fingerprints: the fingerprints may be None if False (e.g. when they aren't compared @see iter_entities)
+    @abstractclassmethod
+    def _read_table_rows(self, table_name, fingerprints=True): return
+
+    def relink(self): self._link_tables()
+
+    # Snapshots of tables read from other source files (e.g. the tables of several mods) don't replace each other @see TableCache.store
+    def _get_snapshot_name(self, table_name, source_paths):
+        paths_digest = hashlib.sha1("\n".join(os.path.abspath(path) for path in source_paths).encode()).hexdigest()[:16]
+        return self.__class__.__name__ + "." + table_name + "." + paths_digest
+
+    # Attributes (other than the tables) required to parse a table in a worker process
+    def _get_worker_state(self): return {}
+
+    # Resolve references between tables once all of them are loaded
+    def _link_tables(self):
+        timer = instruments.start("link_tables")
+        for projectile in self.projectiles.values():
+            projectile.ref_projectile_explosion = self._get_linked_explosion(projectile)
+        self._index_bombardments()
+        instruments.stop(timer)
+
+    # Explosions without damage are kept in the table (e.g. a mod can remove the damage of an explosion) but aren't linked
+    def _get_linked_explosion(self, projectile):
+        projectile_explosion = projectile.get_projectile_explosion_if_exists(self.projectile_explosions)
+        if projectile_explosion == None or not projectile_explosion.deals_damage(): return None
+        return projectile_explosion
+
+    # Build the projectile key -> bombardments index once all tables are loaded.
+    # Upgraded projectiles (e.g. x_upgraded) are also used by bombardments which reference the base projectile (x),
+    # the alias is resolved here so that a lookup for any projectile is a single dictionary hit.
+    # Bombardments keep the order in which they were parsed.
+    def _index_bombardments(self):
+        upgraded_aliases = {}
+        for projectile_key in self.projectiles:
+            base_key = projectile_key.replace("_upgraded", "")
+            if base_key != projectile_key:
+                upgraded_aliases.setdefault(base_key, []).append(projectile_key)
+
+        self.bombardments_by_projectile = {}
+        for bombardment in self.bombardments.values():
+            projectile_type_key = bombardment.projectile_type_key
+            self.bombardments_by_projectile.setdefault(projectile_type_key, []).append(bombardment)
+            for upgraded_key in upgraded_aliases.get(projectile_type_key, []):
+                self.bombardments_by_projectile.setdefault(upgraded_key, []).append(bombardment)
 
     @abstractclassmethod
     def create_ability_phase(self, source): return
@@ -95,57 +398,115 @@ class AbstractFactory(ABC):
 
 # Generate structs based on XML files provided by the assembly kit.
 class XMLFactory(AbstractFactory):
-    def __init__(self, logger, projectiles_xml_path, bombardment_xml_path, projectile_explosions_xml_path, unit_special_abilities_xml_path, vortex_xml_path, phases_xml_path):
-        super(XMLFactory, self).__init__(logger)
+    # Row tag -> table
+    ROW_TABLES = {
+        "special_ability_phases": "ability_phases", "battle_vortexs": "vortexes", "projectiles_explosions": "projectile_explosions",
+        "projectiles": "projectiles", "projectile_bombardments": "bombardments", "unit_special_abilities": "special_unit_abilities",
+    }
+
+    def __init__(self, logger, projectiles_xml_path, bombardment_xml_path, projectile_explosions_xml_path, unit_special_abilities_xml_path, vortex_xml_path, phases_xml_path, streaming=False, cache=None, processes=1, deferred=False, keys=None):
+        super(XMLFactory, self).__init__(logger, cache, processes, deferred, keys)
         self.log.set_active_class("XMLFactory")
+        self.streaming = streaming
+
+        jobs = []
+        if phases_xml_path:                 jobs.append(("ability_phases", [phases_xml_path], "_parse_xml_table", ("_parse_ability_phases", phases_xml_path, "special_ability_phases")))
+        if vortex_xml_path:                 jobs.append(("vortexes", [vortex_xml_path], "_parse_xml_table", ("_parse_vortexs", vortex_xml_path, "battle_vortexs")))
+        if projectile_explosions_xml_path:  jobs.append(("projectile_explosions", [projectile_explosions_xml_path], "_parse_xml_table", ("_parse_explosions", projectile_explosions_xml_path, "projectiles_explosions")))
+        if projectiles_xml_path:            jobs.append(("projectiles", [projectiles_xml_path], "_parse_xml_table", ("_parse_projectiles", projectiles_xml_path, "projectiles")))
+        if bombardment_xml_path:            jobs.append(("bombardments", [bombardment_xml_path], "_parse_xml_table", ("_parse_bombardments", bombardment_xml_path, "projectile_bombardments")))
+        if unit_special_abilities_xml_path: jobs.append(("special_unit_abilities", [unit_special_abilities_xml_path], "_parse_xml_table", ("_parse_unit_abilities", unit_special_abilities_xml_path, "unit_special_abilities")))
+        self._load_tables(jobs)
+
+        self._link_tables()
+        self.log.reset_active_class()
 
-        if phases_xml_path:                 self._parse_ability_phases(ET.parse(phases_xml_path).getroot())
-        if vortex_xml_path:                 self._parse_vortexs(ET.parse(vortex_xml_path).getroot())
-        if projectile_explosions_xml_path:  self._parse_explosions(ET.parse(projectile_explosions_xml_path).getroot())
-        if projectiles_xml_path:            self._parse_projectiles(ET.parse(projectiles_xml_path).getroot())
-        if bombardment_xml_path:            self._parse_bombardments(ET.parse(bombardment_xml_path).getroot())
-        if unit_special_abilities_xml_path: self._parse_unit_abilities(ET.parse(unit_special_abilities_xml_path).getroot())
+    def _get_worker_state(self): return {"streaming": self.streaming}
+
+    def _parse_xml_table(self, parse_method_name, path, row_tag):
+        rows = self._read_rows(path, row_tag)
+        if self.keys != None:
+            key_column = self.KEY_COLUMNS[self.ROW_TABLES[row_tag]]
+            rows = (row for row in rows if row.findtext(key_column) in self.keys)
+        if instruments.enabled: rows = self._count_rows(rows, row_tag)
+        getattr(self, parse_method_name)(rows)
+
+    def _read_table_rows(self, table_name, fingerprints=True):
+        (parse_method_name, path, row_tag) = self.table_jobs[table_name][3]
+        parse = getattr(self, parse_method_name)
+        for row in self._read_rows(path, row_tag):
+            yield (ET.tostring(row) if fingerprints else None, lambda row=row: parse([row]))
+
+    # The rows are always streamed as they aren't kept
+    def read_table_columns(self, table_name, columns):
+        (parse_method_name, path, row_tag) = self.table_jobs[table_name][3]
+        for row in self._iter_rows(path, row_tag):
+            yield tuple(row.findtext(column) or None for column in columns)
+
+    def _count_rows(self, rows, row_tag):
+        count = 0
+        for row in rows:
+            count += 1
+            yield row
+        instruments.count("rows_parsed." + row_tag, count)
+
+    # Returns the row elements of a table.
+    # In streaming mode rows are yielded as soon as they are closed and freed once the caller is done with them,
+    # so only one row is kept in memory at a time instead of the whole document.
+    def _read_rows(self, path, row_tag):
+        if not self.streaming: return ET.parse(path).getroot().findall(row_tag)
+        return self._iter_rows(path, row_tag)
+
+    def _iter_rows(self, path, row_tag):
+        root = None
+        depth = 0
+        for event, element in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                if root is None: root = element
+                depth += 1
+                continue
+
+            depth -= 1
+            # Rows are the direct children of the root (dataroot) element
+            if depth == 1:
+                if element.tag == row_tag: yield element
+                root.clear()
 
-        self.log.reset_active_class()
     # Parse functions
 
-    def _parse_ability_phases(self, root):
-        for ability_phase in root.findall("special_ability_phases"):
+    def _parse_ability_phases(self, rows):
+        for ability_phase in rows:
             c_ability_phase = self.create_ability_phase(ability_phase)
             self.ability_phases[c_ability_phase.key] = c_ability_phase
-            self.log.debug("Adding ability phase: " +str(c_ability_phase))
+            self.log.debug("Adding ability phase: %s", c_ability_phase)
 
-    def _parse_vortexs(self, root):
-        for vortex in root.findall("battle_vortexs"):
+    def _parse_vortexs(self, rows):
+        for vortex in rows:
             c_vortex = self.create_vortex(vortex)
             self.vortexes[c_vortex.key] = c_vortex
-            self.log.debug("Adding vortex: " +str(c_vortex))
+            self.log.debug("Adding vortex: %s", c_vortex)
 
-    def _parse_explosions(self, root):
-        for explosion in root.findall("projectiles_explosions"):
+    def _parse_explosions(self, rows):
+        for explosion in rows:
             c_explosion = self.create_projectile_explosion(explosion)
-            if c_explosion.detonation_damage > 0 or c_explosion.detonation_damage_ap > 0:
-                self.log.debug("Adding explosion: " + str(c_explosion))
-                self.projectile_explosions[c_explosion.key] = c_explosion
+            self.log.debug("Adding explosion: %s", c_explosion)
+            self.projectile_explosions[c_explosion.key] = c_explosion
 
-    def _parse_projectiles(self, root):
-        for projectile in root.findall("projectiles"):
+    def _parse_projectiles(self, rows):
+        for projectile in rows:
             c_projectile = self.create_projectile(projectile)
-            projectile_explosion = c_projectile.get_projectile_explosion_if_exists(self.projectile_explosions)
-            if projectile_explosion != None: 
-                c_projectile.set_projectile_explosion_ref(projectile_explosion)
-            self.log.debug("Adding projectile: " + str(c_projectile))
+            self.log.debug("Adding projectile: %s", c_projectile)
             self.projectiles[c_projectile.key] = c_projectile
 
-    def _parse_bombardments(self, root):
-        for bombardment in root.findall("projectile_bombardments"):
+    def _parse_bombardments(self, rows):
+        for bombardment in rows:
             c_bombardment = self.create_bombardment(bombardment)
             self.bombardments[c_bombardment.key] = c_bombardment
 
-    def _parse_unit_abilities(self, root):
-        for unit_ability in root.findall("unit_special_abilities"):
+    def _parse_unit_abilities(self, rows):
+        for unit_ability in rows:
             c_unit_ability = self.create_special_unit_ability(unit_ability)
-            self.log.debug("Adding unit ability: " + str(c_unit_ability))
+            self.log.debug("Adding unit ability: %s", c_unit_ability)
             self.special_unit_abilities[c_unit_ability.key] = c_unit_ability
 
     # Object constructors
@@ -221,63 +582,157 @@ class TSVFactory(AbstractFactory):
     TYPE_FLOAT = 1
     TYPE_STR   = 2
     TYPE_BOOL  = 3
+    CASTERS = {TYPE_INT: _tsv_to_int, TYPE_FLOAT: _tsv_to_float, TYPE_STR: _tsv_to_str, TYPE_BOOL: _tsv_to_bool}
+
+    # Types of the columns used by the constructors, keyed by the table name in the first line of the tsv file.
+    # Columns which aren't declared here have their type sampled from the first rows of the table @see find_column_type
+    SCHEMAS = {
+        "special_ability_phases_tables": {
+            "id": TYPE_STR, "damage_amount": TYPE_INT, "damage_chance": TYPE_FLOAT, "duration": TYPE_FLOAT,
+            "hp_change_frequency": TYPE_FLOAT, "max_damaged_entities": TYPE_INT,
+        },
+        "battle_vortexs_tables": {
+            "vortex_key": TYPE_STR, "damage": TYPE_INT, "damage_ap": TYPE_INT, "ignition_amount": TYPE_FLOAT, "is_magical": TYPE_BOOL,
+            "goal_radius": TYPE_FLOAT, "start_radius": TYPE_FLOAT, "movement_speed": TYPE_FLOAT, "expansion_speed": TYPE_FLOAT,
+            "contact_effect": TYPE_STR,
+        },
+        "unit_special_abilities_tables": {
+            "key": TYPE_STR, "activated_projectile": TYPE_STR, "vortex": TYPE_STR, "bombardment": TYPE_STR,
+            "wind_up_time": TYPE_FLOAT, "passive": TYPE_BOOL,
+        },
+        "projectiles_explosions_tables": {
+            "key": TYPE_STR, "detonation_damage": TYPE_FLOAT, "detonation_damage_ap": TYPE_FLOAT, "is_magical": TYPE_BOOL,
+        },
+        "projectiles_tables": {
+            "key": TYPE_STR, "damage": TYPE_INT, "ap_damage": TYPE_INT, "bonus_v_large": TYPE_INT, "bonus_v_infantry": TYPE_INT,
+            "ignition_amount": TYPE_FLOAT, "is_magical": TYPE_BOOL, "projectile_number": TYPE_INT, "shots_per_volley": TYPE_INT,
+            "explosion_type": TYPE_STR, "contact_stat_effect": TYPE_STR,
+        },
+        "projectile_bombardments_tables": {
+            "bombardment_key": TYPE_STR, "num_projectiles": TYPE_INT, "projectile_type": TYPE_STR,
+        },
+    }
+    # Number of rows used to determine the type of undeclared columns
+    TYPE_SAMPLE_SIZE = 100
+    # Table name in the first line of the tsv file -> table
+    SOURCE_TABLES = {
+        "projectiles_explosions_tables": "projectile_explosions", "projectiles_tables": "projectiles", "projectile_bombardments_tables": "bombardments",
+        "unit_special_abilities_tables": "special_unit_abilities", "battle_vortexs_tables": "vortexes", "special_ability_phases_tables": "ability_phases",
+    }
+    # Table -> constructor of its rows @see update_table
+    CONSTRUCTORS = {
+        "projectile_explosions": "create_projectile_explosion", "projectiles": "create_projectile", "bombardments": "create_bombardment",
+        "special_unit_abilities": "create_special_unit_ability", "vortexes": "create_vortex", "ability_phases": "create_ability_phase",
+    }
     
-    def __init__(self, logger, projectiles_tsv_path, projectile_bombardments_path, projectile_explosions_path, unit_special_abilities_path, vortex_tsv_path, special_ability_phases_path):
-        super(TSVFactory, self).__init__(logger)
+    def __init__(self, logger, projectiles_tsv_path, projectile_bombardments_path, projectile_explosions_path, unit_special_abilities_path, vortex_tsv_path, special_ability_phases_path, cache=None, processes=1, deferred=False, keys=None):
+        super(TSVFactory, self).__init__(logger, cache, processes, deferred, keys)
         logger.set_active_class("TSVFactory")
 
         self.ability_phase_localisation = {}
-        if special_ability_phases_path and os.path.exists(special_ability_phases_path + ".loc"):
-            self.read_phase_loc(special_ability_phases_path)
         
-        # Explosions must be parsed before projectiles as projectile can reference an explosion
-        if projectile_explosions_path:  self.parse_projectile_explosions(projectile_explosions_path)
-        if projectiles_tsv_path:        self.parse_projectiles(projectiles_tsv_path)
-        if projectile_explosions_path:  self.parse_bombardments(projectile_bombardments_path)
-        if unit_special_abilities_path: self.parse_unit_special_abilities(unit_special_abilities_path)
-        if vortex_tsv_path:             self.parse_vortexs(vortex_tsv_path)
-        if special_ability_phases_path: self.parse_special_ability_phases(special_ability_phases_path)
-
+        # References between tables (e.g. projectile -> explosion) are resolved once all tables are loaded @see _link_tables
+        jobs = []
+        if projectile_explosions_path:    jobs.append(("projectile_explosions", [projectile_explosions_path], "parse_projectile_explosions", (projectile_explosions_path,)))
+        if projectiles_tsv_path:          jobs.append(("projectiles", [projectiles_tsv_path], "parse_projectiles", (projectiles_tsv_path,)))
+        if projectile_bombardments_path:  jobs.append(("bombardments", [projectile_bombardments_path], "parse_bombardments", (projectile_bombardments_path,)))
+        if unit_special_abilities_path:   jobs.append(("special_unit_abilities", [unit_special_abilities_path], "parse_unit_special_abilities", (unit_special_abilities_path,)))
+        if vortex_tsv_path:               jobs.append(("vortexes", [vortex_tsv_path], "parse_vortexs", (vortex_tsv_path,)))
+        # The onscreen names of phases are joined from the localisation file, it is part of the snapshot key
+        if special_ability_phases_path:   jobs.append(("ability_phases", [special_ability_phases_path, special_ability_phases_path + ".loc"], "parse_special_ability_phases", (special_ability_phases_path,)))
+        self._load_tables(jobs)
+
+        self._link_tables()
         logger.reset_active_class()
 
-    def read_phase_loc(self, path):
-        loc = open(path + ".loc", "r")
-        lines = loc.readlines()
-        for i in range(2, len(lines)):
-            line = lines[i].replace("\n", "").split("\t")
-            key = line[0]
-            localiastion = line[1]
-            self.ability_phase_localisation[key] = localiastion.replace("\\\\", "\\")
-
-        loc.close()
-
-    def parse_tsv(self, path, constructor_func):        
-        f = open(path, "r")
-        
-        lines = f.readlines()
-
-        headers = lines[1].replace("/n", "").split("\t")
-        header_type_info = self.find_column_type(lines, headers)
-
-        for i in range(2, len(lines)):
-            value_map = {}
-            values = lines[i].replace("\n", "").split("\t")
-
-            for j in range(len(headers)):
-                value_map[headers[j]] = self.cast_to_type(values[j], headers[j], header_type_info)
-            
-            constructor_func(value_map)
+    def _get_worker_state(self): return {"ability_phase_localisation": {}}
 
-        f.close()
-
-    # Determine the datatype for columns automatically
+    def read_phase_loc(self, path):
+        with open(path + ".loc", "r") as loc:
+            # Skip table name & headers
+            next(loc, None)
+            next(loc, None)
+            for line in loc:
+                line = line.rstrip("\n").split("\t")
+                key = line[0]
+                localiastion = line[1]
+                self.ability_phase_localisation[key] = localiastion.replace("\\\\", "\\")
+
+    # Reads the table in a single pass. Each cell is split once and cast with the caster of its column.
+    def parse_tsv(self, path, constructor_func):
+        with open(path, "r") as f:
+            (table_name, headers, casters, lines) = self._read_tsv(f)
+            rows = (self._split_line(line) for line in lines)
+            if self.keys != None:
+                key_index = headers.index(self.KEY_COLUMNS[self.SOURCE_TABLES[table_name]])
+                rows = (values for values in rows if values[key_index] in self.keys)
+            rows_parsed = 0
+            for values in rows:
+                constructor_func(self._cast_row(values, headers, casters))
+                rows_parsed += 1
+            instruments.count("rows_parsed." + table_name.replace("_tables", ""), rows_parsed)
+
+    # Returns (table name, headers, casters of the columns, lines) where lines iterates over the rows of the opened file
+    def _read_tsv(self, f):
+        table_name = f.readline().split("\t")[0]
+        headers = f.readline().rstrip("\n").split("\t")
+        schema = self.SCHEMAS.get(table_name, {})
+
+        sample = []
+        if any(header not in schema for header in headers):
+            sample = list(itertools.islice(f, self.TYPE_SAMPLE_SIZE))
+        sampled_type_info = self.find_column_type(sample, headers)
+        casters = [self._get_caster(header, schema, sampled_type_info) for header in headers]
+        return (table_name, headers, casters, itertools.chain(sample, f))
+
+    def read_table_columns(self, table_name, columns):
+        with open(self.table_jobs[table_name][3][0], "r") as f:
+            # Skip table name
+            f.readline()
+            headers = f.readline().rstrip("\n").split("\t")
+            indexes = [headers.index(column) for column in columns]
+            for line in f:
+                values = line.rstrip("\n").split("\t")
+                yield tuple(values[index] or None for index in indexes)
+
+    def _split_line(self, line):
+        return line.rstrip("\n").split("\t")
+
+    # values: the cells of a row @see _split_line
+    def _cast_row(self, values, headers, casters):
+        return {header: cast(value) for header, cast, value in zip(headers, casters, values)}
+
+    # The localisation of phases is read again, the caller must pass no previous rows if it changed
+    def _read_table_rows(self, table_name, fingerprints=True):
+        path = self.table_jobs[table_name][3][0]
+        if table_name == "ability_phases" and os.path.exists(path + ".loc"):
+            self.ability_phase_localisation = {}
+            self.read_phase_loc(path)
+        constructor = getattr(self, self.CONSTRUCTORS[table_name])
+        with open(path, "r") as f:
+            (tsv_table_name, headers, casters, lines) = self._read_tsv(f)
+            for line in lines:
+                yield (line, lambda line=line: constructor(self._cast_row(self._split_line(line), headers, casters)))
+
+    def _get_caster(self, header, schema, sampled_type_info):
+        if header in schema: return self.CASTERS[schema[header]]
+
+        column_type = sampled_type_info.get(header, self.TYPE_STR)
+        caster = self.CASTERS[column_type]
+        # The sample might not be representative of the whole column, keep the raw value if it can't be cast
+        def cast_sampled(value):
+            try: return caster(value)
+            except ValueError: return value
+        return cast_sampled
+
+    # Determine the datatype for columns automatically from the given rows (excluding table name & headers)
     # For some reason exported tsv files sometimes treat values which are ints in assembly kit as floats
     # Hence a cast to int in object constuctor is required to prevent tooltips from displaying decimals 
     #e.g. damage as 16.0 instead of 16
     def find_column_type(self, lines, headers, debug=False):
         header_type_info = {}
 
-        for i in range(2, len(lines)):
+        for i in range(len(lines)):
             line = lines[i].replace("\n", "").split("\t")
             for j in range(len(line)):
                 value = line[j]
@@ -300,12 +755,7 @@ class TSVFactory(AbstractFactory):
         return header_type_info
 
     def cast_to_type(self, value, header, type_info):
-        if type_info[header]   == self.TYPE_INT:   return int(value)
-        elif type_info[header] == self.TYPE_FLOAT: return float(value)
-        elif type_info[header] == self.TYPE_STR:   
-            if value == "": return None
-            return value
-        elif type_info[header] == self.TYPE_BOOL:  return value == "true"
+        if type_info[header] in self.CASTERS: return self.CASTERS[type_info[header]](value)
         else: raise Exception("Unsupported data type for value: " + value)
 
     def parse_vortexs(self, path):
@@ -329,6 +779,8 @@ class TSVFactory(AbstractFactory):
         #print(self.special_unit_abilities)
 
     def parse_special_ability_phases(self, path):
+        if os.path.exists(path + ".loc"):
+            self.read_phase_loc(path)
         self.parse_tsv(path, self.create_ability_phase)
         #print(self.ability_phases)
 
@@ -341,14 +793,14 @@ class TSVFactory(AbstractFactory):
 
         # Join onscreen_name with the localiastion file.
         # This is included in xml files.
-        onscreen_name = self.ability_phase_localisation["special_ability_phases_onscreen_name_" + key] or ""
+        onscreen_name = self.ability_phase_localisation.get("special_ability_phases_onscreen_name_" + key) or ""
 
         max_damaged_entities = source["max_damaged_entities"]
         
         ability_phase = AbilityPhase(key, dmg, dmg_chance, duration, frequency, max_damaged_entities, onscreen_name)
 
         self.ability_phases[ability_phase.key] = ability_phase
-        self.log.debug("Adding ability phase: " +str(ability_phase))
+        self.log.debug("Adding ability phase: %s", ability_phase)
 
     def create_vortex(self, source): 
         key = source["vortex_key"]
@@ -365,7 +817,7 @@ class TSVFactory(AbstractFactory):
         vortex = Vortex(key, dmg, dmgap, is_fire_damage, is_magical, goal_radius, start_radius, movement_speed, expansion_speed, None, contact_effect)
 
         self.vortexes[vortex.key] = vortex
-        self.log.debug("Adding vortex: " +str(vortex))
+        self.log.debug("Adding vortex: %s", vortex)
 
     def create_special_unit_ability(self, source): 
         key = source["key"]
@@ -378,7 +830,7 @@ class TSVFactory(AbstractFactory):
         special_unit_ability = SpecialUnitAbility(key, used_projectile_key, used_vortex_key, used_bombardment_key, wind_up_time, is_passive)
 
         self.special_unit_abilities[special_unit_ability.key] = special_unit_ability
-        self.log.debug("Adding special unit ability: " +str(special_unit_ability))
+        self.log.debug("Adding special unit ability: %s", special_unit_ability)
 
 
     def create_projectile_explosion(self, source): 
@@ -389,9 +841,8 @@ class TSVFactory(AbstractFactory):
         
         projectile_explosion = ProjectileExplosion(key, detonation_dmg, detonation_dmgap, magical)
 
-        if projectile_explosion.detonation_damage > 0 or projectile_explosion.detonation_damage_ap > 0:
-            self.projectile_explosions[projectile_explosion.key] = projectile_explosion
-            self.log.debug("Adding projectile explosion: " +str(projectile_explosion))
+        self.projectile_explosions[projectile_explosion.key] = projectile_explosion
+        self.log.debug("Adding projectile explosion: %s", projectile_explosion)
 
     def create_projectile(self, source):
         key = source["key"]
@@ -408,11 +859,7 @@ class TSVFactory(AbstractFactory):
 
         projectile = Projectile(key, dmg, dmgap, bonus_v_large, bonus_v_infantry, is_fire_damage, is_magical, projectile_number, voley, explosion_type, None, contact_stat_effect)
 
-        projectile_explosion = projectile.get_projectile_explosion_if_exists(self.projectile_explosions)
-        if projectile_explosion != None: 
-            projectile.set_projectile_explosion_ref(projectile_explosion)
-
-        self.log.debug("Adding projectile: " + str(projectile))
+        self.log.debug("Adding projectile: %s", projectile)
         self.projectiles[projectile.key] = projectile
 
     def create_bombardment(self, source): 
@@ -421,17 +868,39 @@ class TSVFactory(AbstractFactory):
         projectile_type_key = source["projectile_type"]
 
         bombardment = Bombardment(key, num_projectiles, projectile_type_key)
-        self.log.debug("Adding bombardment: " + str(bombardment))
+        self.log.debug("Adding bombardment: %s", bombardment)
         self.bombardments[bombardment.key] = bombardment
 
-        
+
+# Setup shared by the command line tools
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Table files in the order of the factory constructor arguments
+TABLE_FILES = ["projectiles", "projectile_bombardments", "projectiles_explosions", "unit_special_abilities", "battle_vortexs", "special_ability_phases"]
+FACTORIES = {"xml": XMLFactory, "tsv": TSVFactory}
+
+# Returns the paths of the tables of the format in the directory (defaults to the sample tables of the format)
+# optional: None for the missing tables, e.g. a mod directory only containing the tables it changes
+def get_table_paths(format, directory=None, optional=False):
+    directory = directory or os.path.join(SCRIPT_DIR, format)
+    paths = [os.path.join(directory, table + "." + format) for table in TABLE_FILES]
+    if optional: paths = [path if os.path.exists(path) else None for path in paths]
+    return paths
+
+# Returns the factory of the tables of the format in the directory @see get_table_paths
+# options: arguments of the factory e.g. deferred=True
+def make_factory(log, format, directory=None, optional=False, **options):
+    return FACTORIES[format](log, *get_table_paths(format, directory, optional), **options)
 
 
 # Classes for internal representation
+# Entities are slotted (no per-instance __dict__) as full modded tables contain tens of thousands of them.
 
 class AbilityPhase:
+    __slots__ = ("__key", "__dmg", "__dmg_chance", "__duration", "__frequency", "__onscreen_name", "__max_damaged_entities")
+
     def __init__(self, key, dmg, dmg_chance, duration, frequency, max_damaged_entities, onscreen_name = ""):
-        self.__key = key
+        self.__key = _intern(key)
         self.__dmg = dmg
         self.__dmg_chance = dmg_chance
         self.__duration = duration
@@ -442,22 +911,10 @@ class AbilityPhase:
 
 
     def get_damage_txt(self):
-        max_damage = "infinity" if self.duration <= 0 else int((self.duration/self.frequency) * self.dmg)
-
-        dmg_chance = int(100 * self.dmg_chance)
-        if self.dmg > 0 and self.max_damaged_entities > 0:
-            localisation = ""
-            secondStr = "seconds" if self.frequency != 1 else "second"
-            entityStr = "entities" if self.max_damaged_entities > 1 else "entity"
-            time = int(self.frequency) if self.frequency.is_integer() else self.frequency
-            if max_damage == "infinity":
-                localisation = "Deals {dmg} damage to {entities} {entityStr} every {time} {secondStr} until all entities die.".format(dmg=self.dmg,entities=self.max_damaged_entities,entityStr=entityStr, time=time, secondStr=secondStr)
-            elif dmg_chance == 0:
-                localisation = "Deals {dmg} damage to {entities} {entityStr}. (Max damage: {maxDmg})".format(dmg=self.dmg, entities=self.max_damaged_entities, entityStr=entityStr, maxDmg=max_damage)
-            else:
-                localisation = "{chance}% chance to deal {dmg} damage per {time} {secondStr} to {entityCount} {entityStr}. (Max damage: {maxDmg})".format(chance=dmg_chance, dmg=self.dmg, entityCount=self.max_damaged_entities, entityStr=entityStr, maxDmg=max_damage, time=time, secondStr=secondStr)
-            return [localisation, self.onscreen_name]
-        return False
+        max_damage = get_phase_max_damage(self.dmg, self.duration, self.frequency)
+        localisation = create_phase_damage_string(self.dmg, get_chance_percent(self.dmg_chance), format_number(self.frequency), max_damage, self.max_damaged_entities)
+        if localisation == False: return False
+        return [localisation, self.onscreen_name]
 
     @property
     def key(self): return self.__key
@@ -480,8 +937,10 @@ class AbilityPhase:
     def __repr__(self): return self.__str__()
 
 class Vortex:
+    __slots__ = ("__key", "__dmg", "__dmgap", "__is_fire_damage", "__is_magical_damage", "__goal_radius", "__start_radius", "__movement_speed", "__expansion_speed", "ability_phase", "__contact_stat_effect")
+
     def __init__(self, key, dmg, dmgap, is_fire_damage, is_magical, goal_radius, start_radius, movement_speed, expansion_speed, ability_phase_ref, contact_effect):
-        self.__key = key
+        self.__key = _intern(key)
         self.__dmg = int(dmg)     # cast tsv float to int @see TSVFactory.find_column_type
         self.__dmgap = int(dmgap) # cast tsv float to int @see TSVFactory.find_column_type
         self.__is_fire_damage = is_fire_damage
@@ -491,7 +950,7 @@ class Vortex:
         self.__movement_speed = movement_speed
         self.__expansion_speed = expansion_speed
         self.ability_phase = ability_phase_ref
-        self.__contact_stat_effect = contact_effect
+        self.__contact_stat_effect = _intern(contact_effect)
 
     def deals_no_damage(self):
         return self.dmg == self.dmgap == 0
@@ -516,15 +975,11 @@ class Vortex:
 
 
     def get_expanding_radius_txt(self):
-        start_radius = int(self.start_radius) if self.start_radius.is_integer() else self.start_radius
-        goal_radius = int(self.goal_radius) if self.goal_radius.is_integer() else self.goal_radius
-        expansion_speed = int(self.expansion_speed) if self.expansion_speed.is_integer() else self.expansion_speed
-        return "Damage radius expands from {srad} up to {grad} by {espeed} every second".format(srad=start_radius, grad=goal_radius, espeed=expansion_speed)
+        return create_expanding_radius_string(format_number(self.start_radius), format_number(self.goal_radius), format_number(self.expansion_speed))
 
     def get_equal_radius_txt(self):
         assert self.goal_radius == self.start_radius
-        goal_radius = int(self.goal_radius) if self.goal_radius.is_integer() else self.goal_radius
-        return "Constant damage radius: {rad}".format(rad=goal_radius)
+        return create_equal_radius_string(format_number(self.goal_radius))
 
     @property
     def key(self): return self.__key
@@ -533,6 +988,10 @@ class Vortex:
     @property
     def dmgap(self): return self.__dmgap
     @property
+    def is_fire_damage(self): return self.__is_fire_damage
+    @property
+    def is_magical_damage(self): return self.__is_magical_damage
+    @property
     def goal_radius(self): return self.__goal_radius
     @property
     def start_radius(self): return self.__start_radius
@@ -551,11 +1010,13 @@ class Vortex:
     def __repr__(self): return self.__str__()
 
 class SpecialUnitAbility:
+    __slots__ = ("__key", "__used_projectile_key", "__used_vortex_key", "__used_bombardment_key", "__wind_up_time", "__is_passive")
+
     def __init__(self, key, used_projectile_key, used_vortex_key, used_bombardment_key, wind_up_time, is_passive):
-        self.__key = key
-        self.__used_projectile_key = used_projectile_key
-        self.__used_vortex_key = used_vortex_key
-        self.__used_bombardment_key = used_bombardment_key
+        self.__key = _intern(key)
+        self.__used_projectile_key = _intern(used_projectile_key)
+        self.__used_vortex_key = _intern(used_vortex_key)
+        self.__used_bombardment_key = _intern(used_bombardment_key)
         self.__wind_up_time = wind_up_time
         self.__is_passive = is_passive
     
@@ -578,20 +1039,19 @@ class SpecialUnitAbility:
         .format(key=self.__key, proj=self.__used_projectile_key, vortex=self.__used_vortex_key, bomb=self.__used_bombardment_key))
 
 class ProjectileExplosion:
+    __slots__ = ("__key", "__detonation_dmg", "__detonation_dmgap", "__magical")
+
     def __init__(self, key, detonation_dmg, detonation_dmgap, is_magical):
-        self.__key = key
+        self.__key = _intern(key)
         self.__detonation_dmg = int(detonation_dmg)      # cast tsv float to int @see TSVFactory.find_column_type
         self.__detonation_dmgap = int(detonation_dmgap)  # cast tsv float to int @see TSVFactory.find_column_type
         self.__magical = is_magical
 
+    def deals_damage(self):
+        return self.__detonation_dmg > 0 or self.__detonation_dmgap > 0
+
     def get_detonation_string(self):
-        detonation_loc = "Detonation damage (per projectile): " if self.__magical else "Detonation damage (per projectile & non-magical): "
-        magic_icon = "" if self.__magical == False else "[[img:icon_dmg_magical]][[/img]]"
-        if self.__detonation_dmg > 0: detonation_loc += str(self.__detonation_dmg) +magic_icon
-        if self.__detonation_dmgap > 0:
-            if self.__detonation_dmg > 0: detonation_loc += " and " + str(self.__detonation_dmgap) +"[[img:icon_ap]][[/img]]"
-            else: detonation_loc += str(self.__detonation_dmgap) + "[[img:icon_ap]][[/img]]"
-        return detonation_loc
+        return _create_detonation_string(self.__detonation_dmg, self.__detonation_dmgap, self.__magical)
 
     @property
     def key(self): return self.__key
@@ -614,8 +1074,10 @@ class ProjectileExplosion:
         return False
 
 class Projectile:
+    __slots__ = ("__key", "__dmg", "__dmgap", "__bonus_v_large", "__bonus_v_infantry", "__is_fire_damage", "__is_magical", "__projectile_number", "__voley", "__explosion_type", "ref_projectile_explosion", "__contact_stat_effect")
+
     def __init__(self, key, dmg, dmgap, b_v_L, b_v_I, is_fire, is_magical, proj_num, voley, explosion_type, proj_explosion_ref, contact_effect):
-        self.__key = key
+        self.__key = _intern(key)
         self.__dmg = int(dmg)      # cast tsv float to int @see TSVFactory.find_column_type
         self.__dmgap = int(dmgap)  # cast tsv float to int @see TSVFactory.find_column_type
         self.__bonus_v_large = b_v_L 
@@ -624,9 +1086,9 @@ class Projectile:
         self.__is_magical = is_magical
         self.__projectile_number = proj_num
         self.__voley = voley
-        self.__explosion_type = explosion_type
+        self.__explosion_type = _intern(explosion_type)
         self.ref_projectile_explosion = proj_explosion_ref
-        self.__contact_stat_effect = contact_effect
+        self.__contact_stat_effect = _intern(contact_effect)
 
     def set_projectile_explosion_ref(self, detonation):
         assert detonation != None
@@ -691,20 +1153,15 @@ class Projectile:
     def contact_stat_effect(self): return self.__contact_stat_effect
 
 class Bombardment:
+    __slots__ = ("__key", "__num_projectiles", "__projectile_type_key")
+
     def __init__(self, key, num_proj, proj_type_key):
-        self.__key = key
+        self.__key = _intern(key)
         self.__num_projectiles = num_proj
-        self.__projectile_type_key = proj_type_key
+        self.__projectile_type_key = _intern(proj_type_key)
 
-    def get_bombardment_string(self, projectile): 
-        is_projectiles_plural = ""
-        additional_sub_projectile_hint = "" if projectile.projectile_number == 1 else " (each projectile launches " + str(projectile.projectile_number) +" projectiles)"
-        if (self.__num_projectiles > 1): is_projectiles_plural = "projectiles" +additional_sub_projectile_hint+ ", each"
-        else: is_projectiles_plural = "projectile " + additional_sub_projectile_hint
-        damageTxt = create_damage_string(projectile.dmg, projectile.dmgap, projectile.is_fire_damage, projectile.is_magical_damage)
-
-        if damageTxt == False: return False
-        return "Launch {numproj} {projectile_str} dealing {damageTxt}".format(numproj=self.__num_projectiles, projectile_str=is_projectiles_plural, damageTxt=damageTxt)
+    def get_bombardment_string(self, projectile):
+        return _create_bombardment_string(self.__num_projectiles, projectile.projectile_number, projectile.dmg, projectile.dmgap, projectile.is_fire_damage, projectile.is_magical_damage)
 
 
     def get_projectile(self, projectile_map): return projectile_map[self.__projectile_type_key]
@@ -721,3 +1178,16 @@ class Bombardment:
         .format(key=self.__key, numproj=self.__num_projectiles, projtype=self.__projectile_type_key))
 
     def __repr__(self): return self.__str__()
+
+# Map<table name, (entity class, properties in the order of the constructor arguments)> used to build entities from stored rows
+# e.g. previews of changed rows (@see service.py) or rows read from a TableStore
+ENTITY_FIELDS = {
+    "projectiles": (Projectile, ("key", "dmg", "dmgap", "bonus_v_large", "bonus_v_infantry", "is_fire_damage", "is_magical_damage", "projectile_number", "voley", "explosion_type", "ref_projectile_explosion", "contact_stat_effect")),
+    "bombardments": (Bombardment, ("key", "num_projectiles", "projectile_type_key")),
+    "projectile_explosions": (ProjectileExplosion, ("key", "detonation_damage", "detonation_damage_ap", "is_magical")),
+    "special_unit_abilities": (SpecialUnitAbility, ("key", "used_projectile_key", "used_vortex_key", "used_bombardment_key", "wind_up_time", "is_passive")),
+    "vortexes": (Vortex, ("key", "dmg", "dmgap", "is_fire_damage", "is_magical_damage", "goal_radius", "start_radius", "movement_speed", "expansion_speed", "ability_phase", "contact_stat_effect")),
+    "ability_phases": (AbilityPhase, ("key", "dmg", "dmg_chance", "duration", "frequency", "max_damaged_entities", "onscreen_name")),
+}
+# Entity fields referencing other entities, set when the tables are linked @see AbstractFactory._link_tables
+ENTITY_REFERENCES = {"ref_projectile_explosion", "ability_phase"}
@@ -0,0 +1,66 @@
+import hashlib
+import pickle
+import mmap
+import os
+
+# On-disk snapshots of parsed tables.
+# A snapshot is keyed by the content hash of the source files the table was parsed from and the schema version,
+# so warm runs with unchanged tables skip the XML/TSV parsing entirely.
+class TableCache:
+    # Bump whenever the entity classes in structs.py or the way tables are parsed change.
+    SCHEMA_VERSION = 2
+    SNAPSHOT_EXTENSION = ".snapshot"
+
+    def __init__(self, directory="cache"):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    # Returns the cached table (Map<key, entity>) or None if there is no valid snapshot for the source files.
+    def load(self, table_name, source_paths):
+        path = self._get_snapshot_path(table_name, source_paths)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        with open(path, "rb") as f:
+            # Snapshots are unpickled straight from the mapped file without copying it into memory first
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+                table = pickle.loads(snapshot)
+        self.hits += 1
+        return table
+
+    def store(self, table_name, source_paths, table):
+        path = self._get_snapshot_path(table_name, source_paths)
+        # Snapshots of previous versions of the table are no longer valid
+        self.invalidate(table_name)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, table_name):
+        prefix = table_name + "-"
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith(prefix) and file_name.endswith(self.SNAPSHOT_EXTENSION):
+                os.remove(os.path.join(self.directory, file_name))
+
+    def _get_snapshot_path(self, table_name, source_paths):
+        return os.path.join(self.directory, table_name + "-" + get_source_digest(source_paths, self.SCHEMA_VERSION) + self.SNAPSHOT_EXTENSION)
+
+# Returns the hex digest of the content of the source files and the schema version
+def get_source_digest(source_paths, schema_version):
+    digest = hashlib.sha1(str(schema_version).encode())
+    for source_path in source_paths:
+        # Optional sources (e.g. the phase localisation of tsv files) are part of the key even if missing
+        if not os.path.exists(source_path):
+            digest.update(b"missing")
+            continue
+        digest.update(str(os.path.getsize(source_path)).encode())
+        with open(source_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
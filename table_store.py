@@ -0,0 +1,233 @@
+from collections.abc import Mapping, ValuesView
+import argparse
+import sqlite3
+import sys
+
+from logger import Logger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import AbstractFactory, ProjectileExplosion, FACTORIES, make_factory, ENTITY_FIELDS, ENTITY_REFERENCES
+from table_cache import get_source_digest
+from instrumentation import instruments
+
+# Tables stored in a local SQLite database instead of memory, for datasets too large to hold every entity at once.
+# The tables are imported one row at a time from a deferred factory (@see AbstractFactory.iter_entities) and the database
+# is kept between runs, later runs with unchanged source files skip parsing entirely.
+# Entities are built from the database when they are iterated or looked up (by indexed primary key), references between
+# tables (projectile -> explosion, projectile -> bombardments) are resolved with indexed joins.
+# Usage: python table_store.py [--format tsv|xml] [--dir DIR] [--db PATH] [--out DIR]
+
+# Fields stored as integers which are read back as bools
+BOOLEAN_FIELDS = {"is_fire_damage", "is_magical_damage", "is_magical", "is_passive"}
+
+class TableStore:
+    # Bump whenever the stored columns change, the tables are imported again
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path="tables.db"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self._create_tables()
+
+    def close(self):
+        self.connection.close()
+
+    # Returns the stored columns of a table (the fields of the entity without references)
+    @staticmethod
+    def get_columns(table_name):
+        return [field for field in ENTITY_FIELDS[table_name][1] if field not in ENTITY_REFERENCES]
+
+    def _create_tables(self):
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            if self.get_meta("schema_version") != str(self.SCHEMA_VERSION):
+                for table_name in AbstractFactory.TABLE_NAMES:
+                    self.connection.execute("DROP TABLE IF EXISTS " + table_name)
+                self.connection.execute("DELETE FROM meta")
+            # Columns without a declared type keep the type of the stored value (e.g. 1 and 1.0 are rendered differently)
+            # The tables are iterated by rowid which is the order the rows were imported in
+            for table_name in AbstractFactory.TABLE_NAMES:
+                columns = ", ".join(column + (" TEXT PRIMARY KEY" if column == "key" else "") for column in self.get_columns(table_name))
+                self.connection.execute("CREATE TABLE IF NOT EXISTS {table} ({columns})".format(table=table_name, columns=columns))
+            self.connection.execute("CREATE INDEX IF NOT EXISTS bombardments_projectile_type_key ON bombardments (projectile_type_key)")
+            self._set_meta("schema_version", str(self.SCHEMA_VERSION))
+
+    def get_meta(self, name):
+        row = self.connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row != None else None
+
+    def _set_meta(self, name, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def _get_sources_digest(self, factory):
+        jobs = [factory.table_jobs[table_name] for table_name in AbstractFactory.TABLE_NAMES if table_name in factory.table_jobs]
+        source_paths = [source_path for (table_name, source_paths, parse_method_name, args) in jobs for source_path in source_paths]
+        tables = ",".join(table_name for (table_name, source_paths, parse_method_name, args) in jobs)
+        return get_source_digest(source_paths, "{version}:{factory}:{tables}".format(version=self.SCHEMA_VERSION, factory=factory.__class__.__name__, tables=tables))
+
+    # Returns true if the tables were imported from the current source files of the factory
+    def is_current(self, factory):
+        return self.get_meta("sources") == self._get_sources_digest(factory)
+
+    # Replace the stored tables with the tables of a factory, its rows are read one at a time (e.g. from a deferred factory).
+    # Rows with a key which was already imported replace the previous row but keep its position like in the factories.
+    def import_tables(self, factory, log):
+        log.set_active_class("TableStore")
+        with self.connection:
+            for table_name in AbstractFactory.TABLE_NAMES:
+                timer = instruments.start("import." + table_name)
+                columns = self.get_columns(table_name)
+                self.connection.execute("DELETE FROM " + table_name)
+                if table_name in factory.table_jobs:
+                    entities = factory.iter_entities(table_name) if factory.deferred else getattr(factory, table_name).values()
+                    rows = (tuple(getattr(entity, column) for column in columns) for entity in entities)
+                    self.connection.executemany("INSERT INTO {table} ({columns}) VALUES ({values}) ON CONFLICT (key) DO UPDATE SET {updates}".format(
+                        table=table_name, columns=", ".join(columns), values=", ".join("?" for column in columns),
+                        updates=", ".join("{column} = excluded.{column}".format(column=column) for column in columns if column != "key")), rows)
+                count = self.connection.execute("SELECT COUNT(*) FROM " + table_name).fetchone()[0]
+                log.info("Imported %d rows of %s", count, table_name)
+                instruments.stop(timer)
+            self._set_meta("sources", self._get_sources_digest(factory))
+        log.reset_active_class()
+
+# Read-only view of a stored table, the entities are built from the rows when they are accessed and aren't kept in memory.
+class StoreTable(Mapping):
+    def __init__(self, store, table_name):
+        self.store = store
+        self.table_name = table_name
+        (self.entity_class, self.fields) = ENTITY_FIELDS[table_name]
+        self.columns = store.get_columns(table_name)
+        self.select = "SELECT {columns} FROM {table} t".format(columns=", ".join("t." + column for column in self.columns), table=table_name)
+
+    def _create_entity(self, row):
+        values = dict(zip(self.columns, row))
+        return self.entity_class(*[self._get_value(field, values) for field in self.fields])
+
+    def _get_value(self, field, values):
+        if field in ENTITY_REFERENCES: return None
+        value = values[field]
+        return bool(value) if field in BOOLEAN_FIELDS and value != None else value
+
+    def __getitem__(self, key):
+        row = self.store.connection.execute(self.select + " WHERE t.key = ?", (key,)).fetchone()
+        if row == None: raise KeyError(key)
+        return self._create_entity(row)
+
+    def __contains__(self, key):
+        return self.store.connection.execute("SELECT 1 FROM {table} WHERE key = ?".format(table=self.table_name), (key,)).fetchone() != None
+
+    def __iter__(self):
+        for (key,) in self.store.connection.execute("SELECT key FROM {table} ORDER BY rowid".format(table=self.table_name)):
+            yield key
+
+    def __len__(self):
+        return self.store.connection.execute("SELECT COUNT(*) FROM " + self.table_name).fetchone()[0]
+
+    # The entities are built from a single query instead of one lookup per key
+    def values(self): return StoreValues(self)
+
+    def iter_entities(self):
+        for row in self.store.connection.execute(self.select + " ORDER BY t.rowid"):
+            yield self._create_entity(row)
+
+class StoreValues(ValuesView):
+    def __iter__(self): return self._mapping.iter_entities()
+
+# Projectiles are joined with the explosion they are linked to @see AbstractFactory._get_linked_explosion
+class StoreProjectileTable(StoreTable):
+    def __init__(self, store):
+        super(StoreProjectileTable, self).__init__(store, "projectiles")
+        self.explosion_columns = store.get_columns("projectile_explosions")
+        self.select = ("SELECT {columns}, {explosion_columns} FROM projectiles t LEFT JOIN projectile_explosions e"
+            " ON e.key = t.explosion_type AND (e.detonation_damage > 0 OR e.detonation_damage_ap > 0)").format(
+            columns=", ".join("t." + column for column in self.columns), explosion_columns=", ".join("e." + column for column in self.explosion_columns))
+
+    def _create_entity(self, row):
+        projectile = super(StoreProjectileTable, self)._create_entity(row[:len(self.columns)])
+        explosion = dict(zip(self.explosion_columns, row[len(self.columns):]))
+        if explosion["key"] != None:
+            projectile.ref_projectile_explosion = ProjectileExplosion(explosion["key"], explosion["detonation_damage"], explosion["detonation_damage_ap"], bool(explosion["is_magical"]))
+        return projectile
+
+# Map<projectile key, [Bombardment]> queried from the index of the bombardments by projectile @see AbstractFactory._index_bombardments
+class StoreBombardmentIndex(Mapping):
+    def __init__(self, store, bombardments):
+        self.store = store
+        self.bombardments = bombardments
+
+    def __getitem__(self, projectile_key):
+        # Upgraded projectiles (x_upgraded) are also used by the bombardments of the base projectile (x)
+        projectile_keys = (projectile_key,)
+        base_key = projectile_key.replace("_upgraded", "")
+        if base_key != projectile_key and self.store.connection.execute("SELECT 1 FROM projectiles WHERE key = ?", (projectile_key,)).fetchone() != None:
+            projectile_keys = (projectile_key, base_key)
+        rows = self.store.connection.execute(self.bombardments.select + " WHERE t.projectile_type_key IN ({keys}) ORDER BY t.rowid".format(
+            keys=", ".join("?" for key in projectile_keys)), projectile_keys).fetchall()
+        if not rows: raise KeyError(projectile_key)
+        return [self.bombardments._create_entity(row) for row in rows]
+
+    def __iter__(self):
+        query = ("SELECT DISTINCT projectile_type_key FROM bombardments WHERE projectile_type_key IS NOT NULL"
+            " UNION SELECT p.key FROM projectiles p WHERE p.key LIKE '%\\_upgraded%' ESCAPE '\\'"
+            " AND EXISTS (SELECT 1 FROM bombardments b WHERE b.projectile_type_key = replace(p.key, '_upgraded', ''))")
+        for (key,) in self.store.connection.execute(query):
+            yield key
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+# Factory reading the tables from a TableStore, the tables are never loaded into memory.
+# e.g.
+#   store = TableStore("tables.db")
+#   source = TSVFactory(log, "tsv/projectiles.tsv", ..., deferred=True)
+#   if not store.is_current(source): store.import_tables(source, log)
+#   factory = StoreFactory(log, store)
+class StoreFactory(AbstractFactory):
+    def __init__(self, logger, store):
+        super(StoreFactory, self).__init__(logger)
+        self.store = store
+        for table_name in self.TABLE_NAMES:
+            setattr(self, table_name, StoreProjectileTable(store) if table_name == "projectiles" else StoreTable(store, table_name))
+        self.bombardments_by_projectile = StoreBombardmentIndex(store, self.bombardments)
+
+    # References are resolved by the queries of the tables
+    def _link_tables(self): return
+
+    # Rows are parsed by the factory the tables are imported from
+    def create_ability_phase(self, source): raise Exception("StoreFactory doesn't parse tables")
+    def create_vortex(self, source): raise Exception("StoreFactory doesn't parse tables")
+    def create_special_unit_ability(self, source): raise Exception("StoreFactory doesn't parse tables")
+    def create_projectile_explosion(self, source): raise Exception("StoreFactory doesn't parse tables")
+    def create_projectile(self, source): raise Exception("StoreFactory doesn't parse tables")
+    def create_bombardment(self, source): raise Exception("StoreFactory doesn't parse tables")
+    def _read_table_rows(self, table_name, fingerprints=True): raise Exception("StoreFactory doesn't parse tables")
+    def read_table_columns(self, table_name, columns): raise Exception("StoreFactory doesn't parse tables")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generate the tooltips from tables stored in a SQLite database, the database is updated if the tables changed.")
+    parser.add_argument("--format", choices=list(FACTORIES), default="tsv")
+    parser.add_argument("--dir", help="directory of the tables (defaults to the sample tables of the format)")
+    parser.add_argument("--db", default="tables.db", help="path of the database, kept between runs")
+    parser.add_argument("--out", default="out", help="output directory")
+    args = parser.parse_args(argv)
+
+    log = Logger("table_store.txt", level=Logger.INFO)
+    # XML tables are streamed so only one row is in memory at a time
+    options = {"streaming": True} if args.format == "xml" else {}
+    source = make_factory(log, args.format, args.dir, deferred=True, **options)
+
+    store = TableStore(args.db)
+    if store.is_current(source):
+        log.info("Reusing the tables stored in %s", args.db)
+    else:
+        store.import_tables(source, log)
+    factory = StoreFactory(log, store)
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(factory).generate_tooltips(atg, log)
+    atg.generate_tsv_files(log, output_dir=args.out)
+    store.close()
+    log.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,83 @@
+import argparse
+import sys
+
+from logger import Logger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import FACTORIES, get_table_paths
+
+# Generates the tooltips of a few unit abilities without building the rest of the tables.
+# The references of all rows are read first (only the key & reference columns, no row is built), then the tables are parsed
+# again keeping only the rows required by the abilities (@see AbstractFactory keys) so linking & generation scale with the abilities.
+# Usage: python targeted.py [--format tsv|xml] [--dir DIR] [--out DIR] KEY [KEY ...]
+# e.g. python targeted.py --format tsv wh2_main_spell_fireball wh_main_spell_death_doom
+
+# source: factory whose tables are recorded but not parsed (deferred) @see AbstractFactory.read_table_columns
+# Returns the keys of the rows (in any table) required to generate the tooltips of the unit abilities.
+# Tooltip keys are shared between tables (e.g. a unit ability & the bombardment it uses), so all rows of a required key are required.
+# Mirrors the references followed by SpellManager.generate_tooltips @see DependencyIndex
+def get_required_keys(source, ability_keys):
+    references = {} # Map<table name, Map<key, keys of the referenced rows>>
+    for table_name, columns in source.REFERENCE_COLUMNS.items():
+        table_references = references[table_name] = {}
+        for (key, *referenced_keys) in source.read_table_columns(table_name, [source.KEY_COLUMNS[table_name]] + columns):
+            # Rows of later sources replace the earlier ones like in the tables
+            table_references[key] = [referenced_key for referenced_key in referenced_keys if referenced_key != None]
+
+    # Upgraded projectiles (e.g. x_upgraded) are used by the bombardments of the base projectile @see AbstractFactory._index_bombardments
+    upgraded_projectiles = {}
+    for projectile_key in references["projectiles"]:
+        base_key = projectile_key.replace("_upgraded", "")
+        if base_key != projectile_key: upgraded_projectiles.setdefault(base_key, []).append(projectile_key)
+    # Whether a projectile has tooltips of its own depends on the bombardments launching it
+    bombardments_by_projectile = {}
+    for bombardment_key, (projectile_key, *_) in references["bombardments"].items():
+        for used_key in [projectile_key] + upgraded_projectiles.get(projectile_key, []):
+            bombardments_by_projectile.setdefault(used_key, []).append(bombardment_key)
+
+    keys = set(ability_keys)
+    pending = list(keys)
+    while pending:
+        key = pending.pop()
+        referenced_keys = references["special_unit_abilities"].get(key, []) + bombardments_by_projectile.get(key, [])
+        if key in references["bombardments"]:
+            referenced_keys += references["bombardments"][key]
+            for projectile_key in references["bombardments"][key]:
+                referenced_keys += upgraded_projectiles.get(projectile_key, [])
+        referenced_keys += references["projectiles"].get(key, [])
+        for referenced_key in referenced_keys:
+            if referenced_key not in keys:
+                keys.add(referenced_key)
+                pending.append(referenced_key)
+    return keys
+
+# factory_class, paths: the factory of the tables & its arguments e.g. TSVFactory and the paths of the tsv files
+# Returns the AbilityTooltipGenerator with the tooltips of the unit abilities (and of the rows they required)
+def generate_abilities(log, factory_class, paths, ability_keys):
+    keys = get_required_keys(factory_class(log, *paths, deferred=True), ability_keys)
+    log.info("%d unit abilities require the rows of %d keys", len(ability_keys), len(keys))
+    factory = factory_class(log, *paths, keys=keys)
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(factory).generate_tooltips(atg, log, keys=keys)
+    return atg
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generate the tooltips of a few unit abilities, only the rows they require are parsed.")
+    parser.add_argument("abilities", nargs="+", help="keys of the unit_special_abilities rows")
+    parser.add_argument("--format", choices=list(FACTORIES), default="tsv")
+    parser.add_argument("--dir", help="directory of the tables (defaults to the sample tables of the format)")
+    parser.add_argument("--out", default="out", help="output directory")
+    args = parser.parse_args(argv)
+
+    log = Logger("targeted.txt", level=Logger.INFO)
+    ability_keys = set(args.abilities)
+    atg = generate_abilities(log, FACTORIES[args.format], get_table_paths(args.format, args.dir), ability_keys)
+    missing_keys = ability_keys - atg.arr_tooltips.keys()
+    if missing_keys: log.warn("No tooltips for %s", " ".join(sorted(missing_keys)))
+    atg.generate_tsv_files(log, output_dir=args.out, keys=ability_keys)
+    log.close()
+    print("Generated the tooltips of {count} unit abilities in {out}".format(count=len(ability_keys) - len(missing_keys), out=args.out))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,54 @@
+import pytest
+import sys
+import os
+
+# The modules are at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger import NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import SCRIPT_DIR, make_factory
+
+SAMPLE_DIR = os.path.join(SCRIPT_DIR, "tsv")
+
+# Logs, caches & outputs written with relative paths stay in the temporary directory of the test
+@pytest.fixture(autouse=True)
+def run_in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+# Returns the header lines & rows (lists of columns) of a tsv table, a sample table by default
+def read_table(file_name, directory=SAMPLE_DIR):
+    with open(os.path.join(directory, file_name), "r", newline="") as f:
+        lines = f.read().splitlines()
+    return (lines[:2], [line.split("\t") for line in lines[2:] if line])
+
+def write_table(directory, file_name, header, rows):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, file_name), "w", newline="") as f:
+        f.write("\n".join(header + ["\t".join(row) for row in rows]) + "\n")
+
+# Returns the index of the column in the rows of a table read by read_table
+def get_column(header, column):
+    return header[1].split("\t").index(column)
+
+# Returns Map<file name, content> of the output files in the directory
+def read_output(output_dir):
+    output = {}
+    for file_name in AbilityTooltipGenerator.OUTPUT_FILES:
+        with open(os.path.join(output_dir, file_name), "rb") as f:
+            output[file_name] = f.read()
+    return output
+
+# Output of a sequential run on the tables of the format in the directory, the reference of the other entry points
+# options: arguments of the factory e.g. streaming=True
+def generate_output(output_dir, format="tsv", directory=None, **options):
+    log = NullLogger()
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(make_factory(log, format, directory, **options)).generate_tooltips(atg, log)
+    atg.generate_tsv_files(log, output_dir=str(output_dir))
+    return read_output(output_dir)
+
+@pytest.fixture(scope="session")
+def sample_output(tmp_path_factory):
+    return generate_output(tmp_path_factory.mktemp("sample_output"))
@@ -0,0 +1,46 @@
+import pytest
+
+from logger import NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import make_factory
+
+from conftest import read_output, generate_output
+
+# Copies every tooltip of the abilities a unit ability reuses instead of sharing them @see SpellManager.copy_tooltips
+class CopyingSpellManager(SpellManager):
+    def copy_tooltips(self, unit_ability_key, tooltip, atg):
+        copies = {
+            atg.TAG_DAMAGE_TOOLTIP[0]: atg.add_damage_tooltip,
+            atg.TAG_DETONATION_DAMAGE_TOOLTIP[0]: atg.add_detonation_damage_tooltip_with_local,
+            atg.TAG_BONUS_V_LARGE[0]: atg.add_bonus_v_large_tooltip,
+            atg.TAG_PHASE_TOOLTIP[0]: atg.add_phase_tooltip,
+            atg.TAG_EQUAL_RADIUS[0]: atg.add_equal_radius_tooltip,
+            atg.TAG_EXPANDING_RADIUS[0]: atg.add_expanding_radius_tooltip,
+            atg.TAG_WIND_UP_TINE[0]: atg.add_wind_up_time_tooltip,
+            atg.TAG_ON_CONTACT[0]: atg.add_on_contact_tooltip,
+        }
+        copies[tooltip["tag"][0]](unit_ability_key, tooltip["localisation"])
+
+def generate_tooltips(spell_manager_class, format):
+    log = NullLogger()
+    atg = AbilityTooltipGenerator(log)
+    spell_manager_class(make_factory(log, format)).generate_tooltips(atg, log)
+    return atg
+
+# Returns the ids of the tooltips stored under several keys
+def get_shared_tooltips(atg):
+    keys = {}
+    for key, tooltips in atg.arr_tooltips.items():
+        for tooltip in tooltips.values():
+            keys.setdefault(id(tooltip), []).append(key)
+    return {tooltip_id for tooltip_id, tooltip_keys in keys.items() if len(tooltip_keys) > 1}
+
+@pytest.mark.parametrize("format", ["tsv", "xml"])
+def test_aliases_match_copies(tmp_path, format):
+    atg = generate_tooltips(SpellManager, format)
+    copied = generate_tooltips(CopyingSpellManager, format)
+    assert get_shared_tooltips(atg) and not get_shared_tooltips(copied)
+
+    copied.generate_tsv_files(NullLogger(), output_dir=str(tmp_path / "copied"))
+    assert read_output(tmp_path / "copied") == generate_output(tmp_path / "expected", format)
@@ -0,0 +1,58 @@
+import shutil
+import pytest
+import os
+
+from logger import NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import make_factory
+import batch
+
+from conftest import SAMPLE_DIR, read_table, write_table, get_column, read_output, generate_output
+
+# Changed rows of each mod: Map<mod name, (file name, key column, key, Map<column, value>)>
+MODS = {
+    "bombardments": ("projectile_bombardments.tsv", "bombardment_key", "wh2_dlc09_unit_abilities_death_from_above", {"num_projectiles": "7"}),
+    "vortexes": ("battle_vortexs.tsv", "vortex_key", "wh2_dlc09_abilities_sand_storm", {"damage": "99"}),
+}
+
+# Writes the changed rows of the mod to the mod directory and the whole changed table to a copy of the sample tables
+def write_mod(mod_dir, merged_dir, mod_name):
+    (file_name, key_column, key, values) = MODS[mod_name]
+    (header, rows) = read_table(file_name)
+    for row in rows:
+        if row[get_column(header, key_column)] != key: continue
+        for column, value in values.items(): row[get_column(header, column)] = value
+    write_table(mod_dir, file_name, header, [row for row in rows if row[get_column(header, key_column)] == key])
+    shutil.copytree(SAMPLE_DIR, merged_dir)
+    write_table(merged_dir, file_name, header, rows)
+
+# Returns the number of unit abilities with tooltips in a full run on the tables of the directory
+def count_abilities(directory):
+    log = NullLogger()
+    factory = make_factory(log, "tsv", directory)
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(factory).generate_tooltips(atg, log)
+    return sum(1 for key in factory.special_unit_abilities if key in atg.arr_tooltips)
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_mods_match_merged_tables(tmp_path, sample_output, processes):
+    mod_dirs = [str(tmp_path / "mods" / mod_name) for mod_name in MODS]
+    for mod_name in MODS:
+        write_mod(tmp_path / "mods" / mod_name, tmp_path / "merged" / mod_name, mod_name)
+    results = batch.generate_mods("tsv", SAMPLE_DIR, mod_dirs, str(tmp_path / "out"), processes, NullLogger())
+
+    for mod_name, mod_dir in zip(MODS, mod_dirs):
+        merged_dir = str(tmp_path / "merged" / mod_name)
+        expected = generate_output(tmp_path / "expected" / mod_name, "tsv", merged_dir)
+        assert expected != sample_output
+        assert read_output(tmp_path / "out" / mod_name) == expected
+        assert results[mod_dir] == count_abilities(merged_dir)
+
+# Mods with the same directory name would be written to the same output directory
+def test_mods_with_the_same_name(tmp_path):
+    mod_dirs = [str(tmp_path / "a" / "mod"), str(tmp_path / "b" / "mod")]
+    for mod_dir in mod_dirs: os.makedirs(mod_dir)
+    with pytest.raises(Exception, match="same name"):
+        batch.generate_mods("tsv", SAMPLE_DIR, mod_dirs, str(tmp_path / "out"), 2, NullLogger())
+    assert not os.path.exists(tmp_path / "out")
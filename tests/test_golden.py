@@ -0,0 +1,66 @@
+import os
+
+from golden import update_golden, check_outputs, read_golden_hashes, hash_file
+
+from conftest import read_output
+
+LOC_FILE = "th_damage_loc.tsv"
+EFFECTS_FILE = "unit_abilities_additional_ui_effects_tables.tsv"
+JUNCS_FILE = "unit_abilities_to_additional_ui_effects_juncs_tables.tsv"
+
+def write_output(output_dir, output):
+    os.makedirs(output_dir, exist_ok=True)
+    for file_name, content in output.items():
+        with open(os.path.join(output_dir, file_name), "wb") as f:
+            f.write(content)
+
+def get_lines(output, file_name):
+    return output[file_name].decode().splitlines(keepends=True)
+
+def test_same_output(tmp_path, sample_output):
+    write_output(tmp_path / "out", sample_output)
+    update_golden(str(tmp_path / "out"), str(tmp_path / "golden"))
+    assert read_output(tmp_path / "golden") == sample_output
+    assert check_outputs(str(tmp_path / "out"), str(tmp_path / "golden")) == {file_name: None for file_name in sample_output}
+
+def test_row_diffs(tmp_path, sample_output):
+    write_output(tmp_path / "golden", sample_output)
+    lines = get_lines(sample_output, LOC_FILE)
+    (header, rows) = (lines[:2], lines[2:])
+    changed = rows[0].split("\t")
+    changed[1] = "changed text"
+    output = dict(sample_output)
+    output[LOC_FILE] = "".join(header + ["\t".join(changed)] + rows[2:] + ["added_key\ttext\ttrue\n"]).encode()
+    # Same rows in another order
+    lines = get_lines(sample_output, EFFECTS_FILE)
+    output[EFFECTS_FILE] = "".join(lines[:2] + lines[:1:-1]).encode()
+    write_output(tmp_path / "out", output)
+
+    results = check_outputs(str(tmp_path / "out"), str(tmp_path / "golden"))
+    loc_key = lambda row: row.split("\t")[0]
+    assert results[JUNCS_FILE] == None
+    assert results[LOC_FILE]["added"] == ["added_key"]
+    assert results[LOC_FILE]["removed"] == [loc_key(rows[1])]
+    assert results[LOC_FILE]["changed"] == [(loc_key(rows[0]), rows[0], "\t".join(changed))]
+    assert not results[LOC_FILE]["reordered"] and not results[LOC_FILE]["header"]
+    assert results[EFFECTS_FILE]["reordered"]
+
+def test_duplicated_rows_and_header(tmp_path, sample_output):
+    write_output(tmp_path / "golden", sample_output)
+    lines = get_lines(sample_output, EFFECTS_FILE)
+    output = dict(sample_output)
+    output[EFFECTS_FILE] = "".join(["changed header\n"] + lines[1:] + lines[2:3]).encode()
+    write_output(tmp_path / "out", output)
+    diff = check_outputs(str(tmp_path / "out"), str(tmp_path / "golden"))[EFFECTS_FILE]
+    assert diff["header"]
+    assert diff["duplicated"] == [lines[2].split("\t")[0]]
+
+# Golden files changed after the manifest was written are hashed again
+def test_stale_manifest(tmp_path, sample_output):
+    write_output(tmp_path / "out", sample_output)
+    update_golden(str(tmp_path / "out"), str(tmp_path / "golden"))
+    path = str(tmp_path / "golden" / LOC_FILE)
+    with open(path, "ab") as f:
+        f.write(b"added_key\ttext\ttrue\n")
+    assert read_golden_hashes(str(tmp_path / "golden"))[LOC_FILE]["sha1"] == hash_file(path)
+    assert check_outputs(str(tmp_path / "out"), str(tmp_path / "golden"))[LOC_FILE]["removed"] == ["added_key"]
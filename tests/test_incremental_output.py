@@ -0,0 +1,55 @@
+import shutil
+import json
+import os
+
+from logger import NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import make_factory
+
+from conftest import SAMPLE_DIR, read_table, write_table, get_column, read_output, generate_output
+
+# Runs the incremental mode on the tables of the directory, returns the output & the changeset
+def generate_incremental_output(output_dir, tables_dir):
+    log = NullLogger()
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(make_factory(log, "tsv", tables_dir)).generate_tooltips(atg, log)
+    atg.generate_tsv_files(log, incremental=True, output_dir=str(output_dir))
+    with open(os.path.join(output_dir, AbilityTooltipGenerator.CHANGESET_FILE)) as f:
+        return (read_output(output_dir), json.load(f))
+
+# Returns the output files written since their mtime was set to the epoch, reset: set it to the epoch again
+def get_written_files(output_dir, reset=False):
+    written = set()
+    for file_name in AbilityTooltipGenerator.OUTPUT_FILES:
+        path = os.path.join(output_dir, file_name)
+        if os.stat(path).st_mtime_ns != 0: written.add(file_name)
+        if reset: os.utime(path, ns=(0, 0))
+    return written
+
+def test_incremental_matches_full_run(tmp_path, sample_output):
+    tables_dir = str(tmp_path / "tables")
+    shutil.copytree(SAMPLE_DIR, tables_dir)
+    (output, changeset) = generate_incremental_output(tmp_path / "out", tables_dir)
+    assert output == sample_output
+    assert changeset["added"] and not changeset["removed"] and not changeset["modified"]
+
+    # Unchanged files aren't written again
+    get_written_files(tmp_path / "out", reset=True)
+    (output, changeset) = generate_incremental_output(tmp_path / "out", tables_dir)
+    assert output == sample_output
+    assert changeset == {"added": [], "removed": [], "modified": []}
+    assert get_written_files(tmp_path / "out") == set()
+
+    (header, rows) = read_table("projectile_bombardments.tsv")
+    for row in rows:
+        if row[get_column(header, "bombardment_key")] == "wh2_dlc09_unit_abilities_death_from_above": row[get_column(header, "num_projectiles")] = "7"
+    write_table(tables_dir, "projectile_bombardments.tsv", header, rows)
+    (output, changeset) = generate_incremental_output(tmp_path / "out", tables_dir)
+    expected = generate_output(tmp_path / "expected", "tsv", tables_dir)
+    assert output == expected
+    assert not changeset["added"] and not changeset["removed"]
+    assert changeset["modified"] and all("death_from_above" in tooltip_ref for tooltip_ref in changeset["modified"])
+    # Only the files whose content changed are written again
+    changed_files = {file_name for file_name in expected if expected[file_name] != sample_output[file_name]}
+    assert changed_files and get_written_files(tmp_path / "out") == changed_files
@@ -0,0 +1,38 @@
+import pytest
+import io
+
+from logger import Logger
+
+class FailingFile(io.StringIO):
+    def write(self, text):
+        raise OSError("disk full")
+
+def read_log(file_name):
+    with open("log/" + file_name) as f:
+        return f.read()
+
+@pytest.mark.parametrize("background", [False, True])
+def test_messages(background):
+    log = Logger("test.txt", level=Logger.INFO, background=background)
+    values = [1]
+    log.info("Values: %s", values)
+    # Messages are formatted when they are logged, not when they are written
+    values.append(2)
+    log.debug("Discarded %s", values)
+    log.close()
+    content = read_log("test.txt")
+    assert "[INFO] - Main: Values: [1]\n" in content
+    assert "Discarded" not in content
+
+# A message which can't be written doesn't stop the writer thread, its error is raised by flush instead of being printed
+def test_background_write_error(capsys):
+    log = Logger("test.txt", level=Logger.INFO, background=True)
+    (log.log_file, log_file) = (FailingFile(), log.log_file)
+    log.info("Lost")
+    with pytest.raises(OSError, match="disk full"):
+        log.flush()
+    log.log_file = log_file
+    log.info("Written")
+    log.close()
+    assert "Written" in read_log("test.txt")
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+import pytest
+
+import numeric_columns
+from numeric_columns import compute_phase_columns, compute_vortex_columns, compute_projectile_columns, format_number
+
+numpy = pytest.importorskip("numpy")
+
+VALUES = [0, 1, 2.0, 2.5, 0.1, -3.0, -3.5, 1e15, 1e15 + 0.5, float("inf"), float("-inf"), float("nan")]
+
+# Rows cycling through VALUES, enough of them for the NumPy path
+def make_rows(*attributes, offset=1):
+    count = numeric_columns.NUMPY_MIN_ROWS + len(VALUES)
+    return [SimpleNamespace(**{attribute: VALUES[(i + offset * index) % len(VALUES)] for index, attribute in enumerate(attributes)}) for i in range(count)]
+
+def compute_scalar(compute, rows, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(numeric_columns, "numpy", None)
+        return compute(rows)
+
+def assert_same_columns(numpy_columns, scalar_columns):
+    assert numpy_columns.keys() == scalar_columns.keys()
+    for column, values in numpy_columns.items():
+        # repr also compares the types (20 vs 20.0) & nan
+        assert [repr(value) for value in values] == [repr(value) for value in scalar_columns[column]], column
+
+def test_format_numbers_matches_format_number():
+    values = numpy.array(VALUES, dtype=numpy.float64)
+    assert [repr(value) for value in numeric_columns._format_numbers(values)] == [repr(format_number(value)) for value in VALUES]
+
+def test_vortex_columns_match_scalar_path(monkeypatch):
+    rows = make_rows("start_radius", "goal_radius", "expansion_speed")
+    assert_same_columns(compute_vortex_columns(rows), compute_scalar(compute_vortex_columns, rows, monkeypatch))
+
+def test_projectile_columns_match_scalar_path(monkeypatch):
+    rows = make_rows("dmg", "dmgap", "bonus_v_large")
+    assert_same_columns(compute_projectile_columns(rows), compute_scalar(compute_projectile_columns, rows, monkeypatch))
+
+# The scalar path raises for phases which can't be displayed (e.g. infinite damage), only displayable phases are compared
+def test_phase_columns_match_scalar_path(monkeypatch):
+    rows = [SimpleNamespace(dmg=dmg, duration=duration, frequency=frequency, dmg_chance=chance, max_damaged_entities=entities)
+        for dmg in (0, 5, 7.5) for duration in (-1, 0, 3, 10.5) for frequency in (0.5, 1, 2.0, 3)
+        for chance in (0, 0.18, 0.5, 1) for entities in (0, 18)]
+    assert len(rows) >= numeric_columns.NUMPY_MIN_ROWS
+    assert_same_columns(compute_phase_columns(rows), compute_scalar(compute_phase_columns, rows, monkeypatch))
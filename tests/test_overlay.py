@@ -0,0 +1,61 @@
+import shutil
+
+from logger import NullLogger
+from overlay import OverlayTable
+import batch
+
+from conftest import SAMPLE_DIR, read_table, write_table, get_column, read_output, generate_output
+
+# Writes a mod directory with the bombardment rows of death_from_above launching 7 projectiles, returns the rows
+def write_bombardments_mod(mod_dir):
+    (header, rows) = read_table("projectile_bombardments.tsv")
+    mod_rows = [row for row in rows if row[get_column(header, "bombardment_key")] == "wh2_dlc09_unit_abilities_death_from_above"]
+    for row in mod_rows: row[get_column(header, "num_projectiles")] = "7"
+    write_table(mod_dir, "projectile_bombardments.tsv", header, mod_rows)
+    return (header, rows, mod_rows)
+
+def get_tooltip(output, key):
+    for line in output["th_damage_loc.tsv"].decode().splitlines():
+        if line.startswith(key + "\t"): return line.split("\t")[1]
+    return None
+
+def test_mod_with_only_bombardments(tmp_path, sample_output):
+    write_bombardments_mod(tmp_path / "mod")
+    results = batch.generate_mods("tsv", SAMPLE_DIR, [str(tmp_path / "mod")], str(tmp_path / "out"), 1, NullLogger())
+    assert not isinstance(results[str(tmp_path / "mod")], Exception)
+
+    key = "unit_abilities_additional_ui_effects_localised_text_wh2_dlc09_unit_abilities_death_from_above_th_damage_tooltip"
+    assert get_tooltip(sample_output, key).startswith("[[col:yellow]]Launch 1 projectile ")
+    assert get_tooltip(read_output(tmp_path / "out" / "mod"), key).startswith("[[col:yellow]]Launch 7 projectiles, each")
+
+def test_mod_with_only_explosions(tmp_path, sample_output):
+    (header, rows) = read_table("projectiles_explosions.tsv")
+    write_table(tmp_path / "mod", "projectiles_explosions.tsv", header, rows[:1])
+    results = batch.generate_mods("tsv", SAMPLE_DIR, [str(tmp_path / "mod")], str(tmp_path / "out"), 1, NullLogger())
+    assert results[str(tmp_path / "mod")] > 0
+    assert read_output(tmp_path / "out" / "mod") == sample_output
+
+# A mod applied on top of the base tables gives the output of the tables with the rows of the mod merged in
+def test_overlay_matches_merged_tables(tmp_path):
+    (header, rows, mod_rows) = write_bombardments_mod(tmp_path / "mod")
+    (projectile_header, projectile_rows) = read_table("projectiles.tsv")
+    added_projectile = list(projectile_rows[0])
+    added_projectile[get_column(projectile_header, "key")] = "added_projectile"
+    write_table(tmp_path / "mod", "projectiles.tsv", projectile_header, [added_projectile])
+
+    # Later rows of a tsv file replace the earlier ones & keep their position, like the rows of a mod
+    merged_dir = tmp_path / "merged"
+    shutil.copytree(SAMPLE_DIR, merged_dir)
+    write_table(merged_dir, "projectile_bombardments.tsv", header, rows + mod_rows)
+    write_table(merged_dir, "projectiles.tsv", projectile_header, projectile_rows + [added_projectile])
+
+    batch.generate_mods("tsv", SAMPLE_DIR, [str(tmp_path / "mod")], str(tmp_path / "out"), 1, NullLogger())
+    assert read_output(tmp_path / "out" / "mod") == generate_output(tmp_path / "merged_out", "tsv", str(merged_dir))
+
+def test_add_layer_with_new_keys():
+    table = OverlayTable({"a": 1, "b": 2})
+    assert list(table) == ["a", "b"]
+    table.add_layer({"b": 3, "c": 4})
+    assert list(table) == ["a", "b", "c"]
+    assert len(table) == 3
+    assert dict(table) == {"a": 1, "b": 3, "c": 4}
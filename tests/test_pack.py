@@ -0,0 +1,155 @@
+import struct
+import pytest
+import os
+
+from logger import NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import TABLE_FILES, TSVFactory
+import pack
+from pack import PackFactory, PackFile, encode_db_table, encode_loc, write_pack, read_db_header, read_db_rows
+
+from conftest import SAMPLE_DIR, read_output
+
+# Field types of the columns declared by the TSVFactory, the other columns are stored as strings
+FIELD_TYPES = {TSVFactory.TYPE_INT: "I32", TSVFactory.TYPE_FLOAT: "F32", TSVFactory.TYPE_BOOL: "Boolean", TSVFactory.TYPE_STR: "OptionalStringU8"}
+CASTERS = {"I32": lambda value: int(float(value)) if value else 0, "F32": lambda value: float(value) if value else 0.0, "Boolean": lambda value: value == "true"}
+
+# Returns (DB table name, version, fields, rows) of a sample table
+def read_sample_table(file_name):
+    with open(os.path.join(SAMPLE_DIR, file_name + ".tsv"), "r", newline="") as f:
+        lines = f.read().splitlines()
+    (db_table, version) = lines[0].split("\t")[:2]
+    columns = lines[1].split("\t")
+    declared = TSVFactory.SCHEMAS[db_table]
+    fields = [(column, FIELD_TYPES[declared[column]] if column in declared else "OptionalStringU8") for column in columns if column]
+    rows = []
+    for line in lines[2:]:
+        values = dict(zip(columns, line.split("\t")))
+        rows.append({name: CASTERS.get(field_type, str)(values.get(name, "")) for (name, field_type) in fields})
+    return (db_table, int(version), fields, rows)
+
+# Returns (schema, Map<path in the pack, content>) of a pack with the sample tables & the onscreen names of the phases
+def build_sample_pack():
+    schema = {}
+    files = {}
+    for file_name in TABLE_FILES:
+        (db_table, version, fields, rows) = read_sample_table(file_name)
+        schema[db_table] = {version: fields}
+        files["db/" + db_table + "/data__"] = encode_db_table(fields, version, rows)
+    with open(os.path.join(SAMPLE_DIR, "special_ability_phases.tsv.loc"), "r", newline="") as f:
+        lines = f.read().splitlines()
+    files["text/db/special_ability_phases__.loc"] = encode_loc([(line.split("\t")[0], line.split("\t")[1].replace("\\\\", "\\")) for line in lines[2:]])
+    files["ui/unrelated.png"] = b"\x00" * 1000
+    return (schema, files)
+
+# Writes a pack with the header, index & flags of pack formats write_pack doesn't produce
+# compressed: paths of the files marked as compressed in the index (PFH5)
+def write_raw_pack(path, files, preamble, flags, compressed=()):
+    has_timestamps = flags & pack.PFH_HAS_INDEX_WITH_TIMESTAMPS
+    pack_index = b"data.pack\x00"
+    index = []
+    for file_path, content in files.items():
+        entry = struct.pack("<I", len(content)) + (struct.pack("<I", 0) if has_timestamps else b"")
+        if preamble == b"PFH5": entry += b"\x01" if file_path in compressed else b"\x00"
+        index.append(entry + file_path.replace("/", "\\").encode("utf-8") + b"\x00")
+    with open(path, "wb") as f:
+        f.write(pack.PFH_HEADER.pack(preamble, flags, 1, len(pack_index), len(files), sum(len(entry) for entry in index), 0))
+        if flags & pack.PFH_HAS_EXTENDED_HEADER: f.write(b"\x00" * pack.PFH_EXTENDED_HEADER_SIZE)
+        f.write(pack_index)
+        f.write(b"".join(index))
+        for content in files.values():
+            f.write(content)
+
+def generate_output(factory, output_dir):
+    log = NullLogger()
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(factory).generate_tooltips(atg, log)
+    atg.generate_tsv_files(log, output_dir=str(output_dir))
+    return read_output(output_dir)
+
+@pytest.fixture(scope="module")
+def sample_pack():
+    return build_sample_pack()
+
+def test_pack_matches_tsv(tmp_path, sample_pack, sample_output):
+    (schema, files) = sample_pack
+    write_pack(str(tmp_path / "data.pack"), files)
+    assert generate_output(PackFactory(NullLogger(), [str(tmp_path / "data.pack")], schema), tmp_path / "out") == sample_output
+
+# Rows of later packs replace the rows of earlier packs, the first fragment of a table in a pack wins
+def test_load_order(tmp_path, sample_pack):
+    (schema, files) = sample_pack
+    write_pack(str(tmp_path / "data.pack"), files)
+    fields = schema["projectile_bombardments_tables"][6]
+    row = next(row for row in read_sample_table("projectile_bombardments")[3] if row["bombardment_key"] == "wh2_dlc09_unit_abilities_death_from_above")
+    write_pack(str(tmp_path / "mod.pack"), {
+        "db/projectile_bombardments_tables/!mod": encode_db_table(fields, 6, [dict(row, num_projectiles=7)]),
+        "db/projectile_bombardments_tables/zz_mod": encode_db_table(fields, 6, [dict(row, num_projectiles=9)]),
+    })
+    factory = PackFactory(NullLogger(), [str(tmp_path / "data.pack"), str(tmp_path / "mod.pack")], schema)
+    assert factory.bombardments["wh2_dlc09_unit_abilities_death_from_above"].num_projectiles == 7
+
+@pytest.mark.parametrize("preamble, flags", [
+    (b"PFH4", 0),
+    (b"PFH4", pack.PFH_HAS_INDEX_WITH_TIMESTAMPS),
+    (b"PFH5", pack.PFH_HAS_EXTENDED_HEADER),
+    (b"PFH5", pack.PFH_HAS_EXTENDED_HEADER | pack.PFH_HAS_INDEX_WITH_TIMESTAMPS),
+])
+def test_pack_headers(tmp_path, sample_pack, preamble, flags):
+    (schema, files) = sample_pack
+    write_raw_pack(str(tmp_path / "data.pack"), files, preamble, flags | pack.PFH_TYPE_MOD)
+    packed = PackFile(str(tmp_path / "data.pack"))
+    try:
+        assert list(packed.files) == list(files)
+        for file_path, content in files.items():
+            (offset, size) = packed.files[file_path]
+            assert packed.data[offset:offset + size] == content
+    finally:
+        packed.close()
+
+@pytest.mark.parametrize("flags", [pack.PFH_HAS_ENCRYPTED_INDEX, pack.PFH_HAS_ENCRYPTED_DATA])
+def test_encrypted_pack(tmp_path, flags):
+    write_raw_pack(str(tmp_path / "data.pack"), {"db/projectiles_tables/data__": b""}, b"PFH5", flags)
+    with pytest.raises(Exception, match="Encrypted"):
+        PackFile(str(tmp_path / "data.pack"))
+
+def test_compressed_file(tmp_path):
+    write_raw_pack(str(tmp_path / "data.pack"), {"db/projectiles_tables/data__": b"x"}, b"PFH5", 0, compressed=["db/projectiles_tables/data__"])
+    with pytest.raises(Exception, match="Compressed"):
+        PackFile(str(tmp_path / "data.pack"))
+
+def test_unsupported_format(tmp_path):
+    write_raw_pack(str(tmp_path / "data.pack"), {}, b"PFH3", 0)
+    with pytest.raises(Exception, match="Unsupported pack format"):
+        PackFile(str(tmp_path / "data.pack"))
+
+FIELDS = [("key", "StringU8"), ("name", "OptionalStringU8"), ("text", "StringU16"), ("description", "OptionalStringU16"), ("count", "I32"), ("large", "I64"), ("small", "I16"), ("ratio", "F64"), ("enabled", "Boolean")]
+ROWS = [
+    {"key": "a", "name": "", "text": "café", "description": "", "count": -1, "large": 1 << 40, "small": -2, "ratio": 0.1, "enabled": True},
+    {"key": "b", "name": "name", "text": "", "description": "description é", "count": 2, "large": 0, "small": 3, "ratio": 2.5, "enabled": False},
+]
+
+def test_optional_strings():
+    data = encode_db_table(FIELDS, 3, ROWS)
+    assert read_db_header(data, 0)[:2] == (3, 2)
+    assert [row for (start, end, row) in read_db_rows(data, 0, FIELDS, {name for (name, field_type) in FIELDS})] == ROWS
+    # Columns which aren't decoded are skipped
+    assert [row for (start, end, row) in read_db_rows(data, 0, FIELDS, {"key", "enabled"})] == [{"key": "a", "enabled": True}, {"key": "b", "enabled": False}]
+
+def test_guid_header():
+    guid = "4b6a0a35-5f53-4bd5-b3ec-0a34cd8c3f5b"
+    data = pack.DB_GUID_MARKER + struct.pack("<H", len(guid)) + guid.encode("utf-16-le") + encode_db_table(FIELDS, 3, ROWS)
+    assert read_db_header(data, 0)[:2] == (3, 2)
+    assert [row["key"] for (start, end, row) in read_db_rows(data, 0, FIELDS, {"key"})] == ["a", "b"]
+
+# Tables without a version marker are version 0
+def test_missing_schema_version(tmp_path, sample_pack):
+    (schema, files) = sample_pack
+    files = dict(files)
+    data = files["db/projectiles_tables/data__"]
+    files["db/projectiles_tables/data__"] = data[8:]
+    assert read_db_header(files["db/projectiles_tables/data__"], 0)[0] == 0
+    write_pack(str(tmp_path / "data.pack"), files)
+    with pytest.raises(Exception, match="No schema for version 0 of projectiles_tables"):
+        PackFactory(NullLogger(), [str(tmp_path / "data.pack")], schema)
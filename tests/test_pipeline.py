@@ -0,0 +1,47 @@
+import threading
+import shutil
+import queue
+import pytest
+
+from logger import NullLogger
+from structs import FACTORIES, get_table_paths
+from pipeline import Pipeline
+
+from conftest import SAMPLE_DIR, read_table, write_table, get_column, read_output, generate_output
+
+def run_pipeline(output_dir, format="tsv", directory=None, **options):
+    Pipeline(NullLogger(), FACTORIES[format], get_table_paths(format, directory), chunk_size=50, **options).run(str(output_dir))
+    return read_output(output_dir)
+
+@pytest.mark.parametrize("in_process", [False, True])
+def test_pipeline_matches_full_run(tmp_path, sample_output, in_process):
+    assert run_pipeline(tmp_path / "out", in_process=in_process) == sample_output
+
+def test_xml_pipeline_matches_full_run(tmp_path):
+    assert run_pipeline(tmp_path / "out", "xml") == generate_output(tmp_path / "expected", "xml")
+
+# A key found in several rows keeps the position of its first row & the values of its last row, as in a full run
+def test_duplicated_keys(tmp_path):
+    tables_dir = str(tmp_path / "tables")
+    shutil.copytree(SAMPLE_DIR, tables_dir)
+    (header, rows) = read_table("projectile_bombardments.tsv")
+    key_column = get_column(header, "bombardment_key")
+    duplicated = [list(row) for row in rows if row[key_column] == "wh2_dlc09_unit_abilities_death_from_above"]
+    duplicated[0][get_column(header, "num_projectiles")] = "7"
+    write_table(tables_dir, "projectile_bombardments.tsv", header, rows[:1] + duplicated + rows[1:] + duplicated)
+    (header, rows) = read_table("battle_vortexs.tsv")
+    write_table(tables_dir, "battle_vortexs.tsv", header, rows + [rows[0][:get_column(header, "damage")] + ["99"] + rows[0][get_column(header, "damage") + 1:]])
+
+    expected = generate_output(tmp_path / "expected", "tsv", tables_dir)
+    assert b"Launch 7 projectiles" in expected["th_damage_loc.tsv"]
+    assert run_pipeline(tmp_path / "out", directory=tables_dir) == expected
+
+# A producer which stopped without ending the queue raises instead of waiting forever
+def test_stopped_producer(monkeypatch):
+    monkeypatch.setattr("pipeline.PRODUCER_CHECK_INTERVAL", 0.01)
+    producer = threading.Thread(target=lambda: None)
+    producer.start()
+    producer.join()
+    pipeline = Pipeline(NullLogger(), FACTORIES["tsv"], get_table_paths("tsv"))
+    with pytest.raises(Exception, match="stopped before parsing"):
+        pipeline._get_item(producer, queue.Queue())
@@ -0,0 +1,21 @@
+import pytest
+
+from logger import NullLogger
+from structs import make_factory
+
+from conftest import generate_output
+
+@pytest.mark.parametrize("format", ["tsv", "xml"])
+def test_processes_match_sequential_run(tmp_path, format):
+    assert generate_output(tmp_path / "out", format, processes=3) == generate_output(tmp_path / "expected", format)
+
+# The tables parsed by the workers have the same rows in the same order & the same links as the ones parsed sequentially
+def test_processes_tables():
+    tables = make_factory(NullLogger(), "tsv").get_tables()
+    parsed = make_factory(NullLogger(), "tsv", processes=3).get_tables()
+    for table_name, table in tables.items():
+        assert list(parsed[table_name]) == list(table)
+        assert [str(entity) for entity in parsed[table_name].values()] == [str(entity) for entity in table.values()]
+    for projectile in parsed["projectiles"].values():
+        explosion = projectile.ref_projectile_explosion
+        assert explosion == None or parsed["projectile_explosions"][explosion.key] is explosion
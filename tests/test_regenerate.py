@@ -0,0 +1,46 @@
+import shutil
+
+from logger import NullLogger
+from structs import make_factory
+from dependency_index import DependencyIndex
+from regenerate import regenerate
+
+from conftest import SAMPLE_DIR, read_table, write_table, get_column, read_output, generate_output
+
+# Changes (modified & removed rows) of several tables: Map<file name, (key column, Map<key, Map<column, value> or None if removed>)>
+CHANGES = {
+    "battle_vortexs.tsv": ("vortex_key", {"wh2_dlc09_abilities_sand_storm": {"damage": "99"}}),
+    "projectiles_explosions.tsv": ("key", {"wh2_dlc12_lzd_salamander_flame": {"detonation_damage": "40.0"}, "wh2_dlc12_lzd_salamander_flame_large": None}),
+    "projectile_bombardments.tsv": ("bombardment_key", {"wh2_dlc09_unit_abilities_death_from_above": {"num_projectiles": "7"}}),
+}
+# Table of the factory of the tsv files
+TABLES = {"battle_vortexs.tsv": "vortexes", "projectiles_explosions.tsv": "projectile_explosions", "projectile_bombardments.tsv": "bombardments"}
+
+# Copies the sample tables to the directory & applies CHANGES, returns Map<table name, changed keys>
+def write_changed_tables(directory):
+    shutil.copytree(SAMPLE_DIR, directory)
+    changes = {}
+    for file_name, (key_column, changed_rows) in CHANGES.items():
+        (header, rows) = read_table(file_name)
+        for row in rows:
+            values = changed_rows.get(row[get_column(header, key_column)], {})
+            for column, value in (values or {}).items():
+                row[get_column(header, column)] = value
+        rows = [row for row in rows if changed_rows.get(row[get_column(header, key_column)], {}) != None]
+        write_table(directory, file_name, header, rows)
+        changes[TABLES[file_name]] = list(changed_rows)
+    return changes
+
+# The output patched with the regenerated tooltips is the output of a full run on the changed tables
+def test_regenerate_matches_full_run(tmp_path, sample_output):
+    previous_index = DependencyIndex(make_factory(NullLogger(), "tsv"))
+    (tmp_path / "out").mkdir()
+    for file_name, content in sample_output.items():
+        (tmp_path / "out" / file_name).write_bytes(content)
+
+    changes = write_changed_tables(tmp_path / "tables")
+    (index, affected_keys) = regenerate(make_factory(NullLogger(), "tsv", str(tmp_path / "tables")), changes, NullLogger(), str(tmp_path / "out"), previous_index)
+    assert "wh2_dlc09_unit_abilities_death_from_above" in affected_keys
+    expected = generate_output(tmp_path / "expected", "tsv", str(tmp_path / "tables"))
+    assert expected != sample_output
+    assert read_output(tmp_path / "out") == expected
@@ -0,0 +1,85 @@
+from urllib.request import urlopen, Request
+from urllib.parse import urlsplit
+from http.client import HTTPConnection
+import threading
+import json
+import pytest
+
+from logger import NullLogger
+from structs import make_factory
+from service import TooltipService, TooltipServer, PreviewError
+
+@pytest.fixture(scope="module")
+def service():
+    return TooltipService(NullLogger(), make_factory(NullLogger(), "tsv"))
+
+@pytest.fixture
+def server(service):
+    server = TooltipServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{port}".format(port=server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+# Returns Map<first column, second column> of the rows of an output file
+def read_columns(output, file_name):
+    lines = output[file_name].decode().splitlines()[2:]
+    return {columns[0]: columns[1] for columns in (line.split("\t") for line in lines)}
+
+# The tooltips served are the rows of the output files of a full run
+def test_tooltips_match_output(service, sample_output):
+    sort_orders = read_columns(sample_output, "unit_abilities_additional_ui_effects_tables.tsv")
+    texts = read_columns(sample_output, "th_damage_loc.tsv")
+    for key in service.atg.arr_tooltips:
+        tooltips = json.loads(service.get_tooltips(key))["tooltips"]
+        assert tooltips
+        for tooltip in tooltips:
+            assert str(tooltip["sort_order"]) == sort_orders[tooltip["ref"]]
+            assert tooltip["text"] == texts[tooltip["loc_key"]]
+
+# A preview without changes has the tooltips of the tables
+def test_preview_without_changes(service):
+    key = "wh2_dlc09_unit_abilities_death_from_above"
+    preview = json.loads(service.preview("bombardments", key, ()))["tooltips"]
+    assert key in preview
+    for affected_key, tooltips in preview.items():
+        assert tooltips == json.loads(service.get_tooltips(affected_key))["tooltips"]
+
+def test_query_string_is_ignored(service, server):
+    key = next(iter(service.atg.arr_tooltips))
+    with urlopen(server + "/tooltips/" + key + "?x=1") as response:
+        assert response.read() == service.get_tooltips(key)
+    with urlopen(Request(server + "/preview/bombardments/wh2_dlc09_unit_abilities_death_from_above?x=1", data=b"{}")) as response:
+        assert response.status == 200
+        assert "wh2_dlc09_unit_abilities_death_from_above" in json.loads(response.read())["tooltips"]
+    with urlopen(server + "/stats?x=1") as response:
+        stats = json.loads(response.read())
+    assert stats["requests"]["tooltips"]["count"] == 1
+    assert stats["tooltip_cache"]["hits"] + stats["tooltip_cache"]["misses"] >= 2
+
+# Returns the status & decoded body of a preview request with the Content-Length header
+def post_preview(server, content_length, body=b""):
+    connection = HTTPConnection(urlsplit(server).netloc, timeout=5)
+    try:
+        connection.putrequest("POST", "/preview/bombardments/wh2_dlc09_unit_abilities_death_from_above")
+        connection.putheader("Content-Length", content_length)
+        connection.endheaders(body)
+        response = connection.getresponse()
+        return (response.status, json.loads(response.read()))
+    finally:
+        connection.close()
+
+# An invalid length is rejected without reading the body (read(-1) would wait for the client to close the connection)
+@pytest.mark.parametrize("content_length", ["-1", "abc"])
+def test_invalid_content_length(service, server, content_length):
+    assert post_preview(server, content_length) == (400, {"error": "Invalid Content-Length"})
+    assert post_preview(server, "2", b"{}")[0] == 200
+
+def test_preview_int_field(service):
+    key = "wh2_dlc09_unit_abilities_death_from_above"
+    preview = json.loads(service.preview("bombardments", key, (("num_projectiles", 7.0),)))["tooltips"]
+    assert preview == json.loads(service.preview("bombardments", key, (("num_projectiles", 7),)))["tooltips"]
+    assert "Launch 7 projectiles" in preview[key][0]["text"]
+    with pytest.raises(PreviewError, match="Invalid value 10.5 for num_projectiles"):
+        service.preview("bombardments", key, (("num_projectiles", 10.5),))
@@ -0,0 +1,56 @@
+import shutil
+import sys
+import os
+
+from logger import NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import make_factory
+from table_cache import TableCache
+
+from conftest import SAMPLE_DIR, read_table, write_table, get_column, read_output, generate_output
+
+# Returns the output of a run on the tables of the directory with the snapshots of the cache directory & the cache used
+def generate_cached_output(output_dir, tables_dir, cache_dir):
+    log = NullLogger()
+    cache = TableCache(str(cache_dir))
+    factory = make_factory(log, "tsv", tables_dir, cache=cache)
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(factory).generate_tooltips(atg, log)
+    atg.generate_tsv_files(log, output_dir=str(output_dir))
+    return (read_output(output_dir), cache, factory)
+
+def test_snapshots(tmp_path, sample_output):
+    tables_dir = str(tmp_path / "tables")
+    shutil.copytree(SAMPLE_DIR, tables_dir)
+    (output, cache, factory) = generate_cached_output(tmp_path / "cold", tables_dir, tmp_path / "cache")
+    table_count = len(factory.get_tables())
+    assert (cache.hits, cache.misses) == (0, table_count)
+    assert output == sample_output
+    assert len(os.listdir(tmp_path / "cache")) == table_count
+
+    (output, cache, factory) = generate_cached_output(tmp_path / "warm", tables_dir, tmp_path / "cache")
+    assert (cache.hits, cache.misses) == (table_count, 0)
+    assert output == sample_output
+    # Keys loaded from the snapshots are interned like parsed keys
+    for table in factory.get_tables().values():
+        for key, entity in table.items():
+            assert key is sys.intern(key) and entity.key is key
+
+# Only the snapshot of the edited table is replaced
+def test_snapshot_invalidated_by_edit(tmp_path):
+    tables_dir = str(tmp_path / "tables")
+    shutil.copytree(SAMPLE_DIR, tables_dir)
+    generate_cached_output(tmp_path / "cold", tables_dir, tmp_path / "cache")
+    snapshots = set(os.listdir(tmp_path / "cache"))
+
+    (header, rows) = read_table("projectile_bombardments.tsv")
+    for row in rows:
+        if row[get_column(header, "bombardment_key")] == "wh2_dlc09_unit_abilities_death_from_above": row[get_column(header, "num_projectiles")] = "7"
+    write_table(tables_dir, "projectile_bombardments.tsv", header, rows)
+
+    (output, cache, factory) = generate_cached_output(tmp_path / "edited", tables_dir, tmp_path / "cache")
+    assert (cache.hits, cache.misses) == (len(snapshots) - 1, 1)
+    assert output == generate_output(tmp_path / "expected", "tsv", tables_dir)
+    changed = snapshots ^ set(os.listdir(tmp_path / "cache"))
+    assert len(changed) == 2 and all(".bombardments." in file_name for file_name in changed)
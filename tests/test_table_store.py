@@ -0,0 +1,48 @@
+import shutil
+import pytest
+
+from logger import NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import make_factory
+from table_store import TableStore, StoreFactory
+
+from conftest import SAMPLE_DIR, read_table, write_table, get_column, read_output, generate_output
+
+def generate_store_output(store, output_dir):
+    log = NullLogger()
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(StoreFactory(log, store)).generate_tooltips(atg, log)
+    atg.generate_tsv_files(log, output_dir=str(output_dir))
+    return read_output(output_dir)
+
+@pytest.mark.parametrize("format, options", [("tsv", {}), ("xml", {"streaming": True})])
+def test_store_matches_tables(tmp_path, format, options):
+    store = TableStore(str(tmp_path / "tables.db"))
+    try:
+        source = make_factory(NullLogger(), format, deferred=True, **options)
+        assert not store.is_current(source)
+        store.import_tables(source, NullLogger())
+        assert store.is_current(source)
+        assert generate_store_output(store, tmp_path / "out") == generate_output(tmp_path / "expected", format)
+    finally:
+        store.close()
+
+# The stored tables are imported again once the tables changed
+def test_store_reimports_changed_tables(tmp_path):
+    tables_dir = str(tmp_path / "tables")
+    shutil.copytree(SAMPLE_DIR, tables_dir)
+    store = TableStore(str(tmp_path / "tables.db"))
+    try:
+        store.import_tables(make_factory(NullLogger(), "tsv", tables_dir, deferred=True), NullLogger())
+
+        (header, rows) = read_table("projectile_bombardments.tsv")
+        for row in rows:
+            if row[get_column(header, "bombardment_key")] == "wh2_dlc09_unit_abilities_death_from_above": row[get_column(header, "num_projectiles")] = "7"
+        write_table(tables_dir, "projectile_bombardments.tsv", header, rows)
+        source = make_factory(NullLogger(), "tsv", tables_dir, deferred=True)
+        assert not store.is_current(source)
+        store.import_tables(source, NullLogger())
+        assert generate_store_output(store, tmp_path / "out") == generate_output(tmp_path / "expected", "tsv", tables_dir)
+    finally:
+        store.close()
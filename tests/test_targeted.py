@@ -0,0 +1,35 @@
+from logger import NullLogger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from structs import FACTORIES, TABLE_FILES, TSVFactory, get_table_paths, make_factory
+from targeted import generate_abilities
+
+from conftest import read_table, get_column, read_output
+
+# The tooltips of a few abilities are the ones of a full run, written for these abilities only
+def test_targeted_matches_full_run(tmp_path):
+    (header, rows) = read_table("unit_special_abilities.tsv")
+    ability_keys = {row[get_column(header, "key")] for row in rows[::7]} | {"wh2_dlc09_unit_abilities_death_from_above"}
+
+    log = NullLogger()
+    atg = AbilityTooltipGenerator(log)
+    SpellManager(make_factory(log, "tsv")).generate_tooltips(atg, log)
+    atg.generate_tsv_files(log, output_dir=str(tmp_path / "expected"), keys=ability_keys)
+
+    targeted = generate_abilities(log, FACTORIES["tsv"], get_table_paths("tsv"), ability_keys)
+    assert len(targeted.arr_tooltips) < len(atg.arr_tooltips)
+    targeted.generate_tsv_files(log, output_dir=str(tmp_path / "out"), keys=ability_keys)
+    expected = read_output(tmp_path / "expected")
+    assert expected["th_damage_loc.tsv"].count(b"\n") > 10
+    assert read_output(tmp_path / "out") == expected
+
+# Rows filtered by key are split once and only the rows of the keys are built
+def test_keys_filter(monkeypatch):
+    (header, rows) = read_table("unit_special_abilities.tsv")
+    keys = {row[get_column(header, "key")] for row in rows[::5]}
+    split_lines = []
+    split_line = TSVFactory._split_line
+    monkeypatch.setattr(TSVFactory, "_split_line", lambda self, line: split_lines.append(line) or split_line(self, line))
+    factory = make_factory(NullLogger(), "tsv", keys=keys)
+    assert set(factory.special_unit_abilities) == keys
+    assert len(split_lines) == sum(len(read_table(table + ".tsv")[1]) for table in TABLE_FILES)
@@ -0,0 +1,35 @@
+import shutil
+import os
+
+from logger import NullLogger
+from structs import make_factory
+from watch import TooltipWatcher
+
+from conftest import SAMPLE_DIR, read_table, write_table, get_column, read_output, generate_output
+
+# Rewrites a table of the directory with the values of the rows changed, bumping its mtime so the change is seen
+def change_table(directory, file_name, key_column, changed_rows):
+    (header, rows) = read_table(file_name, directory)
+    for row in rows:
+        for column, value in changed_rows.get(row[get_column(header, key_column)], {}).items():
+            row[get_column(header, column)] = value
+    path = os.path.join(directory, file_name)
+    mtime_ns = os.stat(path).st_mtime_ns
+    write_table(directory, file_name, header, rows)
+    os.utime(path, ns=(mtime_ns + 1000000000, mtime_ns + 1000000000))
+
+def test_watch_matches_full_run(tmp_path, sample_output):
+    tables_dir = str(tmp_path / "tables")
+    shutil.copytree(SAMPLE_DIR, tables_dir)
+    watcher = TooltipWatcher(NullLogger(), make_factory(NullLogger(), "tsv", tables_dir), str(tmp_path / "out"))
+    assert read_output(tmp_path / "out") == sample_output
+    assert watcher.poll() == {}
+
+    change_table(tables_dir, "projectile_bombardments.tsv", "bombardment_key", {"wh2_dlc09_unit_abilities_death_from_above": {"num_projectiles": "7"}})
+    change_table(tables_dir, "battle_vortexs.tsv", "vortex_key", {"wh2_dlc09_abilities_sand_storm": {"damage": "99"}})
+    changes = watcher.poll()
+    assert changes == {"bombardments": (["wh2_dlc09_unit_abilities_death_from_above"], []), "vortexes": (["wh2_dlc09_abilities_sand_storm"], [])}
+
+    expected = generate_output(tmp_path / "expected", "tsv", tables_dir)
+    assert expected != sample_output
+    assert read_output(tmp_path / "out") == expected
@@ -0,0 +1,16 @@
+from logger import NullLogger
+from structs import make_factory
+
+from conftest import generate_output
+
+def test_streaming_matches_full_parse(tmp_path):
+    assert generate_output(tmp_path / "out", "xml", streaming=True) == generate_output(tmp_path / "expected", "xml")
+
+# The streamed rows are the rows of the parsed documents, in the same order
+def test_streaming_tables(tmp_path):
+    tables = make_factory(NullLogger(), "xml").get_tables()
+    streamed = make_factory(NullLogger(), "xml", streaming=True).get_tables()
+    assert list(streamed) == list(tables)
+    for table_name, table in tables.items():
+        assert list(streamed[table_name]) == list(table)
+        assert [str(entity) for entity in streamed[table_name].values()] == [str(entity) for entity in table.values()]
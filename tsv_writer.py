@@ -0,0 +1,40 @@
+import itertools
+
+# Writes several tables at once to file-like sinks (files, sys.stdout, pipes, gzip.open(path, "wt", newline="")...).
+# Rows are written in batches: the rows of a batch are joined and written with a single call per table,
+# so writing costs depend on the amount of data written rather than the number of rows.
+# e.g.
+#   writer = TSVWriter(TSVWriter.open_files(paths), headers)
+#   writer.write(rows) # rows: iterable of tuples with a row per table, in the order of the sinks
+#   writer.close()
+class TSVWriter:
+    BATCH_SIZE = 4096        # Rows per table written at once
+    BUFFER_SIZE = 1 << 20    # Write buffer (in bytes) of files opened by open_files
+
+    # close_sinks: close the sinks on close() instead of only flushing them (e.g. don't close sys.stdout)
+    def __init__(self, sinks, headers, batch_size=BATCH_SIZE, close_sinks=True):
+        assert len(sinks) == len(headers), "A header is required for every sink"
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.close_sinks = close_sinks
+        self.rows_written = 0
+        for sink, header in zip(sinks, headers):
+            sink.write(header)
+
+    @classmethod
+    def open_files(cls, paths):
+        return [open(path, "w", newline="", buffering=cls.BUFFER_SIZE) for path in paths]
+
+    def write(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch: break
+            for sink, table_rows in zip(self.sinks, zip(*batch)):
+                sink.write("".join(table_rows))
+            self.rows_written += len(batch)
+
+    def close(self):
+        for sink in self.sinks:
+            if self.close_sinks: sink.close()
+            else: sink.flush()
@@ -0,0 +1,105 @@
+import argparse
+import time
+import sys
+import os
+
+from logger import Logger
+from spell_manager import SpellManager
+from ability_tooltip_generator import AbilityTooltipGenerator
+from dependency_index import DependencyIndex
+from regenerate import regenerate
+from structs import FACTORIES, SCRIPT_DIR, make_factory
+
+# Keeps the tables in memory and regenerates the tooltips whenever a table file changes.
+# Only the rows which changed are parsed again (@see AbstractFactory.update_table) and only the tooltips affected
+# by these rows are generated again and patched into the output files (@see regenerate.regenerate).
+# Usage: python watch.py [--format tsv|xml] [--dir DIR] [--out DIR] [--interval SECONDS]
+
+class TooltipWatcher:
+    def __init__(self, log, factory, output_dir="out"):
+        self.log = log
+        self.factory = factory
+        self.output_dir = output_dir
+        self.index = None
+        self.file_stats = {} # Map<path, (mtime, size)>
+        self.rows = {}       # Map<table name, Map<row fingerprint, key>> @see AbstractFactory.update_table
+
+        for table_name, (_, source_paths, _, _) in factory.table_jobs.items():
+            for path in source_paths:
+                self.file_stats[path] = self._stat(path)
+            # Builds the fingerprints of the rows
+            (self.rows[table_name], _, _) = factory.update_table(table_name, {})
+        self.factory.relink()
+        self.generate()
+
+    def _stat(self, path):
+        if not os.path.exists(path): return None
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    # Reload the tables whose files changed since the last poll and regenerate the tooltips if any did.
+    # Returns Map<table name, (keys of the added or modified rows, keys of the removed rows)> of the reloaded tables
+    def poll(self):
+        changes = {}
+        for table_name, (_, source_paths, _, _) in self.factory.table_jobs.items():
+            changed_paths = [path for path in source_paths if self._stat(path) != self.file_stats[path]]
+            if not changed_paths: continue
+            for path in changed_paths:
+                self.file_stats[path] = self._stat(path)
+
+            # Rows joined with another file (e.g. the localisation of phases) are all parsed again if it changed
+            previous_rows = self.rows[table_name] if changed_paths == source_paths[:1] else {}
+            try:
+                (self.rows[table_name], changed_keys, removed_keys) = self.factory.update_table(table_name, previous_rows)
+            except Exception as e:
+                # e.g. the file is saved while it is read. The table is reloaded the next time the file changes.
+                self.log.error("Failed to reload %s: %r", table_name, e)
+                continue
+            self.log.info("Reloaded %s: %d rows changed, %d removed", table_name, len(changed_keys), len(removed_keys))
+            changes[table_name] = (changed_keys, removed_keys)
+
+        if changes:
+            start = time.perf_counter()
+            self.factory.relink()
+            changed_rows = {table_name: changed_keys + removed_keys for table_name, (changed_keys, removed_keys) in changes.items()}
+            (self.index, affected_keys) = regenerate(self.factory, changed_rows, self.log, self.output_dir, self.index)
+            self.log.info("Regenerated the tooltips of %d keys in %.1fms", len(affected_keys), (time.perf_counter() - start) * 1000)
+            self.log.flush()
+        return changes
+
+    # Generate all tooltips
+    def generate(self):
+        atg = AbilityTooltipGenerator(self.log)
+        SpellManager(self.factory).generate_tooltips(atg, self.log)
+        atg.generate_tsv_files(self.log, output_dir=self.output_dir)
+        self.index = DependencyIndex(self.factory)
+        self.log.flush()
+
+    def run(self, interval):
+        while True:
+            for table_name, (changed_keys, removed_keys) in self.poll().items():
+                print("{table}: {changed} rows changed, {removed} removed".format(table=table_name, changed=len(changed_keys), removed=len(removed_keys)))
+            time.sleep(interval)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Regenerate the tooltips whenever a table file changes.")
+    parser.add_argument("--format", choices=list(FACTORIES), default="tsv")
+    parser.add_argument("--dir", help="directory of the tables (defaults to the sample tables of the format)")
+    parser.add_argument("--out", default="out", help="output directory")
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between checks of the table files")
+    args = parser.parse_args(argv)
+
+    directory = args.dir or os.path.join(SCRIPT_DIR, args.format)
+    log = Logger("watch.txt", level=Logger.INFO)
+    factory = make_factory(log, args.format, directory)
+    watcher = TooltipWatcher(log, factory, args.out)
+    print("Watching {directory}, press Ctrl+C to stop".format(directory=directory))
+    try:
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+    log.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))